@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Audio Export - Encode one decoded audiobook into several formats at once
+The synthesized segments are decoded to PCM a single time (and normalized
+once, if asked); the PCM is then streamed in chunks to one ffmpeg encoder
+per output format. The encoders run side by side and write straight to
+disk, so MP3, Opus and an M4B with chapters take about as long as the
+slowest of them
+
+Formats are profile names with an optional bitrate: 'mp3', 'opus',
+'m4b', 'mp3:128k' (written as <name>_128k.mp3)
+"""
+
+import os
+import json
+import wave
+import shutil
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tts_backends import SEGMENT_MANIFEST
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Profile: extension, ffmpeg codec/muxer arguments, default bitrate
+EXPORT_PROFILES = {
+    'mp3': {'extension': 'mp3', 'codec': ['-c:a', 'libmp3lame'], 'bitrate': '96k'},      # Web players
+    'opus': {'extension': 'opus', 'codec': ['-c:a', 'libopus', '-application', 'voip'],
+             'bitrate': '32k'},                                                           # Mobile
+    'm4b': {'extension': 'm4b', 'codec': ['-c:a', 'aac', '-f', 'ipod'], 'bitrate': '64k',
+            'chapters': True},                                                            # Audiobook apps
+    'ogg': {'extension': 'ogg', 'codec': ['-c:a', 'libvorbis'], 'bitrate': '64k'},
+    'flac': {'extension': 'flac', 'codec': ['-c:a', 'flac'], 'bitrate': None},
+    'wav': {'extension': 'wav', 'codec': ['-c:a', 'pcm_s16le'], 'bitrate': None}
+}
+DEFAULT_EXPORT_FORMATS = ('mp3', 'opus', 'm4b')
+
+# PCM written to each encoder per pipe write
+CHUNK_BYTES = 1 << 20
+
+PCM_FORMATS = {1: 'u8', 2: 's16le', 4: 's32le'}
+
+
+class PCMAudio:
+    """Decoded audio: raw interleaved samples plus their layout"""
+
+    def __init__(self, data: bytes, channels: int, sample_width: int, frame_rate: int):
+        self.data = data
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_rate = frame_rate
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / float(self.channels * self.sample_width * self.frame_rate)
+
+    def input_args(self) -> List[str]:
+        """ffmpeg arguments describing this PCM on stdin"""
+        return ['-f', PCM_FORMATS[self.sample_width], '-ar', str(self.frame_rate),
+                '-ac', str(self.channels), '-i', 'pipe:0']
+
+
+def parse_format(spec: str) -> Tuple[str, Optional[str]]:
+    """'mp3:128k' -> ('mp3', '128k'); unknown profiles raise ValueError"""
+    name, _, bitrate = spec.strip().lower().partition(':')
+    if name not in EXPORT_PROFILES:
+        raise ValueError(f"Unknown export format {name!r} (choose from {', '.join(EXPORT_PROFILES)})")
+    return name, bitrate or None
+
+
+def find_segment_files(segment_dir: Path) -> List[str]:
+    """
+    Segment files of a book's last synthesis, in playback order
+    Read from segments.json, so files left over from earlier runs (more
+    chunks, or another backend's format) are never exported
+    """
+    manifest_path = Path(segment_dir) / SEGMENT_MANIFEST
+    if not manifest_path.exists():
+        return []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    segment_files = [Path(segment_dir) / entry['file'] for entry in manifest]
+    if not all(path.exists() for path in segment_files):
+        logger.warning(f"Segments listed in {manifest_path} are missing")
+        return []
+    return [str(path) for path in segment_files]
+
+
+def decode_segments(segment_files: List[str]) -> PCMAudio:
+    """
+    Decode and concatenate segments into one PCM buffer
+    WAV segments are read directly; anything else (or WAVs with differing
+    layouts) is decoded with pydub
+    """
+    if not segment_files:
+        raise ValueError("No audio segments to decode")
+    try:
+        return _decode_wav_segments(segment_files)
+    except (wave.Error, EOFError, ValueError):
+        pass
+
+    from pydub import AudioSegment
+    combined = AudioSegment.empty()
+    for path in segment_files:
+        combined += AudioSegment.from_file(path)
+    return PCMAudio(combined.raw_data, combined.channels, combined.sample_width, combined.frame_rate)
+
+
+def _decode_wav_segments(segment_files: List[str]) -> PCMAudio:
+    params = None
+    frames = []
+    for path in segment_files:
+        with wave.open(path, 'rb') as segment:
+            layout = (segment.getnchannels(), segment.getsampwidth(), segment.getframerate())
+            if params is None:
+                params = layout
+            elif layout != params:
+                raise ValueError(f"{path} has layout {layout}, expected {params}")
+            frames.append(segment.readframes(segment.getnframes()))
+    return PCMAudio(b''.join(frames), *params)
+
+
+def enhance_pcm(audio: PCMAudio) -> PCMAudio:
+    """Normalize volume and apply light compression (needs pydub)"""
+    from pydub import AudioSegment
+    from pydub.effects import normalize, compress_dynamic_range
+
+    segment = AudioSegment(data=audio.data, sample_width=audio.sample_width,
+                           frame_rate=audio.frame_rate, channels=audio.channels)
+    segment = normalize(segment)
+    segment = compress_dynamic_range(segment, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
+    return PCMAudio(segment.raw_data, segment.channels, segment.sample_width, segment.frame_rate)
+
+
+def write_chapter_metadata(path: Path, markers: List[Dict], duration: float,
+                           title: Optional[str] = None) -> str:
+    """
+    Write chapters as an ffmetadata file; each chapter ends where the next
+    starts, and markers past the end of the audio are dropped
+    """
+    def escape(value: str) -> str:
+        for char in ('\\', '=', ';', '#', '\n'):
+            value = value.replace(char, '\\' + char)
+        return value
+
+    end_ms = int(duration * 1000)
+    starts = [int(marker['time'] * 1000) for marker in markers if marker['time'] * 1000 < end_ms]
+    lines = [';FFMETADATA1']
+    if title:
+        lines.append(f'title={escape(title)}')
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else end_ms
+        lines += ['[CHAPTER]', 'TIMEBASE=1/1000', f'START={start}', f'END={end}',
+                  f"title={escape(markers[index].get('title', f'Chapter {index + 1}'))}"]
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def find_ffmpeg() -> str:
+    path = shutil.which('ffmpeg')
+    if path is None:
+        raise FileNotFoundError("ffmpeg executable not found on PATH")
+    return path
+
+
+def output_path(output_base: Path, spec: str) -> Path:
+    name, bitrate = parse_format(spec)
+    suffix = f"_{bitrate}" if bitrate else ''
+    return output_base.with_name(f"{output_base.name}{suffix}.{EXPORT_PROFILES[name]['extension']}")
+
+
+def export_pcm(audio: PCMAudio, output_base: Path, formats=DEFAULT_EXPORT_FORMATS,
+               markers: Optional[List[Dict]] = None, title: Optional[str] = None,
+               chunk_bytes: int = CHUNK_BYTES,
+               on_encoded: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+    """
+    Encode audio into every format in parallel
+    Each encoder is an ffmpeg process fed from its own thread in chunk_bytes
+    slices of the shared PCM (no copies). Files are written under a temporary
+    name and renamed when their encoder succeeds. Returns {format spec: path}
+    """
+    ffmpeg = find_ffmpeg()
+    output_base = Path(output_base)
+    output_base.parent.mkdir(parents=True, exist_ok=True)
+
+    metadata_file = None
+    if markers and any(EXPORT_PROFILES[parse_format(spec)[0]].get('chapters') for spec in formats):
+        metadata_file = write_chapter_metadata(output_base.with_name(f"{output_base.name}.ffmeta"),
+                                               markers, audio.duration, title)
+
+    encoders = []
+    for spec in formats:
+        name, bitrate = parse_format(spec)
+        profile = EXPORT_PROFILES[name]
+        final = output_path(output_base, spec)
+        partial = final.with_name(f"{final.stem}.partial{final.suffix}")
+        command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y'] + audio.input_args()
+        if profile.get('chapters') and metadata_file:
+            command += ['-i', metadata_file, '-map', '0:a', '-map_metadata', '1', '-map_chapters', '1']
+        elif title:
+            command += ['-metadata', f'title={title}']
+        command += profile['codec']
+        if bitrate or profile['bitrate']:
+            command += ['-b:a', bitrate or profile['bitrate']]
+        command.append(str(partial))
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE)
+        encoders.append((spec, process, partial, final))
+
+    def feed(process: subprocess.Popen) -> None:
+        view = memoryview(audio.data)
+        try:
+            for offset in range(0, len(view), chunk_bytes):
+                process.stdin.write(view[offset:offset + chunk_bytes])
+        except (BrokenPipeError, OSError):
+            pass  # Encoder exited early; its return code reports why
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    feeders = [threading.Thread(target=feed, args=(process,), daemon=True) for _, process, _, _ in encoders]
+    for feeder in feeders:
+        feeder.start()
+
+    outputs = {}
+    errors = []
+    for (spec, process, partial, final), feeder in zip(encoders, feeders):
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.wait()
+        feeder.join()
+        if process.returncode != 0:
+            errors.append(f"{spec}: {stderr.strip()[-300:] or f'exit code {process.returncode}'}")
+            if partial.exists():
+                partial.unlink()
+            continue
+        os.replace(partial, final)
+        outputs[spec] = str(final)
+        logger.info(f"Exported {spec}: {final}")
+        if on_encoded is not None:
+            on_encoded(spec, str(final))
+
+    if metadata_file:
+        Path(metadata_file).unlink()
+    if errors:
+        raise RuntimeError("Audio export failed for " + '; '.join(errors))
+    return outputs
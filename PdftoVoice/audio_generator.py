@@ -5,29 +5,64 @@ Supports SSML and multiple TTS engines
 """
 
 import os
-import re
 import json
+import shutil
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Callable
 import time
 
+from timing_index import (
+    build_sentence_entries, estimate_timings, align_speech_marks,
+    write_timing_index, parse_pause, CHARS_PER_SECOND
+)
+from ssml_builder import (
+    SSMLNode, Voice, Prosody, Emphasis, Break, Isolated, BRACKET_PATTERN,
+    estimate_nodes_length, iter_chunks, render as render_ssml
+)
+from tts_backends import (
+    TTSBackend, get_backend, split_into_segments, join_segments,
+    write_segment_manifest, get_audio_duration, SEGMENT_MANIFEST
+)
+from text_document import load_text_data
+from audio_export import (
+    DEFAULT_EXPORT_FORMATS, EXPORT_PROFILES, decode_segments, enhance_pcm, export_pcm, find_segment_files
+)
+from events import EventBus, format_eta
+from synthesis_planner import (
+    SegmentCache, SynthesisPlan, count_sentences, find_repeated_sentences,
+    sentence_key, plan_backend
+)
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AudioGenerator:
-    def __init__(self, tts_service: str = "polly"):
+    def __init__(self, tts_service: str = "polly", local_workers: Optional[int] = None,
+                 segment_cache: bool = True, audio_format: str = "mp3",
+                 events: Optional[EventBus] = None):
         """
         Initialize Audio Generator
         
         Args:
-            tts_service: TTS service to use ('polly', 'google', 'elevenlabs', 'local')
+            tts_service: TTS service to use ('polly', 'google', 'elevenlabs', 'espeak', 'piper', 'local')
+            local_workers: Number of local TTS worker processes (default: CPU count)
+            segment_cache: Reuse synthesized requests (repeated sentences, re-runs) from output/audio/cache
+            audio_format: Format of the joined audio file ('mp3', 'wav', 'ogg', 'flac'; needs pydub)
+            events: Event bus for chunk_synthesized events with ETA (share one with PDFProcessor)
         """
         self.tts_service = tts_service
+        self.local_workers = local_workers
+        self.audio_format = audio_format
+        self.events = events or EventBus()
+        self._backends = {}
+        self._backends_lock = threading.Lock()   # Job service workers share one generator
         self.output_dir = Path("output")
         self.audio_dir = self.output_dir / "audio"
         self.audio_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_cache = SegmentCache(self.audio_dir / "cache") if segment_cache else None
         
         # Voice configurations
         self.voice_configs = {
@@ -47,6 +82,16 @@ class AudioGenerator:
                 'italic_voice': 'Drew',
                 'bracket_voice': 'Clyde'
             },
+            'espeak': {
+                'normal_voice': 'en-us',
+                'italic_voice': 'en-us+m3',
+                'bracket_voice': 'en-gb'
+            },
+            'piper': {
+                'normal_voice': os.environ.get('PIPER_MODEL', 'en_US-lessac-medium.onnx'),
+                'italic_voice': os.environ.get('PIPER_MODEL', 'en_US-lessac-medium.onnx'),
+                'bracket_voice': os.environ.get('PIPER_MODEL', 'en_US-lessac-medium.onnx')
+            },
             'local': {
                 'normal_voice': 'default',
                 'italic_voice': 'default',
@@ -63,6 +108,14 @@ class AudioGenerator:
             'pause_between_pages': '2s'
         }
         
+    @staticmethod
+    def load_text_data(document_path: str) -> Dict:
+        """
+        Memory-map a text document written by PDFProcessor (process_pdf with
+        document_path) and return its text_data; pages are decoded on access
+        """
+        return load_text_data(Path(document_path))
+    
     def create_audio(self, text_data: Dict, output_name: str, 
                     voice_config: Optional[Dict] = None) -> str:
         """Create audio file from processed text data"""
@@ -73,16 +126,7 @@ class AudioGenerator:
         else:
             current_config = self.voice_configs.get(self.tts_service, self.voice_configs['local'])
         
-        ssml_content = self._create_ssml_content(text_data, current_config)
-        
-        if self.tts_service == 'polly':
-            audio_file = self._create_audio_polly(ssml_content, output_name, current_config)
-        elif self.tts_service == 'google':
-            audio_file = self._create_audio_google(ssml_content, output_name, current_config)
-        elif self.tts_service == 'elevenlabs':
-            audio_file = self._create_audio_elevenlabs(ssml_content, output_name, current_config)
-        else:
-            audio_file = self._create_audio_local(ssml_content, output_name, current_config)
+        audio_file = self._synthesize(text_data, output_name, current_config)
         
         logger.info(f"Audio file created: {audio_file}")
         return audio_file
@@ -93,49 +137,58 @@ class AudioGenerator:
     
     def create_audio_with_progress(self, text_data: Dict, output_name: str, 
                                  progress_callback: Callable[[int, str], None]) -> str:
-        """Create audio with progress tracking"""
-        progress_callback(10, "Generating SSML content...")
+        """
+        Create audio with progress tracking
+        The callback gets the real percentage of characters synthesized and an
+        ETA from measured throughput after every chunk
+        """
+        def on_event(event):
+            if event.get('source') != output_name:
+                return
+            if event['type'] == 'chunk_synthesized':
+                # Leave the last percent for joining the segments
+                percent = min(int(event['percent'] * 0.99), 99)
+                progress_callback(percent, f"Chunk {event['done']}/{event['total']} "
+                                           f"({format_eta(event['eta'])})")
+            elif event['type'] == 'stage_started' and event['stage'] == 'synthesis':
+                progress_callback(0, f"Converting text to speech ({event['total']} chunks)...")
+            elif event['type'] == 'join_started':
+                progress_callback(99, "Joining audio segments...")
         
         current_config = self.voice_configs.get(self.tts_service, self.voice_configs['local'])
-        ssml_content = self._create_ssml_content(text_data, current_config)
         
-        progress_callback(50, "Converting text to speech...")
-        
-        if self.tts_service == 'polly':
-            audio_file = self._create_audio_polly(ssml_content, output_name, current_config)
-        elif self.tts_service == 'google':
-            audio_file = self._create_audio_google(ssml_content, output_name, current_config)
-        elif self.tts_service == 'elevenlabs':
-            audio_file = self._create_audio_elevenlabs(ssml_content, output_name, current_config)
-        else:
-            audio_file = self._create_audio_local(ssml_content, output_name, current_config)
+        self.events.subscribe(on_event)
+        try:
+            audio_file = self._synthesize(text_data, output_name, current_config)
+        finally:
+            self.events.unsubscribe(on_event)
         
         progress_callback(100, "Audio generation complete!")
         return audio_file
     
     def optimize_audio_quality(self, audio_file: str) -> str:
-        """Optimize audio quality with normalization and compression"""
+        """
+        Optimize audio quality with normalization and compression
+        Decodes the book's original segments (not the already-encoded file)
+        and encodes the result once; files that are not a synthesized book
+        are decoded themselves
+        """
         try:
-            from pydub import AudioSegment
-            from pydub.effects import normalize, compress_dynamic_range
-            
             logger.info(f"Optimizing audio quality for: {audio_file}")
             
-            # Load audio
-            audio = AudioSegment.from_mp3(audio_file)
-            
-            # Normalize volume
-            audio = normalize(audio)
+            source = Path(audio_file)
+            audio_format = source.suffix.lstrip('.') or "mp3"
+            source_files = self._find_audio_sources(source.stem) or [str(source)]
+            outputs = self.export_audio(source.stem, formats=[f"{audio_format}:128k"], enhance=True,
+                                        output_base=source.with_name(f"{source.stem}_optimized"),
+                                        source_files=source_files)
             
-            # Apply light compression
-            audio = compress_dynamic_range(audio, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0)
-            
-            # Export optimized version
-            optimized_path = audio_file.replace('.mp3', '_optimized.mp3')
-            audio.export(optimized_path, format="mp3", bitrate="128k")
+            # Keep the established <stem>_optimized<suffix> name
+            optimized_path = source.with_name(f"{source.stem}_optimized{source.suffix}")
+            os.replace(outputs[f"{audio_format}:128k"], optimized_path)
             
             logger.info(f"Optimized audio saved: {optimized_path}")
-            return optimized_path
+            return str(optimized_path)
             
         except ImportError:
             logger.warning("pydub not installed. Cannot optimize audio quality.")
@@ -144,6 +197,54 @@ class AudioGenerator:
             logger.error(f"Audio optimization failed: {e}")
             return audio_file
     
+    def export_audio(self, output_name: str, formats=DEFAULT_EXPORT_FORMATS,
+                     text_data: Optional[Dict] = None, enhance: bool = False,
+                     output_base: Optional[Path] = None,
+                     source_files: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Export a synthesized book to several formats in one decode pass
+        The segments are decoded once (falling back to the joined audio file,
+        or source_files when given) and encoded in parallel; M4B files get
+        the book's chapter markers (from the chapters JSON, or computed from
+        text_data)
+        Returns {format: path}
+        """
+        segment_files = source_files or self._find_audio_sources(output_name)
+        if not segment_files:
+            raise FileNotFoundError(f"No audio found for {output_name}; synthesize it first")
+        
+        audio = decode_segments(segment_files)
+        if enhance:
+            audio = enhance_pcm(audio)
+        
+        markers = None
+        markers_file = self.audio_dir / f"{output_name}_chapters.json"
+        if text_data is not None and not markers_file.exists():
+            self.create_chapter_markers(text_data, output_name)
+        if markers_file.exists():
+            with open(markers_file, 'r', encoding='utf-8') as f:
+                markers = json.load(f)
+        
+        formats = list(formats)
+        self.events.start_stage('export', len(formats), source=output_name, formats=formats)
+        outputs = export_pcm(
+            audio, output_base or self.audio_dir / output_name, formats, markers=markers, title=output_name,
+            on_encoded=lambda spec, path: self.events.advance('export', 'format_exported', source=output_name,
+                                                              format=spec, path=path)
+        )
+        self.events.finish_stage('export', source=output_name)
+        return outputs
+    
+    def _find_audio_sources(self, output_name: str) -> List[str]:
+        """The book's segment files, else its joined audio file, else []"""
+        segment_files = find_segment_files(self.audio_dir / "segments" / output_name)
+        if segment_files:
+            return segment_files
+        joined = [self.audio_dir / f"{output_name}.{self.audio_format}"] + sorted(
+            self.audio_dir.glob(f"{output_name}.*"))
+        return [str(path) for path in joined
+                if path.exists() and path.suffix.lstrip('.') in EXPORT_PROFILES][:1]
+    
     def estimate_audio_duration(self, text_data: Dict) -> float:
         """Estimate audio duration in seconds based on text length"""
         total_chars = 0
@@ -162,14 +263,38 @@ class AudioGenerator:
     
     def get_available_voices(self) -> List[str]:
         """Get list of available voices for current TTS service"""
-        if self.tts_service == 'polly':
-            return self._get_polly_voices()
-        elif self.tts_service == 'google':
-            return self._get_google_voices()
-        elif self.tts_service == 'elevenlabs':
-            return self._get_elevenlabs_voices()
-        else:
-            return self._get_local_voices()
+        return self._get_backend().get_voices()
+    
+    def get_backend_capabilities(self) -> Dict:
+        """Get capabilities of the current TTS backend (request size, SSML, concurrency...)"""
+        return self._get_backend().capabilities()
+    
+    def plan_synthesis(self, text_data: Dict, services: Optional[List[str]] = None) -> SynthesisPlan:
+        """
+        Dry run: chunk the book for each backend without sending anything
+        Reports repeated sentences, billable characters (after dedup and
+        cache hits), estimated cost and wall time under each backend's concurrency
+        """
+        counts = count_sentences(text_data)
+        repeated_keys = find_repeated_sentences(counts)
+        repeated = sorted(((counts[key][0], counts[key][1]) for key in repeated_keys), reverse=True)
+        
+        backends = []
+        for name in services or [self.tts_service]:
+            backend = self._get_backend(name)
+            voice_config = self.voice_configs.get(name, self.voice_configs['local'])
+            chunks = self._create_chunks(text_data, voice_config, backend)
+            backends.append(plan_backend(backend, chunks, voice_config, self.segment_cache))
+        
+        total = sum(count for count, text in counts.values())
+        return SynthesisPlan(total, len(counts), repeated, backends)
+    
+    def close(self) -> None:
+        """Release TTS clients and worker pools"""
+        with self._backends_lock:
+            for backend in self._backends.values():
+                backend.close()
+            self._backends = {}
     
     def preview_ssml(self, text_data: Dict) -> str:
         """Preview the generated SSML content"""
@@ -215,6 +340,39 @@ class AudioGenerator:
         logger.info(f"Chapter markers saved: {markers_file}")
         return str(markers_file)
     
+    def create_timing_index(self, text_data: Dict, output_name: str,
+                            audio_file: Optional[str] = None,
+                            voice_config: Optional[Dict] = None) -> str:
+        """
+        Create a sentence timing index (speech marks) for read-along playback
+        Uses Polly sentence speech marks where available, otherwise estimates
+        from text length scaled to the real audio duration
+        """
+        current_config = voice_config or self.voice_configs.get(self.tts_service, self.voice_configs['local'])
+        entries = build_sentence_entries(text_data)
+        total_duration = self._get_audio_duration(audio_file) if audio_file else None
+        
+        source = 'estimate'
+        marks = self._get_speech_marks(text_data, current_config, output_name) if entries else []
+        segment_marks = self._get_segment_marks(output_name) if entries and not marks else []
+        if marks:
+            align_speech_marks(entries, marks, total_duration)
+            source = f'{self.tts_service}-speech-marks'
+        elif segment_marks:
+            # Segment boundaries are exact, sentences inside are interpolated
+            align_speech_marks(entries, segment_marks, total_duration)
+            source = 'segment-durations'
+        elif entries:
+            estimate_timings(
+                entries,
+                section_pause=parse_pause(self.speech_settings['pause_between_sections']),
+                page_pause=parse_pause(self.speech_settings['pause_between_pages']),
+                total_duration=total_duration
+            )
+        
+        index_file = self.audio_dir / f"{output_name}_timing.jsonl"
+        return write_timing_index(entries, index_file, audio_file or '', source)
+    
     def batch_process_pdfs(self, pdf_files: List[str], processor) -> List[str]:
         """Process multiple PDFs in batch"""
         audio_files = []
@@ -236,231 +394,321 @@ class AudioGenerator:
                 
         return audio_files
     
+    def _synthesize(self, text_data: Dict, output_name: str, voice_config: Dict) -> str:
+        """Synthesize with the configured backend, falling back to local TTS on failure"""
+        backend = self._get_backend()
+        if backend.name != 'local':
+            try:
+                return self._synthesize_with(backend, text_data, output_name, voice_config)
+            except ImportError as e:
+                logger.warning(f"{backend.name} TTS not available ({e}). Falling back to local TTS.")
+            except Exception as e:
+                logger.error(f"{backend.name} TTS failed: {e}. Falling back to local TTS.")
+        
+        local_config = self.voice_configs['local']
+        try:
+            return self._synthesize_with(self._get_backend('local'), text_data, output_name, local_config)
+        except ImportError:
+            logger.error("pyttsx3 not installed. Cannot create local TTS.")
+            return self._write_placeholder(text_data, output_name, "placeholder",
+                                           "TTS audio would be generated here.")
+        except Exception as e:
+            logger.error(f"Local TTS failed: {e}")
+            return self._write_placeholder(text_data, output_name, "error",
+                                           f"TTS generation failed: {e}")
+    
+    def _synthesize_with(self, backend: TTSBackend, text_data: Dict, output_name: str,
+                         voice_config: Dict) -> str:
+        """Chunk for the backend, dispatch the chunks and join the segments"""
+        chunks = self._create_chunks(text_data, voice_config, backend)
+        segment_dir = self.audio_dir / "segments" / output_name
+        requests = [request for request, spoken in chunks]
+        self._clear_segments(segment_dir)
+        self.events.start_stage('synthesis', len(requests), sum(len(request) for request in requests),
+                                source=output_name, backend=backend.name)
+        
+        if self.segment_cache is None:
+            segment_files = []
+            for index, path in backend.synthesize_chunks(requests, segment_dir, voice_config):
+                segment_files.append(path)
+                self.events.advance('synthesis', 'chunk_synthesized', len(requests[index]),
+                                    source=output_name, chunk=index)
+                logger.info(f"{backend.name} segment {index + 1}/{len(chunks)} ready: {path}")
+        else:
+            segment_files = self._synthesize_cached(backend, requests, segment_dir, voice_config, output_name)
+        self.events.finish_stage('synthesis', source=output_name)
+        
+        write_segment_manifest(segment_dir, [spoken for request, spoken in chunks], segment_files)
+        self.events.emit('join_started', source=output_name, segments=len(segment_files))
+        audio_file = join_segments(segment_files, self.audio_dir / output_name, self.audio_format)
+        self.events.emit('audio_created', source=output_name, path=audio_file)
+        return audio_file
+    
+    @staticmethod
+    def _clear_segments(segment_dir: Path) -> None:
+        """Remove an earlier run's segments and manifest (the cache keeps the audio)"""
+        if not segment_dir.exists():
+            return
+        for path in segment_dir.glob('[0-9]*.*'):
+            path.unlink()
+        manifest_path = segment_dir / SEGMENT_MANIFEST
+        if manifest_path.exists():
+            manifest_path.unlink()
+    
+    def _synthesize_cached(self, backend: TTSBackend, requests: List[str], segment_dir: Path,
+                           voice_config: Dict, output_name: str = '') -> List[str]:
+        """
+        Synthesize each distinct request once; repeats and requests cached by
+        earlier runs are linked into the segment directory from the cache
+        """
+        cache = self.segment_cache
+        extension = backend.output_formats[0]
+        keys = [cache.key(backend.name, request, voice_config, self.speech_settings) for request in requests]
+        segment_files = [str(segment_dir / f"{index:05d}.{extension}") for index in range(len(requests))]
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Indices of every chunk sharing a key, in first-occurrence order
+        uses = {}
+        for index, key in enumerate(keys):
+            uses.setdefault(key, []).append(index)
+        
+        missing = []
+        for key, indices in uses.items():
+            cached = cache.get(key, extension)
+            if cached:
+                for index in indices:
+                    segment_files[index] = cache.link(cached, segment_files[index])
+                    self.events.advance('synthesis', 'chunk_synthesized', len(requests[index]),
+                                        measured=False, source=output_name, chunk=index, cached=True)
+            else:
+                missing.append(key)
+        logger.info(f"{backend.name}: {len(requests)} requests, {len(uses)} distinct, "
+                    f"{len(missing)} to synthesize")
+        
+        pending_dir = segment_dir / "pending"
+        missing_requests = [requests[uses[key][0]] for key in missing]
+        for position, path in backend.synthesize_chunks(missing_requests, pending_dir, voice_config):
+            key = missing[position]
+            cached = cache.put(key, path)
+            for repeat, index in enumerate(uses[key]):
+                segment_files[index] = cache.link(cached, segment_dir / f"{index:05d}{Path(cached).suffix}")
+                # Only the first use took synthesis time
+                self.events.advance('synthesis', 'chunk_synthesized', len(requests[index]),
+                                    measured=repeat == 0, source=output_name, chunk=index,
+                                    cached=repeat > 0)
+            logger.info(f"{backend.name} request {position + 1}/{len(missing)} ready "
+                        f"(used {len(uses[key])}x)")
+        
+        if pending_dir.exists():
+            shutil.rmtree(pending_dir, ignore_errors=True)
+        return segment_files
+    
+    def _get_backend(self, name: Optional[str] = None) -> TTSBackend:
+        """Get the long-lived backend instance for a TTS service"""
+        name = name or self.tts_service
+        with self._backends_lock:
+            if name not in self._backends:
+                backend = get_backend(name, speech_settings=self.speech_settings)
+                if backend.offline and self.local_workers:
+                    # Set before the client is created so pools are sized to match
+                    backend.max_concurrency = self.local_workers
+                self._backends[name] = backend
+            return self._backends[name]
+    
+    def _create_chunks(self, text_data: Dict, voice_config: Dict,
+                       backend: TTSBackend) -> List[Tuple[str, str]]:
+        """
+        Split the book into requests sized for the backend
+        SSML backends get whole <speak> documents, others get plain text
+        Returns (request_text, spoken_text) per chunk
+        """
+        max_chars = backend.max_request_chars
+        isolate = self._repeat_filter(text_data)
+        if not backend.supports_ssml:
+            plain_text = self._render_ssml(text_data, voice_config)[1]
+            return [(segment, segment) for segment in split_into_segments(plain_text, max_chars, isolate)]
+        
+        max_part_chars = max_chars - len('<speak></speak>')
+        parts = self._create_ssml_parts(text_data, voice_config, max_part_chars=max_part_chars,
+                                        isolate=isolate)
+        return list(iter_chunks(parts, max_chars))
+    
+    def _repeat_filter(self, text_data: Dict) -> Optional[Callable[[str], bool]]:
+        """
+        Predicate for sentences that repeat in the book; the chunker sends each
+        of them as its own request so the segment cache can reuse the audio
+        """
+        if self.segment_cache is None:
+            return None
+        repeated = find_repeated_sentences(count_sentences(text_data))
+        if not repeated:
+            return None
+        return lambda sentence: sentence_key(sentence) in repeated
+    
     def _create_ssml_content(self, text_data: Dict, voice_config: Dict) -> str:
         """Create SSML content with different voices for different text types"""
-        ssml_parts = ['<speak>']
-        ssml_parts.append('<break time="1s"/>')
+        return self._render_ssml(text_data, voice_config)[0]
+    
+    def _render_ssml(self, text_data: Dict, voice_config: Dict) -> Tuple[str, str]:
+        """Render the whole book in one pass as (ssml, plain_text)"""
+        parts = self._create_ssml_parts(text_data, voice_config)
+        return render_ssml([node for part in parts for node in part])
+    
+    def _create_ssml_parts(self, text_data: Dict, voice_config: Dict,
+                           max_part_chars: Optional[int] = None,
+                           isolate: Optional[Callable[[str], bool]] = None) -> List[List[SSMLNode]]:
+        """
+        Create the SSML body as a list of self-contained node lists
+        With max_part_chars, long page text is split at sentence boundaries
+        so each part (markup included) fits in one TTS request; sentences
+        matching isolate become Isolated parts (a request of their own)
+        """
+        pause_between_sections = self.speech_settings["pause_between_sections"]
+        ssml_parts = [[Break('1s')]]
         
         for page_num, page_data in enumerate(text_data['pages'], 1):
             if len(text_data['pages']) > 1:
-                ssml_parts.append(
-                    f'<voice name="{voice_config["normal_voice"]}">'
-                    f'<break time="0.5s"/>Page {page_num}<break time="1s"/>'
-                    f'</voice>'
-                )
+                ssml_parts.append([
+                    Voice(Break('0.5s'), f'Page {page_num}', Break('1s'), name=voice_config["normal_voice"])
+                ])
             
             regular_text = page_data.get('regular_text', '').strip()
             if regular_text:
-                regular_text = self._process_bracketed_content(regular_text, voice_config)
-                ssml_parts.append(
-                    f'<voice name="{voice_config["normal_voice"]}">'
-                    f'<prosody rate="{self.speech_settings["rate"]}" '
-                    f'pitch="{self.speech_settings["pitch"]}">'
-                    f'{regular_text}'
-                    f'</prosody></voice>'
-                )
-                ssml_parts.append(f'<break time="{self.speech_settings["pause_between_sections"]}"/>')
+                def wrap_regular(text):
+                    return self._process_bracketed_content(text, voice_config)
+                ssml_parts.extend(self._wrap_sentence_groups(regular_text, wrap_regular, max_part_chars, isolate))
+                ssml_parts.append([Break(pause_between_sections)])
             
             italic_text = page_data.get('italic_text', '').strip()
             if italic_text:
-                ssml_parts.append(
-                    f'<voice name="{voice_config["italic_voice"]}">'
-                    f'<prosody rate="slow" pitch="low">'
-                    f'<emphasis level="moderate">{italic_text}</emphasis>'
-                    f'</prosody></voice>'
-                )
-                ssml_parts.append(f'<break time="{self.speech_settings["pause_between_sections"]}"/>')
+                def wrap_italic(text):
+                    return [Voice(
+                        Prosody(Emphasis(text, level='moderate'), rate='slow', pitch='low'),
+                        name=voice_config["italic_voice"]
+                    )]
+                ssml_parts.extend(self._wrap_sentence_groups(italic_text, wrap_italic, max_part_chars, isolate))
+                ssml_parts.append([Break(pause_between_sections)])
             
             if page_num < len(text_data['pages']):
-                ssml_parts.append(f'<break time="{self.speech_settings["pause_between_pages"]}"/>')
-        
-        ssml_parts.append('</speak>')
-        ssml_content = ''.join(ssml_parts)
-        return self._clean_ssml(ssml_content)
-    
-    def _process_bracketed_content(self, text: str, voice_config: Dict) -> str:
-        """Process text to handle bracketed content with different voice"""
-        bracket_pattern = r'\[([^\]]+)\]'
-        
-        def replace_bracket(match):
-            bracket_content = match.group(1)
-            return (f'</prosody></voice>'
-                   f'<voice name="{voice_config["bracket_voice"]}">'
-                   f'<prosody rate="slow" pitch="high">'
-                   f'<emphasis level="strong">{bracket_content}</emphasis>'
-                   f'</prosody></voice>'
-                   f'<voice name="{voice_config["normal_voice"]}">'
-                   f'<prosody rate="{self.speech_settings["rate"]}" '
-                   f'pitch="{self.speech_settings["pitch"]}">')
-        
-        return re.sub(bracket_pattern, replace_bracket, text)
-    
-    def _clean_ssml(self, ssml: str) -> str:
-        """Clean up SSML content"""
-        ssml = re.sub(r'<voice[^>]*></voice>', '', ssml)
-        ssml = re.sub(r'<prosody[^>]*></prosody>', '', ssml)
-        ssml = re.sub(r'(<break[^>]*/>[\s]*){2,}', r'<break time="2s"/>', ssml)
-        ssml = re.sub(r'\s+', ' ', ssml)
-        return ssml.strip()
-    
-    def _create_audio_polly(self, ssml_content: str, output_name: str, voice_config: Dict) -> str:
-        """Create audio using Amazon Polly"""
-        try:
-            import boto3
-            polly = boto3.client('polly')
-            
-            response = polly.synthesize_speech(
-                Text=ssml_content,
-                OutputFormat='mp3',
-                VoiceId=voice_config['normal_voice'],
-                Engine=voice_config.get('engine', 'neural'),
-                TextType='ssml'
-            )
-            
-            output_path = self.audio_dir / f"{output_name}.mp3"
-            with open(output_path, 'wb') as file:
-                file.write(response['AudioStream'].read())
-            
-            return str(output_path)
-            
-        except ImportError:
-            logger.warning("boto3 not installed. Falling back to local TTS.")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
-        except Exception as e:
-            logger.error(f"Polly TTS failed: {e}")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
+                ssml_parts.append([Break(self.speech_settings["pause_between_pages"])])
+        
+        return ssml_parts
     
-    def _create_audio_google(self, ssml_content: str, output_name: str, voice_config: Dict) -> str:
-        """Create audio using Google Cloud TTS"""
-        try:
-            from google.cloud import texttospeech
-            
-            client = texttospeech.TextToSpeechClient()
-            synthesis_input = texttospeech.SynthesisInput(ssml=ssml_content)
-            
-            voice = texttospeech.VoiceSelectionParams(
-                language_code="en-US",
-                name=voice_config['normal_voice']
-            )
-            
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            )
-            
-            response = client.synthesize_speech(
-                input=synthesis_input,
-                voice=voice,
-                audio_config=audio_config
+    def _wrap_sentence_groups(self, text: str, wrap: Callable[[str], List[SSMLNode]],
+                              max_part_chars: Optional[int],
+                              isolate: Optional[Callable[[str], bool]] = None) -> List[List[SSMLNode]]:
+        """Wrap text as one part, or as sentence groups whose markup fits max_part_chars"""
+        if not max_part_chars:
+            return [wrap(text)]
+        
+        parts = []
+        group = ''
+        wrapped = []
+        # Sentence-sized pieces; markup can be much longer than the text it wraps
+        for sentence in split_into_segments(text, max(max_part_chars // 8, 1), isolate):
+            if isolate and isolate(sentence):
+                if group:
+                    parts.append(wrapped)
+                    group, wrapped = '', []
+                parts.append(Isolated(wrap(sentence)))
+                continue
+            candidate = f'{group} {sentence}' if group else sentence
+            candidate_wrapped = wrap(candidate)
+            if group and estimate_nodes_length(candidate_wrapped) > max_part_chars:
+                parts.append(wrapped)
+                group, wrapped = sentence, wrap(sentence)
+            else:
+                group, wrapped = candidate, candidate_wrapped
+        if group:
+            parts.append(wrapped)
+        return parts
+    
+    def _process_bracketed_content(self, text: str, voice_config: Dict) -> List[SSMLNode]:
+        """
+        Nodes for regular text: runs in the normal voice, with [bracketed]
+        content as sibling nodes in the bracket voice
+        """
+        def normal(run):
+            return Voice(
+                Prosody(run, rate=self.speech_settings["rate"], pitch=self.speech_settings["pitch"]),
+                name=voice_config["normal_voice"]
             )
-            
-            output_path = self.audio_dir / f"{output_name}.mp3"
-            with open(output_path, 'wb') as file:
-                file.write(response.audio_content)
-            
-            return str(output_path)
-            
-        except ImportError:
-            logger.warning("Google Cloud TTS not available. Falling back to local TTS.")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
-        except Exception as e:
-            logger.error(f"Google TTS failed: {e}")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
+        
+        nodes = []
+        position = 0
+        for match in BRACKET_PATTERN.finditer(text):
+            if match.start() > position:
+                nodes.append(normal(text[position:match.start()]))
+            nodes.append(Voice(
+                Prosody(Emphasis(match.group(1), level='strong'), rate='slow', pitch='high'),
+                name=voice_config["bracket_voice"]
+            ))
+            position = match.end()
+        if position < len(text):
+            nodes.append(normal(text[position:]))
+        return nodes
     
-    def _create_audio_elevenlabs(self, ssml_content: str, output_name: str, voice_config: Dict) -> str:
-        """Create audio using ElevenLabs TTS"""
-        try:
-            import requests
-            
-            # Convert SSML to plain text for ElevenLabs
-            plain_text = self._ssml_to_plain_text(ssml_content)
-            
-            # ElevenLabs API call would go here
-            # For now, fall back to local TTS
-            logger.warning("ElevenLabs TTS not fully implemented. Using local TTS.")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
-            
-        except Exception as e:
-            logger.error(f"ElevenLabs TTS failed: {e}")
-            return self._create_audio_local(ssml_content, output_name, voice_config)
+    def _write_placeholder(self, text_data: Dict, output_name: str, suffix: str, message: str) -> str:
+        """Write a text placeholder when no audio could be generated"""
+        plain_text = self._render_ssml(text_data, self.voice_configs['local'])[1]
+        output_path = self.audio_dir / f"{output_name}_{suffix}.txt"
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(f"{message}\n")
+            f.write(f"Text content:\n{plain_text}")
+        return str(output_path)
     
-    def _create_audio_local(self, ssml_content: str, output_name: str, voice_config: Dict) -> str:
-        """Create audio using local TTS (pyttsx3 or espeak)"""
+    def _get_speech_marks(self, text_data: Dict, voice_config: Dict, output_name: str) -> List[Dict]:
+        """
+        Get sentence speech marks from the backend, chunk by chunk
+        Chunk marks are shifted by the chunk start times recorded at synthesis
+        """
+        backend = self._get_backend()
+        if not backend.supports_speech_marks:
+            return []
         try:
-            import pyttsx3
-            
-            # Convert SSML to plain text
-            plain_text = self._ssml_to_plain_text(ssml_content)
-            
-            # Initialize TTS engine
-            engine = pyttsx3.init()
-            
-            # Configure voice settings
-            voices = engine.getProperty('voices')
-            if voices:
-                engine.setProperty('voice', voices[0].id)
-            
-            engine.setProperty('rate', 150)  # Speed
-            engine.setProperty('volume', 0.9)  # Volume
-            
-            # Save to file
-            output_path = self.audio_dir / f"{output_name}.mp3"
-            engine.save_to_file(plain_text, str(output_path))
-            engine.runAndWait()
-            
-            return str(output_path)
+            chunks = self._create_chunks(text_data, voice_config, backend)
+            chunk_starts = [mark['time'] for mark in self._get_segment_marks(output_name)]
+            
+            marks = []
+            chunk_start = 0
+            for index, (request, spoken) in enumerate(chunks):
+                if index < len(chunk_starts):
+                    chunk_start = chunk_starts[index]
+                chunk_marks = backend.get_speech_marks(request, voice_config)
+                for mark in chunk_marks:
+                    mark['time'] += chunk_start
+                marks.extend(chunk_marks)
+                if chunk_marks and index + 1 >= len(chunk_starts):
+                    # No recorded start for the next chunk: estimate from the last sentence
+                    last = chunk_marks[-1]
+                    chunk_start = last['time'] + int(len(last.get('value', '')) / CHARS_PER_SECOND * 1000)
+            return marks
             
         except ImportError:
-            logger.error("pyttsx3 not installed. Cannot create local TTS.")
-            # Create a placeholder file
-            output_path = self.audio_dir / f"{output_name}_placeholder.txt"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("TTS audio would be generated here.\n")
-                f.write(f"Text content:\n{self._ssml_to_plain_text(ssml_content)}")
-            return str(output_path)
+            logger.warning(f"{backend.name} SDK not installed. Estimating timing index instead.")
+            return []
         except Exception as e:
-            logger.error(f"Local TTS failed: {e}")
-            # Create a placeholder file
-            output_path = self.audio_dir / f"{output_name}_error.txt"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(f"TTS generation failed: {e}\n")
-                f.write(f"Text content:\n{self._ssml_to_plain_text(ssml_content)}")
-            return str(output_path)
-    
-    def _ssml_to_plain_text(self, ssml_content: str) -> str:
-        """Convert SSML to plain text by removing tags"""
-        # Remove SSML tags
-        plain_text = re.sub(r'<[^>]+>', '', ssml_content)
-        # Clean up whitespace
-        plain_text = re.sub(r'\s+', ' ', plain_text)
-        return plain_text.strip()
-    
-    def _get_polly_voices(self) -> List[str]:
-        """Get available Polly voices"""
-        try:
-            import boto3
-            polly = boto3.client('polly')
-            response = polly.describe_voices()
-            return [voice['Id'] for voice in response['Voices'] if voice['LanguageCode'].startswith('en')]
-        except Exception:
-            return ['Joanna', 'Matthew', 'Amy', 'Brian', 'Emma']
-    
-    def _get_google_voices(self) -> List[str]:
-        """Get available Google voices"""
-        return ['en-US-Standard-A', 'en-US-Standard-B', 'en-US-Standard-C', 'en-US-Standard-D']
-    
-    def _get_elevenlabs_voices(self) -> List[str]:
-        """Get available ElevenLabs voices"""
-        return ['Rachel', 'Drew', 'Clyde', 'Paul', 'Domi']
-    
-    def _get_local_voices(self) -> List[str]:
-        """Get available local voices"""
-        try:
-            import pyttsx3
-            engine = pyttsx3.init()
-            voices = engine.getProperty('voices')
-            return [voice.id for voice in voices] if voices else ['default']
-        except Exception:
-            return ['default']
+            logger.error(f"{backend.name} speech marks failed: {e}")
+            return []
+    
+    def _get_audio_duration(self, audio_file: str) -> Optional[float]:
+        """Get the real duration of an audio file in seconds, if it can be read"""
+        return get_audio_duration(audio_file)
+    
+    def _get_segment_marks(self, output_name: str) -> List[Dict]:
+        """Load segment start times recorded during synthesis, if any"""
+        manifest_path = self.audio_dir / "segments" / output_name / SEGMENT_MANIFEST
+        if not manifest_path.exists():
+            return []
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        # Times stop at the first segment whose duration couldn't be read
+        marks = []
+        for mark in manifest:
+            if mark['time'] is None:
+                break
+            marks.append(mark)
+        return marks
     
     def _seconds_to_vtt_time(self, seconds: float) -> str:
         """Convert seconds to VTT time format"""
@@ -506,4 +754,8 @@ if __name__ == "__main__":
     markers_file = audio_gen.create_chapter_markers(sample_text_data, "test_chapters")
     print(f"📑 Chapter markers: {markers_file}")
     
+    # Test timing index for read-along playback
+    timing_file = audio_gen.create_timing_index(sample_text_data, "test_audio", audio_file)
+    print(f"⏱️ Timing index: {timing_file}")
+    
     print("✅ Audio Generator test complete!")
\ No newline at end of file
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+CLI - Command-line entry point for the PDF-to-voice pipeline
+Runs only the selected stages and reuses intermediates from earlier runs:
+OCR output is kept as a text document (output/text/<name>.ptvd), and the
+text, HTML and audio of a book are only rebuilt when missing, older than
+their inputs or made with other settings (DPI, OCR options, backend,
+normalization)
+
+Usage:
+    python cli.py "input/*.pdf"
+    python cli.py input/book.pdf --stages ocr,html
+    python cli.py "input/**/*.pdf" --stages audio,chapters --backend polly --max-cost 5
+    python cli.py input/book.pdf --stages audio,optimize --backend local --workers 4 --format wav
+    python cli.py input/book.pdf --stages audio,chapters,export --export-formats mp3,opus,m4b
+"""
+
+import json
+import time
+import glob
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from text_document import DOCUMENT_SUFFIX, load_text_data
+from events import EventBus, format_eta
+from audio_export import DEFAULT_EXPORT_FORMATS, output_path, parse_format
+from ocr_engines import OCR_ENGINES
+from easyocr_onnx import EASYOCR_BACKENDS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAGES = ('ocr', 'html', 'ssml', 'audio', 'optimize', 'chapters', 'export')
+DEFAULT_STAGES = ('ocr', 'html', 'audio', 'chapters')
+
+OUTPUT_DIR = Path("output")
+TEXT_DIR = OUTPUT_DIR / "text"
+SSML_DIR = OUTPUT_DIR / "ssml"
+
+# Seconds between console progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Expand globs (including **) into a sorted, de-duplicated list of PDFs"""
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for path in sorted(matches):
+            if path.lower().endswith('.pdf') and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def parse_stages(value: str) -> List[str]:
+    stages = [stage.strip() for stage in value.split(',') if stage.strip()]
+    if stages == ['all']:
+        return list(STAGES)
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return stages
+
+
+class ConsoleProgress:
+    """Prints a progress line per stage at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL):
+        self.interval = interval
+        self.last_printed = 0.0
+
+    def __call__(self, event: Dict) -> None:
+        if event['type'] in ('page_processed', 'chunk_synthesized'):
+            now = time.monotonic()
+            if now - self.last_printed < self.interval and event['done'] < event['total']:
+                return
+            self.last_printed = now
+            print(f"   {event['stage']:<10} {event['done']}/{event['total']} "
+                  f"({event['percent']:.0f}%, {format_eta(event['eta'])})")
+
+
+def parse_export_formats(value: str) -> List[str]:
+    formats = [spec.strip() for spec in value.split(',') if spec.strip()]
+    try:
+        for spec in formats:
+            parse_format(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return formats
+
+
+def settings_path(output_path: Path) -> Path:
+    """output/audio/book.mp3 -> output/audio/book.mp3.settings.json"""
+    return output_path.with_name(output_path.name + '.settings.json')
+
+
+def record_settings(output_path: Path, settings: Dict) -> None:
+    """Store the settings an output was made with, for is_fresh"""
+    with open(settings_path(Path(output_path)), 'w', encoding='utf-8') as f:
+        json.dump(settings, f, sort_keys=True)
+
+
+def is_fresh(output_path: Path, *inputs: Path, settings: Optional[Dict] = None) -> bool:
+    """
+    True if output_path exists and is newer than every existing input
+    With settings, they must also equal the ones recorded for the output
+    """
+    if not output_path.exists():
+        return False
+    mtime = output_path.stat().st_mtime
+    if not all(mtime >= Path(path).stat().st_mtime for path in inputs if path and Path(path).exists()):
+        return False
+    if settings is None:
+        return True
+    recorded = settings_path(output_path)
+    if not recorded.exists():
+        return False
+    with open(recorded, 'r', encoding='utf-8') as f:
+        return json.load(f) == json.loads(json.dumps(settings))
+
+
+class Pipeline:
+    """Runs selected stages for each PDF, sharing one processor and generator"""
+
+    def __init__(self, stages: List[str], tts_service: str = 'local', workers: Optional[int] = None,
+                 dpi: int = 300, audio_format: str = 'mp3', force: bool = False, normalize: bool = True,
+                 pages_per_shard: Optional[int] = None, max_cost: Optional[float] = None,
+                 events: Optional[EventBus] = None, export_formats: Optional[List[str]] = None,
+                 ocr_engine: str = 'auto', ocr_workers: int = 1, layout: bool = True,
+                 skip_pages: bool = True, refine: Optional[str] = 'tesseract',
+                 easyocr_backend: str = 'torch', easyocr_threads: Optional[int] = None):
+        self.stages = stages
+        self.tts_service = tts_service
+        self.workers = workers
+        self.dpi = dpi
+        self.audio_format = audio_format
+        self.force = force
+        self.normalize = normalize
+        self.pages_per_shard = pages_per_shard
+        self.max_cost = max_cost
+        self.events = events or EventBus()
+        self.export_formats = export_formats or list(DEFAULT_EXPORT_FORMATS)
+        self.ocr_engine = ocr_engine
+        self.ocr_workers = ocr_workers
+        self.layout = layout
+        self.skip_pages = skip_pages
+        self.refine = refine
+        self.easyocr_backend = easyocr_backend
+        self.easyocr_threads = easyocr_threads
+        self._processor = None
+        self._generator = None
+
+    @property
+    def processor(self):
+        """Created on first OCR so cached runs never load the OCR models"""
+        if self._processor is None:
+            from pdf_processor import PDFProcessor
+            self._processor = PDFProcessor(dpi=self.dpi, events=self.events, ocr_engine=self.ocr_engine,
+                                           ocr_workers=self.ocr_workers, layout=self.layout,
+                                           skip_pages=self.skip_pages, refine=self.refine,
+                                           easyocr_backend=self.easyocr_backend,
+                                           easyocr_threads=self.easyocr_threads)
+        return self._processor
+
+    @property
+    def generator(self):
+        if self._generator is None:
+            from audio_generator import AudioGenerator
+            self._generator = AudioGenerator(tts_service=self.tts_service, local_workers=self.workers,
+                                             audio_format=self.audio_format, events=self.events)
+        return self._generator
+
+    def close(self) -> None:
+        if self._processor is not None:
+            self._processor.close()
+        if self._generator is not None:
+            self._generator.close()
+
+    def run(self, pdf_path: str) -> Dict[str, str]:
+        """Run the selected stages for one PDF; returns the files produced or reused"""
+        name = Path(pdf_path).stem
+        text_path = TEXT_DIR / f"{name}{DOCUMENT_SUFFIX}"
+        html_path = OUTPUT_DIR / "html" / f"{name}.html"
+        audio_path = OUTPUT_DIR / "audio" / f"{name}.{self.audio_format}"
+        outputs = {}
+
+        html_settings = {'normalize': self.normalize}
+        audio_settings = {'backend': self.tts_service, 'normalize': self.normalize}
+
+        text_data = None
+        if set(self.stages) - {'optimize', 'export'}:
+            text_data, ocr_html = self._get_text_data(pdf_path, name, text_path, self.ocr_settings)
+            outputs['text'] = str(text_path)
+            # The OCR preview shows raw text; with normalization the html stage
+            # re-renders it so its offsets match the timing index
+            if ocr_html and (self.pages_per_shard or not (self.normalize and 'html' in self.stages)):
+                outputs['html'] = ocr_html
+
+        if text_data is not None and self.normalize:
+            from text_normalizer import normalize_text_data
+            text_data = normalize_text_data(text_data)
+
+        if 'html' in self.stages and 'html' not in outputs:
+            if self.force or not is_fresh(html_path, text_path, settings=html_settings):
+                html_content = self.processor.render_html(text_data)
+                outputs['html'] = self.processor.save_html(html_content, name)
+                record_settings(html_path, html_settings)
+            else:
+                logger.info(f"Reusing HTML: {html_path}")
+                outputs['html'] = str(html_path)
+
+        if 'ssml' in self.stages:
+            SSML_DIR.mkdir(parents=True, exist_ok=True)
+            ssml_path = SSML_DIR / f"{name}.ssml"
+            ssml_path.write_text(self.generator.preview_ssml(text_data), encoding='utf-8')
+            outputs['ssml'] = str(ssml_path)
+
+        if 'audio' in self.stages:
+            if self.force or not is_fresh(audio_path, text_path, settings=audio_settings):
+                plan = self.generator.plan_synthesis(text_data)
+                print(plan)
+                if self.max_cost is not None:
+                    plan.check(self.tts_service, max_cost=self.max_cost)
+                outputs['audio'] = self.generator.create_audio(text_data, name)
+                record_settings(audio_path, audio_settings)
+            else:
+                logger.info(f"Reusing audio: {audio_path}")
+                outputs['audio'] = str(audio_path)
+        elif audio_path.exists():
+            outputs['audio'] = str(audio_path)
+
+        if 'optimize' in self.stages:
+            if 'audio' not in outputs:
+                raise FileNotFoundError(f"No audio to optimize for {name}; run the audio stage first")
+            outputs['optimized'] = self.generator.optimize_audio_quality(outputs['audio'])
+
+        if 'chapters' in self.stages:
+            outputs['chapters'] = self.generator.create_chapter_markers(text_data, name)
+            outputs['timing'] = self.generator.create_timing_index(text_data, name, outputs.get('audio'))
+            if 'html' in self.stages and outputs.get('audio') and not self.pages_per_shard:
+                # Same text as the timing index, so the read-along player seeks to the right sentence
+                html_content = self.processor.render_html(text_data)
+                outputs['html'] = self.processor.save_html(html_content, name, outputs['audio'], outputs['timing'])
+                record_settings(html_path, html_settings)
+
+        if 'export' in self.stages:
+            if 'audio' not in outputs:
+                raise FileNotFoundError(f"No audio to export for {name}; run the audio stage first")
+            exports = {spec: output_path(OUTPUT_DIR / "audio" / name, spec) for spec in self.export_formats}
+            stale = [spec for spec, path in exports.items() if self.force or not is_fresh(path, outputs['audio'])]
+            if stale:
+                exports.update(self.generator.export_audio(name, stale, text_data))
+            for spec, path in exports.items():
+                outputs[f"export {spec}"] = str(path)
+
+        return outputs
+
+    @property
+    def ocr_settings(self) -> Dict:
+        """Options that change the OCR text (not just how fast it is made)"""
+        return {'dpi': self.dpi, 'ocr_engine': self.ocr_engine, 'layout': self.layout,
+                'skip_pages': self.skip_pages, 'refine': self.refine, 'easyocr_backend': self.easyocr_backend}
+
+    def _get_text_data(self, pdf_path: str, name: str, text_path: Path, ocr_settings: Dict):
+        """
+        Load cached OCR text made with the same settings, or OCR the PDF
+        (also writing the HTML preview)
+        Returns (text_data, path of the HTML written by OCR or None)
+        """
+        if not self.force and is_fresh(text_path, Path(pdf_path), settings=ocr_settings):
+            logger.info(f"Reusing OCR text: {text_path}")
+            return load_text_data(text_path), None
+
+        if 'ocr' not in self.stages:
+            logger.info(f"No cached OCR text for {name}; running OCR")
+        html_file, text_data = self.processor.process_pdf_to_html(
+            pdf_path, name, self.pages_per_shard, document_path=str(text_path)
+        )
+        record_settings(text_path, ocr_settings)
+        return text_data, html_file
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Convert scanned PDFs to HTML previews and audiobooks",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('inputs', nargs='*', default=['input/*.pdf'],
+                        help="PDF files or glob patterns (quote globs; ** recurses)")
+    parser.add_argument('--stages', type=parse_stages, default=list(DEFAULT_STAGES),
+                        help=f"Comma-separated stages to run: {', '.join(STAGES)} or 'all'")
+    parser.add_argument('--backend', default='local',
+                        help="TTS service: polly, google, elevenlabs, espeak, piper, local")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Local TTS worker processes (default: CPU count)")
+    parser.add_argument('--dpi', type=int, default=300, help="Rasterization DPI for OCR")
+    parser.add_argument('--ocr-engine', choices=OCR_ENGINES, default='auto',
+                        help="tesserocr keeps Tesseract loaded between pages; pytesseract runs it per page")
+    parser.add_argument('--ocr-workers', type=int, default=1,
+                        help="OCR worker processes (pages are passed through shared memory)")
+    parser.add_argument('--no-layout', dest='layout', action='store_false',
+                        help="OCR whole pages as one block instead of detected text regions and columns")
+    parser.add_argument('--no-skip-pages', dest='skip_pages', action='store_false',
+                        help="OCR blank and repeated pages too")
+    parser.add_argument('--refine', choices=('tesseract', 'easyocr', 'off'), default='tesseract',
+                        help="Second pass over upsampled low-confidence lines ('off' to skip)")
+    parser.add_argument('--easyocr-backend', choices=EASYOCR_BACKENDS, default='torch',
+                        help="Run EasyOCR on PyTorch or on ONNX Runtime with an int8 recognizer")
+    parser.add_argument('--easyocr-threads', type=int, default=None,
+                        help="EasyOCR intra-op threads per OCR worker (default: cores / --ocr-workers)")
+    parser.add_argument('--format', dest='audio_format', default='mp3',
+                        help="Audio format: mp3, wav, ogg, flac (non-WAV formats need pydub/ffmpeg)")
+    parser.add_argument('--pages-per-shard', type=int, default=None,
+                        help="Write a paginated HTML preview with this many pages per shard")
+    parser.add_argument('--export-formats', type=parse_export_formats, default=list(DEFAULT_EXPORT_FORMATS),
+                        help="Formats for the export stage, e.g. mp3,opus,m4b or mp3:128k")
+    parser.add_argument('--max-cost', type=float, default=None,
+                        help="Refuse to synthesize a book whose estimated cost exceeds this (USD)")
+    parser.add_argument('--no-normalize', dest='normalize', action='store_false',
+                        help="Send OCR text to TTS without normalization")
+    parser.add_argument('--force', action='store_true', help="Ignore cached intermediates")
+    parser.add_argument('--events-log', default=None,
+                        help="Append pipeline events (pages, chunks, ETA) to this JSON-lines file")
+    parser.add_argument('--quiet', action='store_true', help="Don't print per-stage progress lines")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    pdf_paths = expand_inputs(args.inputs)
+    if not pdf_paths:
+        print(f"❌ No PDFs match: {' '.join(args.inputs)}")
+        return 1
+
+    events = EventBus()
+    if not args.quiet:
+        events.subscribe(ConsoleProgress())
+    events_log = events.log_to(Path(args.events_log)) if args.events_log else None
+
+    pipeline = Pipeline(
+        args.stages, tts_service=args.backend, workers=args.workers, dpi=args.dpi,
+        audio_format=args.audio_format, force=args.force, normalize=args.normalize,
+        pages_per_shard=args.pages_per_shard, max_cost=args.max_cost, events=events,
+        export_formats=args.export_formats, ocr_engine=args.ocr_engine, ocr_workers=args.ocr_workers,
+        layout=args.layout, skip_pages=args.skip_pages,
+        refine=None if args.refine == 'off' else args.refine,
+        easyocr_backend=args.easyocr_backend, easyocr_threads=args.easyocr_threads
+    )
+    failures = 0
+    try:
+        for pdf_path in pdf_paths:
+            print(f"📚 {pdf_path} ({', '.join(args.stages)})")
+            try:
+                for kind, path in pipeline.run(pdf_path).items():
+                    print(f"   {kind:<10} {path}")
+            except Exception as e:
+                failures += 1
+                logger.error(f"Failed to process {pdf_path}: {e}")
+    finally:
+        pipeline.close()
+        if events_log is not None:
+            events_log.close()
+
+    print(f"✅ {len(pdf_paths) - failures}/{len(pdf_paths)} PDFs processed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Confidence Index - Per-document index of low-confidence OCR words and pages
+Every OCR'd word keeps its confidence (0-100: Tesseract's x_wconf, EasyOCR's
+score x 100). The index keeps per-page statistics, every word below
+LOW_CONFIDENCE with its box, and the EasyOCR detections dropped by the
+confidence filter, so review and re-OCR can go straight to the pages and
+lines that need it instead of reprocessing whole documents
+
+The index is built while pages are OCR'd, or afterwards from a text
+document (.ptvd), and saved as <name>.confidence.json next to it
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Words below this confidence are indexed
+LOW_CONFIDENCE = 60
+# A page needs review if its mean confidence is below REVIEW_MEAN or more
+# than REVIEW_LOW_FRACTION of its scored words are low-confidence
+REVIEW_MEAN = 75
+REVIEW_LOW_FRACTION = 0.1
+
+CONFIDENCE_SUFFIX = '.confidence.json'
+
+
+def page_statistics(words: Iterable[Dict], low_confidence: int = LOW_CONFIDENCE) -> Dict:
+    """Word count, scored words, mean confidence and low-confidence count of one page"""
+    scores = [word['conf'] for word in words if word.get('conf') is not None]
+    words_total = len(scores)
+    low = sum(1 for score in scores if score < low_confidence)
+    return {
+        'scored_words': words_total,
+        'mean_confidence': round(sum(scores) / words_total, 1) if words_total else None,
+        'low_words': low,
+        'low_fraction': round(low / words_total, 3) if words_total else 0.0
+    }
+
+
+def merge_boxes(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """Merge boxes that share vertical extent (words of one line) into line boxes"""
+    merged = []
+    for x0, y0, x1, y1 in sorted(boxes, key=lambda box: (box[1], box[0])):
+        if merged:
+            mx0, my0, mx1, my1 = merged[-1]
+            overlap = min(y1, my1) - max(y0, my0)
+            if overlap > 0.5 * min(y1 - y0, my1 - my0):
+                merged[-1] = (min(x0, mx0), min(y0, my0), max(x1, mx1), max(y1, my1))
+                continue
+        merged.append((x0, y0, x1, y1))
+    return merged
+
+
+class ConfidenceIndex:
+    """Low-confidence words and per-page statistics of one document"""
+
+    def __init__(self, low_confidence: int = LOW_CONFIDENCE, review_mean: float = REVIEW_MEAN,
+                 review_low_fraction: float = REVIEW_LOW_FRACTION):
+        self.low_confidence = low_confidence
+        self.review_mean = review_mean
+        self.review_low_fraction = review_low_fraction
+        self.pages: Dict[int, Dict] = {}
+        self.low_words: List[Dict] = []
+
+    def add_page(self, page_num: int, words: List[Dict], dropped: Iterable[Dict] = (),
+                 size: Optional[Tuple[int, int]] = None) -> Dict:
+        """
+        Index a page's words (and detections dropped by a confidence filter)
+        Returns the page's statistics
+        """
+        if page_num in self.pages:
+            # Re-indexing a page (after re-OCR) replaces its entries
+            self.low_words = [word for word in self.low_words if word['page'] != page_num]
+        stats = page_statistics(words, self.low_confidence)
+        stats['dropped_words'] = 0
+        if size:
+            stats['size'] = list(size)
+        for word in words:
+            conf = word.get('conf')
+            if conf is not None and conf < self.low_confidence:
+                self.low_words.append({'page': page_num, 'text': word['text'], 'conf': round(conf, 1),
+                                       'bbox': list(word.get('bbox') or (0, 0, 0, 0)),
+                                       'line': word.get('line')})
+        for word in dropped:
+            stats['dropped_words'] += 1
+            self.low_words.append({'page': page_num, 'text': word['text'], 'conf': round(word['conf'], 1),
+                                   'bbox': list(word['bbox']), 'line': None, 'dropped': True})
+        stats['needs_review'] = self._needs_review(stats)
+        self.pages[page_num] = stats
+        return stats
+
+    def _needs_review(self, stats: Dict) -> bool:
+        if stats['dropped_words']:
+            return True
+        if stats['mean_confidence'] is None:
+            return False
+        return stats['mean_confidence'] < self.review_mean or stats['low_fraction'] > self.review_low_fraction
+
+    def review_pages(self) -> List[int]:
+        """Pages worth a human look or a re-OCR, worst first"""
+        flagged = [page for page, stats in self.pages.items() if stats['needs_review']]
+        return sorted(flagged, key=lambda page: (self.pages[page]['mean_confidence'] or 0, page))
+
+    def words_on(self, page_num: int) -> List[Dict]:
+        return [word for word in self.low_words if word['page'] == page_num]
+
+    def low_regions(self, page_num: int) -> List[Tuple[int, int, int, int]]:
+        """Line-sized boxes around a page's low-confidence words"""
+        boxes = [tuple(word['bbox']) for word in self.words_on(page_num) if any(word['bbox'])]
+        return merge_boxes(boxes)
+
+    def summary(self) -> Dict:
+        scored = sum(stats['scored_words'] for stats in self.pages.values())
+        return {
+            'pages': len(self.pages),
+            'scored_words': scored,
+            'low_words': len(self.low_words),
+            'review_pages': self.review_pages()
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'low_confidence': self.low_confidence,
+            'summary': self.summary(),
+            'pages': {str(page): stats for page, stats in sorted(self.pages.items())},
+            'low_words': self.low_words
+        }
+
+    def save(self, path: Path) -> str:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        logger.info(f"Confidence index saved: {path} ({len(self.low_words)} low-confidence words, "
+                    f"{len(self.review_pages())} pages to review)")
+        return str(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ConfidenceIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(low_confidence=data.get('low_confidence', LOW_CONFIDENCE))
+        index.pages = {int(page): stats for page, stats in data['pages'].items()}
+        index.low_words = data['low_words']
+        return index
+
+    @classmethod
+    def from_document(cls, document, **options) -> 'ConfidenceIndex':
+        """Build the index from a TextDocument's stored word confidences"""
+        index = cls(**options)
+        for page_index in range(len(document)):
+            page_num = document.page(page_index)['page_number']
+            index.add_page(page_num, document.words(page_index))
+        return index
+
+
+def confidence_path(document_path: Path) -> Path:
+    """output/text/book.ptvd -> output/text/book.confidence.json"""
+    document_path = Path(document_path)
+    return document_path.with_name(document_path.stem + CONFIDENCE_SUFFIX)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+EasyOCR ONNX - Run EasyOCR on ONNX Runtime with an int8 recognizer
+The stock reader runs CRAFT and the recognition network in PyTorch float32
+with PyTorch's default thread pool. This backend exports both networks to
+ONNX once, quantizes the recognizer's MatMul/Gemm/LSTM weights to int8
+(onnxruntime.quantization) and swaps them into an ordinary easyocr.Reader,
+so EasyOCR's own resizing, box merging and CTC decoding stay exactly the
+same. CRAFT is all convolutions, which stay float32, so the detector runs
+unquantized. Each session gets a
+fixed number of intra-op threads, so several OCR workers on one node do
+not oversubscribe its cores
+
+Models are exported to ~/.EasyOCR/onnx on first use. Compare the backends
+on a few pages of a real book before choosing one for a job:
+    python easyocr_onnx.py compare input/book.pdf --pages 5 --threads 4
+"""
+
+import os
+import copy
+import json
+import time
+import difflib
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EASYOCR_BACKENDS = ('torch', 'onnx')
+DEFAULT_LANGUAGES = ('en',)
+DEFAULT_MODEL_DIR = Path.home() / '.EasyOCR' / 'onnx'
+
+# Export settings: sample input shapes (batch, height and width stay dynamic)
+ONNX_OPSET = 14
+DETECTOR_SAMPLE = (1, 3, 640, 640)
+RECOGNIZER_SAMPLE = (1, 1, 64, 256)     # EasyOCR recognizes 64-pixel-high line crops
+MAX_TEXT_LENGTH = 25
+# Dynamic quantization of Conv emits ConvInteger, which has no int8-weight
+# kernel on the CPU provider, so only these ops get int8 weights (none of
+# them occur in CRAFT, so the detector is not quantized at all)
+QUANTIZED_OPS = ['MatMul', 'Gemm', 'LSTM']
+
+
+def default_threads(workers: int = 1) -> int:
+    """Intra-op threads per OCR worker so the workers share the cores evenly"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def model_paths(model_dir: Path = DEFAULT_MODEL_DIR, lang_list: Sequence[str] = DEFAULT_LANGUAGES,
+                quantize: bool = True) -> Tuple[Path, Path]:
+    """
+    (detector, recognizer) ONNX files; the recognizer depends on the languages
+    and is the only one with an int8 variant
+    """
+    suffix = '.int8.onnx' if quantize else '.onnx'
+    model_dir = Path(model_dir)
+    return model_dir / "craft.onnx", model_dir / f"recognizer_{'_'.join(lang_list)}{suffix}"
+
+
+def _replace_adaptive_pooling(model) -> None:
+    """
+    The recognizer pools each column with AdaptiveAvgPool2d((None, 1)), which
+    does not export with a dynamic width; a mean over the last axis is the same
+    """
+    import torch
+
+    class MeanLastAxis(torch.nn.Module):
+        def forward(self, x):
+            return x.mean(dim=3, keepdim=True)
+
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, torch.nn.AdaptiveAvgPool2d) and tuple(child.output_size) == (None, 1):
+                setattr(module, name, MeanLastAxis())
+
+
+def export_models(model_dir: Path = DEFAULT_MODEL_DIR,
+                  lang_list: Sequence[str] = DEFAULT_LANGUAGES) -> Tuple[Path, Path]:
+    """
+    Export the stock reader's networks to ONNX and quantize the recognizer
+    to int8 (QUANTIZED_OPS only). Both recognizer files are kept; returns
+    (float32 detector, int8 recognizer)
+    """
+    import torch
+    import easyocr
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    # Float weights: PyTorch-quantized modules cannot be exported
+    reader = easyocr.Reader(list(lang_list), gpu=False, quantize=False, verbose=False)
+    float_paths = model_paths(model_dir, lang_list, quantize=False)
+    int8_paths = model_paths(model_dir, lang_list, quantize=True)
+    Path(model_dir).mkdir(parents=True, exist_ok=True)
+
+    detector = reader.detector.eval()
+    torch.onnx.export(
+        detector, torch.zeros(DETECTOR_SAMPLE), str(float_paths[0]), opset_version=ONNX_OPSET,
+        input_names=['image'], output_names=['score', 'feature'],
+        dynamic_axes={'image': {0: 'batch', 2: 'height', 3: 'width'},
+                      'score': {0: 'batch', 1: 'height', 2: 'width'},
+                      'feature': {0: 'batch', 2: 'height', 3: 'width'}}
+    )
+
+    recognizer = copy.deepcopy(reader.recognizer).eval()
+    _replace_adaptive_pooling(recognizer)
+    text = torch.zeros((RECOGNIZER_SAMPLE[0], MAX_TEXT_LENGTH + 1), dtype=torch.long)
+    torch.onnx.export(
+        recognizer, (torch.zeros(RECOGNIZER_SAMPLE), text), str(float_paths[1]), opset_version=ONNX_OPSET,
+        input_names=['image', 'text'], output_names=['logits'],
+        dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'text': {0: 'batch'},
+                      'logits': {0: 'batch', 1: 'steps'}}
+    )
+
+    logger.info(f"Exported {float_paths[0].name} ({float_paths[0].stat().st_size / 1e6:.1f} MB float)")
+    float_path, int8_path = float_paths[1], int8_paths[1]
+    quantize_dynamic(str(float_path), str(int8_path), op_types_to_quantize=QUANTIZED_OPS,
+                     weight_type=QuantType.QInt8)
+    logger.info(f"Exported {int8_path.name} ({float_path.stat().st_size / 1e6:.1f} MB float -> "
+                f"{int8_path.stat().st_size / 1e6:.1f} MB int8)")
+    return int8_paths
+
+
+class OnnxModule:
+    """
+    Stands in for a PyTorch network inside easyocr.Reader
+    Takes and returns torch tensors, so EasyOCR's pre- and post-processing
+    run unchanged around the ONNX Runtime session
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = [node.name for node in session.get_inputs()]
+
+    def __call__(self, *inputs):
+        import torch
+        # Inputs the exporter pruned (the CTC recognizer ignores its text input) are skipped
+        feed = {name: tensor.cpu().numpy() for name, tensor in zip(self.input_names, inputs)}
+        outputs = [torch.from_numpy(output) for output in self.session.run(None, feed)]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+
+def create_session(path: Path, threads: int):
+    """CPU inference session with a fixed intra-op thread count"""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(str(path), options, providers=['CPUExecutionProvider'])
+
+
+def create_reader(backend: str = 'torch', lang_list: Sequence[str] = DEFAULT_LANGUAGES,
+                  threads: Optional[int] = None, model_dir: Path = DEFAULT_MODEL_DIR,
+                  quantize: bool = True):
+    """
+    easyocr.Reader for a backend
+    'torch' is the stock reader; 'onnx' runs both networks on ONNX Runtime
+    (exporting them on first use). threads caps the intra-op threads of
+    either backend
+    """
+    if backend not in EASYOCR_BACKENDS:
+        raise ValueError(f"Unknown EasyOCR backend {backend!r} (choose from {', '.join(EASYOCR_BACKENDS)})")
+    import torch
+    import easyocr
+
+    if threads:
+        # Also used by EasyOCR's own tensor work around the networks
+        torch.set_num_threads(threads)
+    if backend == 'torch':
+        return easyocr.Reader(list(lang_list))
+
+    threads = threads or default_threads()
+    detector_path, recognizer_path = model_paths(model_dir, lang_list, quantize)
+    if not (detector_path.exists() and recognizer_path.exists()):
+        logger.info(f"Exporting EasyOCR models to ONNX in {model_dir} (once)")
+        export_models(model_dir, lang_list)
+    # The stock networks are still loaded (the reader takes its character set,
+    # CTC decoder and box functions from them) and then replaced
+    reader = easyocr.Reader(list(lang_list), gpu=False, quantize=False, verbose=False)
+    reader.detector = OnnxModule(create_session(detector_path, threads))
+    reader.recognizer = OnnxModule(create_session(recognizer_path, threads))
+    logger.info(f"EasyOCR on ONNX Runtime (float32 detector, {'int8' if quantize else 'float32'} recognizer, "
+                f"{threads} threads)")
+    return reader
+
+
+def page_text(results: List) -> str:
+    return ' '.join(text for _, text, _ in results)
+
+
+def _similarity(first: str, second: str) -> float:
+    return round(difflib.SequenceMatcher(None, first, second, autojunk=False).ratio(), 4)
+
+
+def compare_backends(images: List, lang_list: Sequence[str] = DEFAULT_LANGUAGES,
+                     threads: Optional[int] = None, references: Optional[List[str]] = None) -> Dict:
+    """
+    Run both backends over the same page images
+    Reports load time, seconds per page and mean confidence per backend, how
+    closely the ONNX text matches the stock reader's, and, with reference
+    texts (one per page), each backend's character similarity to them
+    """
+    import numpy as np
+
+    threads = threads or default_threads()
+    arrays = [np.asarray(image.convert('RGB')) for image in images]
+    report = {'pages': len(arrays), 'threads': threads}
+    texts = {}
+    for backend in EASYOCR_BACKENDS:
+        started = time.perf_counter()
+        reader = create_reader(backend, lang_list, threads)
+        load_seconds = time.perf_counter() - started
+        reader.readtext(arrays[0])      # Warm-up: first-call allocation is not per-page cost
+
+        started = time.perf_counter()
+        results = [reader.readtext(array) for array in arrays]
+        seconds = time.perf_counter() - started
+        scores = [confidence for page in results for _, _, confidence in page]
+        texts[backend] = [page_text(page) for page in results]
+        report[backend] = {
+            'load_seconds': round(load_seconds, 2),
+            'seconds_per_page': round(seconds / len(arrays), 3),
+            'mean_confidence': round(100 * sum(scores) / len(scores), 1) if scores else None,
+            'detections': len(scores)
+        }
+        if references:
+            report[backend]['reference_similarity'] = _similarity(' '.join(texts[backend]), ' '.join(references))
+        del reader
+
+    report['onnx']['agreement'] = _similarity(' '.join(texts['onnx']), ' '.join(texts['torch']))
+    report['speedup'] = round(report['torch']['seconds_per_page'] / report['onnx']['seconds_per_page'], 2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="EasyOCR ONNX Runtime backend")
+    parser.add_argument('--lang', default=','.join(DEFAULT_LANGUAGES), help="Comma-separated EasyOCR languages")
+    parser.add_argument('--model-dir', type=Path, default=DEFAULT_MODEL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('export', help="Export and quantize the models")
+
+    compare_parser = commands.add_parser('compare', help="Compare the stock and ONNX readers on a PDF")
+    compare_parser.add_argument('pdf_path')
+    compare_parser.add_argument('--pages', type=int, default=5, help="First N pages to compare on")
+    compare_parser.add_argument('--dpi', type=int, default=300)
+    compare_parser.add_argument('--threads', type=int, default=None, help="Intra-op threads (default: all cores)")
+    compare_parser.add_argument('--reference', type=Path, default=None,
+                                help="Correct text of those pages, for an accuracy figure")
+
+    args = parser.parse_args(argv)
+    lang_list = args.lang.split(',')
+
+    if args.command == 'export':
+        for path in export_models(args.model_dir, lang_list):
+            print(f"✅ {path}")
+        return
+
+    from pdf2image import convert_from_path
+    images = convert_from_path(args.pdf_path, dpi=args.dpi, first_page=1, last_page=args.pages)
+    references = [args.reference.read_text(encoding='utf-8')] if args.reference else None
+    report = compare_backends(images, lang_list, args.threads, references)
+    for backend in EASYOCR_BACKENDS:
+        stats = report[backend]
+        print(f"{backend:<6} {stats['seconds_per_page']:>7.3f} s/page  load {stats['load_seconds']:>5.1f} s  "
+              f"confidence {stats['mean_confidence']}")
+    print(f"ONNX speedup x{report['speedup']}, text agreement {report['onnx']['agreement']:.1%}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Pipeline Events - Progress events with throughput-based ETA
+PDFProcessor emits one event per OCR'd page and AudioGenerator one per
+synthesized chunk. Consumers subscribe a callback, iterate events
+asynchronously or log them as JSON lines. With no subscribers emit() returns
+immediately, and each event costs a dict and a few float operations
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the smoothed throughput
+RATE_SMOOTHING = 0.2
+
+Event = Dict
+
+
+class StageProgress:
+    """Counts work in a stage and estimates the time left from measured throughput"""
+
+    def __init__(self, stage: str, total_items: int, total_units: Optional[float] = None):
+        self.stage = stage
+        self.total_items = total_items
+        self.total_units = total_units if total_units is not None else float(total_items)
+        self.items_done = 0
+        self.units_done = 0.0
+        self.started = time.monotonic()
+        self.last_update = self.started
+        self.rate = None     # Units per second, smoothed
+
+    def advance(self, units: float = 1.0, measured: bool = True) -> None:
+        """
+        Record finished work; measured=False (cache hits, skipped pages)
+        counts toward completion without skewing the throughput estimate
+        """
+        now = time.monotonic()
+        self.items_done += 1
+        self.units_done += units
+        elapsed = now - self.last_update
+        if measured and elapsed > 0:
+            sample = units / elapsed
+            self.rate = sample if self.rate is None else (
+                RATE_SMOOTHING * sample + (1 - RATE_SMOOTHING) * self.rate)
+        self.last_update = now
+
+    @property
+    def fraction(self) -> float:
+        if self.total_units <= 0:
+            return 1.0
+        return min(self.units_done / self.total_units, 1.0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        if self.fraction >= 1.0:
+            return 0.0
+        if not self.rate:
+            return None
+        return (self.total_units - self.units_done) / self.rate
+
+    def snapshot(self) -> Dict:
+        eta = self.eta
+        return {
+            'done': self.items_done,
+            'total': self.total_items,
+            'percent': round(self.fraction * 100, 1),
+            'elapsed': round(time.monotonic() - self.started, 3),
+            'eta': round(eta, 1) if eta is not None else None,
+            'rate': round(self.rate, 2) if self.rate else None
+        }
+
+
+class EventBus:
+    """Fan-out of pipeline events to callbacks, async iterators and logs"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[Event], None]] = []
+        self._stages: Dict[Tuple[str, str], StageProgress] = {}
+        self._lock = threading.Lock()
+        self.last_event_time = time.monotonic()
+
+    def subscribe(self, callback: Callable[[Event], None]) -> Callable[[Event], None]:
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback: Callable[[Event], None]) -> None:
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber != callback]
+
+    def emit(self, event_type: str, **fields) -> None:
+        self.last_event_time = time.monotonic()
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        event = {'type': event_type, 'time': time.time()}
+        event.update(fields)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Event subscriber failed on {event_type}: {e}")
+
+    def start_stage(self, stage: str, total_items: int, total_units: Optional[float] = None,
+                    source: str = '', **fields) -> None:
+        """
+        Begin a stage of total_items items (total_units of work, e.g. characters)
+        source names the book, so one bus can track concurrent jobs
+        """
+        with self._lock:
+            self._stages[(stage, source)] = StageProgress(stage, total_items, total_units)
+        self.emit('stage_started', stage=stage, source=source, total=total_items, **fields)
+
+    def advance(self, stage: str, event_type: str, units: float = 1.0, measured: bool = True,
+                source: str = '', **fields) -> None:
+        """Record one finished item (page, chunk) and emit it with progress and ETA"""
+        with self._lock:
+            progress = self._stages.get((stage, source))
+            if progress is not None:
+                progress.advance(units, measured)
+                fields.update(progress.snapshot())
+        self.emit(event_type, stage=stage, source=source, **fields)
+
+    def finish_stage(self, stage: str, source: str = '', **fields) -> None:
+        with self._lock:
+            progress = self._stages.pop((stage, source), None)
+        snapshot = progress.snapshot() if progress else {}
+        snapshot.update(fields)
+        self.emit('stage_finished', stage=stage, source=source, **snapshot)
+
+    def seconds_since_progress(self) -> float:
+        """Time since the last event; a growing value on a running job means it is stalled"""
+        return time.monotonic() - self.last_event_time
+
+    def stream(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> 'AsyncEventStream':
+        """Async iterator over events from now on (emitters may run in other threads)"""
+        return AsyncEventStream(self, loop)
+
+    def log_to(self, path: Path) -> 'JSONLinesLog':
+        """Append every event to a JSON-lines file until the log is closed"""
+        return JSONLinesLog(self, path)
+
+
+class AsyncEventStream:
+    """
+    `async for event in bus.stream():` - events are handed to the loop
+    thread-safely; iteration ends when close() is called
+    Created outside a coroutine, the stream binds to the loop that first
+    iterates it and holds earlier events until then
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, bus: EventBus, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.bus = bus
+        self.loop = loop
+        if self.loop is None:
+            try:
+                self.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+        self.queue = asyncio.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        bus.subscribe(self._push)
+
+    def _push(self, event) -> None:
+        with self._lock:
+            if self.loop is None:
+                self._pending.append(event)
+                return
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self._push)
+        self._push(self._CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        if self.loop is None:
+            with self._lock:
+                self.loop = asyncio.get_running_loop()
+                for event in self._pending:
+                    self.queue.put_nowait(event)
+                self._pending.clear()
+        event = await self.queue.get()
+        if event is self._CLOSED:
+            raise StopAsyncIteration
+        return event
+
+
+class JSONLinesLog:
+    """Buffered JSON-lines event log; flushed whenever a stage starts or finishes"""
+
+    def __init__(self, bus: EventBus, path: Path):
+        self.bus = bus
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        bus.subscribe(self._write)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, event: Event) -> None:
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            if event['type'] in ('stage_started', 'stage_finished'):
+                self._file.flush()
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self._write)
+        with self._lock:
+            self._file.close()
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return 'ETA unknown'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'ETA {hours}h {minutes:02d}m'
+    return f'ETA {minutes}m {seconds:02d}s'
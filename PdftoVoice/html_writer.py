@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+HTML Writer - Stream the HTML preview to disk page by page
+The header is written first, each page is appended (and flushed) as soon
+as it is OCR'd, and the footer closes the document when processing ends.
+For very large documents the paginated writer shards pages across files
+"""
+
+import json
+import logging
+from pathlib import Path
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StreamingHTMLWriter:
+    """Incremental HTML sink with constant memory use"""
+
+    def __init__(self, output_path: Path, header: str, footer: str, flush_every_page: bool = True):
+        self.output_path = Path(output_path)
+        self.header = header
+        self.footer = footer
+        self.flush_every_page = flush_every_page
+        self.pages_written = 0
+        self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self) -> None:
+        """Create the file and write the header"""
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.output_path, 'w', encoding='utf-8')
+        self._file.write(self.header)
+        self._file.flush()
+
+    def write_page(self, page_num: int, page_html: str) -> None:
+        """Append one page; the preview is viewable while later pages are processed"""
+        self._file.write('\n' + page_html)
+        self.pages_written += 1
+        if self.flush_every_page:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Write the footer and close the file"""
+        if self._file is None:
+            return
+        self._file.write('\n' + self.footer)
+        self._file.close()
+        self._file = None
+        logger.info(f"HTML saved to: {self.output_path} ({self.pages_written} pages)")
+
+
+class PaginatedHTMLWriter:
+    """
+    Paginated preview for very large documents
+    Pages are grouped into small shard files (N pages each) next to an index
+    page that carries the CSS once and loads shards lazily while scrolling.
+    Shards are JavaScript files so lazy loading also works from file://
+    """
+
+    def __init__(self, output_dir: Path, header: str, footer: str, pages_per_shard: int = 25):
+        self.output_dir = Path(output_dir)
+        self.header = header
+        self.footer = footer
+        self.pages_per_shard = pages_per_shard
+        self.index_path = self.output_dir / "index.html"
+        self.manifest_path = self.output_dir / "manifest.json"
+        self.shards = []
+        self._pending = []
+        self._first_page = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._write_index(complete=False)
+
+    def write_page(self, page_num: int, page_html: str) -> None:
+        """Buffer one page; a shard is written every pages_per_shard pages"""
+        if self._first_page is None:
+            self._first_page = page_num
+        self._pending.append(page_html)
+        if len(self._pending) >= self.pages_per_shard:
+            self._flush_shard(page_num)
+
+    def close(self) -> None:
+        if self._pending:
+            self._flush_shard(self._first_page + len(self._pending) - 1)
+        self._write_index(complete=True)
+        logger.info(f"Paginated HTML saved to: {self.index_path} ({len(self.shards)} shards)")
+
+    def _flush_shard(self, last_page: int) -> None:
+        """Write buffered pages as one shard and refresh the index"""
+        shard_number = len(self.shards)
+        shard_file = f"shard-{shard_number + 1:04d}.js"
+        with open(self.output_dir / shard_file, 'w', encoding='utf-8') as f:
+            f.write(f"previewShard({shard_number}, {json.dumps(self._pending, ensure_ascii=False)});\n")
+
+        self.shards.append({
+            'file': shard_file,
+            'first_page': self._first_page,
+            'last_page': last_page,
+            'chars': sum(len(page) for page in self._pending)
+        })
+        self._pending = []
+        self._first_page = None
+        # Keep the index current so the preview is usable mid-run
+        self._write_index(complete=False)
+
+    def _write_index(self, complete: bool) -> None:
+        """Write the manifest and the index page that lazy-loads shards"""
+        manifest = {
+            'version': 1,
+            'complete': complete,
+            'pages_per_shard': self.pages_per_shard,
+            'page_count': self.shards[-1]['last_page'] if self.shards else 0,
+            'shards': self.shards
+        }
+        manifest_json = json.dumps(manifest, separators=(',', ':'))
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            f.write(manifest_json)
+
+        index_html = self.header + """
+    <div id="shards"></div>
+    <script>
+    (function () {
+        var manifest = """ + manifest_json + """;
+        var container = document.getElementById('shards');
+        var observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (!entry.isIntersecting || entry.target.dataset.loaded) return;
+                entry.target.dataset.loaded = '1';
+                observer.unobserve(entry.target);
+                var script = document.createElement('script');
+                script.src = entry.target.dataset.src;
+                document.body.appendChild(script);
+            });
+        }, { rootMargin: '1500px 0px' });
+        window.previewShard = function (number, pages) {
+            var placeholder = document.getElementById('shard-' + number);
+            placeholder.innerHTML = pages.join('\\n');
+            placeholder.style.minHeight = '';
+        };
+        manifest.shards.forEach(function (shard, number) {
+            var placeholder = document.createElement('div');
+            placeholder.id = 'shard-' + number;
+            placeholder.dataset.src = shard.file;
+            // Rough height estimate keeps the scrollbar stable before loading
+            placeholder.style.minHeight = Math.max(300, shard.chars / 4) + 'px';
+            placeholder.innerHTML = '<div class="page-number">— Pages ' + shard.first_page +
+                '–' + shard.last_page + ' —</div>';
+            container.appendChild(placeholder);
+            observer.observe(placeholder);
+        });
+        if (!manifest.complete) {
+            container.insertAdjacentHTML('beforeend',
+                '<div class="page-number">⏳ Processing… reload to see more pages</div>');
+        }
+    })();
+    </script>
+""" + self.footer
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            f.write(index_html)
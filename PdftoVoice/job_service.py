@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Job Service - Long-running PDF-to-voice worker with a persistent job queue
+Jobs are stored in SQLite, so they survive restarts and can be submitted
+from the command line even while the service is down. Workers keep the OCR
+readers and TTS clients loaded between jobs; the queue orders work by
+priority, ages waiting jobs and round-robins between submitters
+
+Usage:
+    python job_service.py serve --port 8765 --workers 2
+    python job_service.py submit input/book.pdf --priority 5 --owner alice --backend polly
+    python job_service.py status [job_id]
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+
+from text_document import DOCUMENT_SUFFIX
+from events import EventBus, format_eta
+from easyocr_onnx import EASYOCR_BACKENDS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = Path("output") / "jobs.sqlite3"
+DEFAULT_PORT = 8765
+
+# A queued job gains one priority level per AGING_SECONDS of waiting
+AGING_SECONDS = 300
+
+# Minimum seconds between progress writes to a job's stage
+PROGRESS_INTERVAL = 1.0
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_path TEXT NOT NULL,
+    output_name TEXT NOT NULL,
+    tts_service TEXT NOT NULL,
+    easyocr_backend TEXT NOT NULL DEFAULT 'torch',
+    owner TEXT NOT NULL DEFAULT 'default',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    stage TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    last_started REAL NOT NULL
+);
+"""
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the service, HTTP handlers and the CLI"""
+
+    def __init__(self, db_path: Path = DEFAULT_DB):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+            # Databases created before jobs could choose their EasyOCR backend
+            columns = {row['name'] for row in connection.execute('PRAGMA table_info(jobs)')}
+            if 'easyocr_backend' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN easyocr_backend TEXT NOT NULL DEFAULT 'torch'")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run while a worker writes"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def submit(self, pdf_path: str, output_name: Optional[str] = None, tts_service: str = 'local',
+               owner: str = 'default', priority: int = 0, easyocr_backend: str = 'torch') -> int:
+        if easyocr_backend not in EASYOCR_BACKENDS:
+            raise ValueError(f"unknown EasyOCR backend {easyocr_backend!r}")
+        output_name = output_name or Path(pdf_path).stem
+        cursor = self._connect().execute(
+            "INSERT INTO jobs (pdf_path, output_name, tts_service, owner, priority, easyocr_backend, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (pdf_path, output_name, tts_service, owner, priority, easyocr_backend, time.time())
+        )
+        logger.info(f"Queued job {cursor.lastrowid}: {pdf_path} ({tts_service}, priority {priority})")
+        return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict]:
+        """
+        Atomically take the next job
+        Order: aged priority, then owners with the fewest running jobs, then
+        the owner served least recently, then submission order
+        Jobs whose output name is already running wait: they would write the
+        same text document, HTML and segment directory
+        """
+        connection = self._connect()
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                """
+                SELECT jobs.* FROM jobs
+                LEFT JOIN owners ON owners.owner = jobs.owner
+                WHERE jobs.status = 'queued'
+                  AND jobs.output_name NOT IN (SELECT output_name FROM jobs WHERE status = 'running')
+                ORDER BY jobs.priority + CAST((? - jobs.created_at) / ? AS INTEGER) DESC,
+                         (SELECT COUNT(*) FROM jobs AS running
+                          WHERE running.owner = jobs.owner AND running.status = 'running') ASC,
+                         COALESCE(owners.last_started, 0) ASC,
+                         jobs.id ASC
+                LIMIT 1
+                """,
+                (now, AGING_SECONDS)
+            ).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', stage = 'starting', started_at = ? WHERE id = ?",
+                (now, row['id'])
+            )
+            connection.execute(
+                "INSERT INTO owners (owner, last_started) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET last_started = excluded.last_started",
+                (row['owner'], now)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        job = dict(row)
+        job['status'] = 'running'
+        return job
+
+    def set_stage(self, job_id: int, stage: str) -> None:
+        self._connect().execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def finish(self, job_id: int, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, stage = '', finished_at = ?, result = ?, error = ? WHERE id = ?",
+            ('failed' if error else 'done', time.time(),
+             json.dumps(result) if result is not None else None, error, job_id)
+        )
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount > 0
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs that were running when the service stopped back in the queue"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET status = 'queued', stage = '', started_at = NULL WHERE status = 'running'"
+        )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        if status:
+            rows = self._connect().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._connect().execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [self._job_dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    @staticmethod
+    def _job_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        if job.get('result'):
+            job['result'] = json.loads(job['result'])
+        return job
+
+
+class JobService:
+    """
+    Worker threads that run queued jobs with warm resources
+    The PDF processor (OCR models) is created once per worker and audio
+    generators (TTS clients, worker pools) once per backend. All of them
+    report to one event bus, which keeps each running job's stage current
+    (e.g. "audio 42% ETA 3m 10s")
+    """
+
+    def __init__(self, queue: JobQueue, workers: int = 1, poll_interval: float = 1.0):
+        self.queue = queue
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._generators = {}
+        self._generators_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.events = EventBus()
+        self.events.subscribe(self._on_event)
+        self._running = {}          # output_name -> [job_id, stage, last progress write]
+
+    def start(self) -> None:
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logger.info(f"Re-queued {requeued} interrupted jobs")
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{number + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job service started with {self.workers} workers")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        for generator in self._generators.values():
+            generator.close()
+
+    def get_generator(self, tts_service: str):
+        """Audio generator for a backend, shared by all workers (backends are created under its lock)"""
+        with self._generators_lock:
+            if tts_service not in self._generators:
+                from audio_generator import AudioGenerator
+                self._generators[tts_service] = AudioGenerator(tts_service=tts_service, events=self.events)
+            return self._generators[tts_service]
+
+    def _on_event(self, event: Dict) -> None:
+        """Write page/chunk progress with its ETA to the job's stage, throttled"""
+        if event['type'] not in ('page_processed', 'chunk_synthesized'):
+            return
+        running = self._running.get(event['source'])
+        if running is None:
+            return
+        job_id, stage, last_write = running
+        now = time.monotonic()
+        if now - last_write < PROGRESS_INTERVAL and event['done'] < event['total']:
+            return
+        running[2] = now
+        self.queue.set_stage(job_id, f"{stage} {event['percent']:.0f}% {format_eta(event['eta'])}")
+
+    def _set_stage(self, job_id: int, name: str, stage: str) -> None:
+        self._running[name] = [job_id, stage, 0.0]
+        self.queue.set_stage(job_id, stage)
+
+    def _work(self) -> None:
+        from pdf_processor import PDFProcessor
+        processor = PDFProcessor(events=self.events)  # Loads OCR models once for this worker
+
+        try:
+            self._run_jobs(processor)
+        finally:
+            processor.close()
+
+    def _run_jobs(self, processor) -> None:
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            logger.info(f"Job {job['id']} started: {job['pdf_path']}")
+            try:
+                result = self.run_job(job, processor)
+                self.queue.finish(job['id'], result=result)
+                logger.info(f"Job {job['id']} done: {result.get('audio_file')}")
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                self.queue.finish(job['id'], error=str(e))
+            finally:
+                self._running.pop(job['output_name'], None)
+
+    def run_job(self, job: Dict, processor) -> Dict:
+        """OCR -> normalized text -> audio -> chapters and timing index -> read-along HTML"""
+        from text_normalizer import normalize_text_data
+
+        job_id = job['id']
+        name = job['output_name']
+        generator = self.get_generator(job['tts_service'])
+
+        self._set_stage(job_id, name, 'ocr')
+        # The processor keeps one warm reader per backend
+        processor.easyocr_backend = job['easyocr_backend']
+        document_path = Path("output") / "text" / f"{name}{DOCUMENT_SUFFIX}"
+        html_file, text_data = processor.process_pdf_to_html(
+            job['pdf_path'], name, document_path=str(document_path)
+        )
+
+        self._set_stage(job_id, name, 'normalize')
+        text_data = normalize_text_data(text_data)
+
+        self._set_stage(job_id, name, 'audio')
+        audio_file = generator.create_audio(text_data, name)
+
+        self._set_stage(job_id, name, 'chapters')
+        markers_file = generator.create_chapter_markers(text_data, name)
+        timing_file = generator.create_timing_index(text_data, name, audio_file)
+        # The OCR preview shows raw text; the read-along HTML must show the
+        # normalized text the timing index offsets refer to
+        html_file = processor.save_html(processor.render_html(text_data), name, audio_file, timing_file)
+
+        return {
+            'document': str(document_path),
+            'html_file': html_file,
+            'audio_file': audio_file,
+            'markers_file': markers_file,
+            'timing_file': timing_file,
+            'removed_chars': text_data['normalization']['removed_chars']
+        }
+
+
+def make_handler(queue: JobQueue):
+    """HTTP API: POST /jobs, GET /jobs[?status=], GET /jobs/<id>, POST /jobs/<id>/cancel"""
+
+    class JobHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload) -> None:
+            body = json.dumps(payload, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job_id(self) -> Optional[int]:
+            parts = self.path.split('?')[0].strip('/').split('/')
+            if len(parts) >= 2 and parts[0] == 'jobs' and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_GET(self):
+            path, _, query = self.path.partition('?')
+            if path.rstrip('/') == '/jobs':
+                params = dict(pair.split('=', 1) for pair in query.split('&') if '=' in pair)
+                self._send(200, {'counts': queue.counts(), 'jobs': queue.list(params.get('status'))})
+                return
+            job_id = self._job_id()
+            job = queue.get(job_id) if job_id is not None else None
+            if job is None:
+                self._send(404, {'error': 'not found'})
+            else:
+                self._send(200, job)
+
+        def do_POST(self):
+            job_id = self._job_id()
+            if job_id is not None and self.path.rstrip('/').endswith('/cancel'):
+                self._send(200, {'cancelled': queue.cancel(job_id)})
+                return
+            if self.path.rstrip('/') != '/jobs':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                job_id = queue.submit(
+                    request['pdf_path'],
+                    output_name=request.get('output_name'),
+                    tts_service=request.get('tts_service', 'local'),
+                    owner=request.get('owner', self.client_address[0]),
+                    priority=int(request.get('priority', 0)),
+                    easyocr_backend=request.get('easyocr_backend', 'torch')
+                )
+            except (KeyError, ValueError) as e:
+                self._send(400, {'error': f'invalid job: {e}'})
+                return
+            self._send(201, queue.get(job_id))
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return JobHandler
+
+
+def serve(db_path: Path, port: int, workers: int) -> None:
+    queue = JobQueue(db_path)
+    service = JobService(queue, workers=workers)
+    service.start()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(queue))
+    logger.info(f"Listening on http://127.0.0.1:{port}/jobs")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="PDF-to-voice job service")
+    parser.add_argument('--db', type=Path, default=DEFAULT_DB, help="Job database (default: output/jobs.sqlite3)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="Run the worker service and HTTP API")
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--workers', type=int, default=1, help="Concurrent jobs (one OCR engine each)")
+
+    submit_parser = commands.add_parser('submit', help="Queue PDFs")
+    submit_parser.add_argument('pdf_paths', nargs='+')
+    submit_parser.add_argument('--name', help="Output name (single PDF only; default: file name)")
+    submit_parser.add_argument('--backend', default='local', help="TTS service (polly, google, espeak, piper, local)")
+    submit_parser.add_argument('--owner', default='default', help="Submitter, for fair scheduling")
+    submit_parser.add_argument('--priority', type=int, default=0, help="Higher runs first")
+    submit_parser.add_argument('--easyocr-backend', choices=EASYOCR_BACKENDS, default='torch',
+                               help="EasyOCR fallback on PyTorch or ONNX Runtime, int8 recognizer "
+                                    "(see easyocr_onnx.py compare)")
+
+    status_parser = commands.add_parser('status', help="Show job status")
+    status_parser.add_argument('job_id', type=int, nargs='?')
+
+    cancel_parser = commands.add_parser('cancel', help="Cancel a queued job")
+    cancel_parser.add_argument('job_id', type=int)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.db, args.port, args.workers)
+        return
+
+    queue = JobQueue(args.db)
+    if args.command == 'submit':
+        for pdf_path in args.pdf_paths:
+            name = args.name if len(args.pdf_paths) == 1 else None
+            job_id = queue.submit(pdf_path, name, args.backend, args.owner, args.priority,
+                                  args.easyocr_backend)
+            print(f"📥 Job {job_id} queued: {pdf_path}")
+    elif args.command == 'status':
+        if args.job_id is not None:
+            print(json.dumps(queue.get(args.job_id), indent=2))
+        else:
+            print(json.dumps(queue.counts()))
+            for job in queue.list(limit=20):
+                stage = f" ({job['stage']})" if job['stage'] else ''
+                print(f"{job['id']:>5}  {job['status']:<9}{stage:<12} {job['owner']:<10} "
+                      f"p{job['priority']:<3} {job['pdf_path']}")
+    elif args.command == 'cancel':
+        print("✅ Cancelled" if queue.cancel(args.job_id) else "❌ Job is not queued")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Line Index - Cross-page index of the first and last lines of each page
+Running heads ("Sound Doctrine – Chapter 10") and page numbers are found by
+hashing each page's edge lines (digits masked, bucketed by vertical position)
+and counting them as pages are OCR'd, so detection is one pass over the
+document with O(1) work per page
+"""
+
+import re
+import hashlib
+from collections import Counter
+from typing import Dict, List, Tuple
+
+DIGIT_PATTERN = re.compile(r'\d+')
+BBOX_PATTERN = re.compile(r'bbox (\d+) (\d+) (\d+) (\d+)')
+
+# hOCR classes Tesseract uses for a line of text
+LINE_CLASSES = ('ocr_line', 'ocr_header', 'ocr_caption', 'ocr_textfloat')
+
+
+def parse_bbox(title: str) -> Tuple[int, int, int, int]:
+    """Read 'bbox x0 y0 x1 y1' from an hOCR title attribute"""
+    match = BBOX_PATTERN.search(title or '')
+    if not match:
+        return (0, 0, 0, 0)
+    return tuple(int(value) for value in match.groups())
+
+
+class RunningLineIndex:
+    """
+    Counts hashed edge lines across pages
+    A line is "running" once the same masked text at the same vertical
+    position has been seen on min_pages pages
+    """
+
+    def __init__(self, edge_lines: int = 2, min_pages: int = 3, buckets: int = 20):
+        self.edge_lines = edge_lines
+        self.min_pages = min_pages
+        self.buckets = buckets
+        self.counts = Counter()
+        self.pages_seen = 0
+        self.lines_removed = 0
+
+    def line_key(self, text: str, bbox: Tuple[int, int, int, int], page_height: int) -> int:
+        """Hash of the line with page numbers masked and its position bucketed"""
+        masked = DIGIT_PATTERN.sub('#', ' '.join(text.lower().split()))
+        center = (bbox[1] + bbox[3]) / 2
+        bucket = int(center / page_height * self.buckets) if page_height else 0
+        digest = hashlib.blake2b(f'{bucket}:{masked}'.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big')
+
+    def add_page(self, lines: List[Dict], page_height: int, count: bool = True) -> None:
+        """
+        Index one page's first and last lines
+        Each indexed line gets its hash stored under 'key' for is_running()
+        count=False only keys the lines (for repeated scans of a counted page)
+        """
+        if len(lines) <= 2 * self.edge_lines:
+            edges = lines
+        else:
+            edges = lines[:self.edge_lines] + lines[-self.edge_lines:]
+
+        keys = set()
+        for line in edges:
+            if line['text'].strip():
+                line['key'] = self.line_key(line['text'], line['bbox'], page_height)
+                keys.add(line['key'])
+        if not count:
+            return
+        # Count each key once per page
+        self.counts.update(keys)
+        self.pages_seen += 1
+
+    def is_running(self, line: Dict) -> bool:
+        key = line.get('key')
+        return key is not None and self.counts[key] >= self.min_pages
+
+    def running_keys(self) -> List[int]:
+        """Keys of the running lines, to recognise them on pages OCR'd later"""
+        return sorted(key for key, count in self.counts.items() if count >= self.min_pages)
+
+    @classmethod
+    def from_keys(cls, keys: List[int], **options) -> 'RunningLineIndex':
+        """Index that treats exactly the given keys as running"""
+        index = cls(**options)
+        for key in keys:
+            index.counts[key] = index.min_pages
+        return index
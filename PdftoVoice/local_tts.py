@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Local TTS Engine Pool - Long-lived pyttsx3 engines for chunked synthesis
+Each worker process initializes one engine and reuses it for every segment,
+so local synthesis scales with cores and produces audio incrementally
+"""
+
+import os
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Iterator, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Engine owned by the current (worker) process
+_engine = None
+
+
+def get_engine(settings: Optional[Dict] = None):
+    """Return this process's engine, creating and configuring it on first use"""
+    global _engine
+    if _engine is None:
+        import pyttsx3
+        _engine = pyttsx3.init()
+        settings = settings or {}
+
+        voices = _engine.getProperty('voices')
+        voice_id = settings.get('voice')
+        if voices and voice_id not in (None, 'default'):
+            _engine.setProperty('voice', voice_id)
+        elif voices:
+            _engine.setProperty('voice', voices[0].id)
+
+        _engine.setProperty('rate', settings.get('rate', 150))  # Speed
+        _engine.setProperty('volume', settings.get('volume', 0.9))  # Volume
+    return _engine
+
+
+def _init_worker(settings: Dict) -> None:
+    """Process pool initializer: build the engine once per worker"""
+    get_engine(settings)
+
+
+def _synthesize_segment(job: Tuple[int, str, str]) -> Tuple[int, str]:
+    """Synthesize one segment to its own file with the worker's engine"""
+    index, text, path = job
+    engine = get_engine()
+    engine.save_to_file(text, path)
+    engine.runAndWait()
+    return index, path
+
+
+class LocalTTSPool:
+    """Process pool of long-lived local TTS engines"""
+
+    def __init__(self, workers: Optional[int] = None, voice: Optional[str] = None,
+                 rate: int = 150, volume: float = 0.9):
+        self.workers = workers or os.cpu_count() or 1
+        self.settings = {'voice': voice, 'rate': rate, 'volume': volume}
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.settings,)
+            )
+        return self._executor
+
+    def synthesize(self, segments: List[str], segment_dir: Path) -> Iterator[Tuple[int, str]]:
+        """
+        Synthesize segments in parallel, yielding (index, path) in order
+        Each segment file is complete on disk as soon as it is yielded
+        """
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        jobs = [
+            (index, text, str(segment_dir / f"{index:05d}.wav"))
+            for index, text in enumerate(segments)
+        ]
+        yield from self.executor.map(_synthesize_segment, jobs)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Offline TTS - espeak-ng and Piper subprocess backends
+Fully offline, headless-friendly synthesis that produces real audio in CI:
+a small pool of workers streams text to the engines over stdin and
+collects the audio without needing a system audio stack
+"""
+
+import os
+import sys
+import json
+import queue
+import shutil
+import struct
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterator, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SSML prosody keywords mapped to espeak-ng words-per-minute / pitch (0-99)
+ESPEAK_RATES = {'x-slow': 80, 'slow': 130, 'medium': 175, 'fast': 220, 'x-fast': 280}
+ESPEAK_PITCHES = {'x-low': 20, 'low': 35, 'medium': 50, 'high': 65, 'x-high': 80}
+
+# Piper has no pitch control; rate maps to its length scale (higher = slower)
+PIPER_LENGTH_SCALES = {'x-slow': 1.6, 'slow': 1.25, 'medium': 1.0, 'fast': 0.8, 'x-fast': 0.65}
+
+# libespeak-ng API constants (speak_lib.h)
+ESPEAK_OUTPUT_SYNCHRONOUS = 2
+ESPEAK_POSITION_CHARACTER = 1
+ESPEAK_CHARS_UTF8 = 1
+ESPEAK_RATE = 1
+ESPEAK_PITCH = 3
+# espeak-ng returns 16-bit mono PCM
+ESPEAK_SAMPLE_WIDTH = 2
+ESPEAK_RESPONSE_HEADER = struct.Struct('<II')    # frame rate (0 on failure), PCM byte count
+
+
+def _prosody_value(value: str, table: Dict, default, inverse: bool = False):
+    """
+    Map an SSML prosody keyword or percentage ('120%') onto an engine value
+    inverse is for scales where a higher value is slower (Piper's length
+    scale): '200%' then halves the medium value instead of doubling it
+    """
+    value = str(value).strip().lower()
+    if value in table:
+        return table[value]
+    if value.endswith('%'):
+        try:
+            percent = float(value[:-1])
+        except ValueError:
+            return default
+        if percent <= 0:
+            return default
+        scale = 100 / percent if inverse else percent / 100
+        return type(default)(table['medium'] * scale)
+    return default
+
+
+def find_espeak_library() -> str:
+    """libespeak-ng to load in the workers ($ESPEAK_NG_LIBRARY overrides the search)"""
+    import ctypes.util
+    library = (os.environ.get('ESPEAK_NG_LIBRARY') or ctypes.util.find_library('espeak-ng')
+               or ctypes.util.find_library('espeak'))
+    if not library:
+        raise FileNotFoundError("libespeak-ng not found (install espeak-ng or set ESPEAK_NG_LIBRARY)")
+    return library
+
+
+def write_wav(path: str, params: Tuple[int, int, int], pcm: bytes) -> None:
+    """Write raw PCM to a WAV file"""
+    import wave
+    channels, sample_width, frame_rate = params
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(frame_rate)
+        wav.writeframes(pcm)
+
+
+def espeak_worker(library: str) -> None:
+    """
+    Body of a long-running espeak-ng worker process (see _EspeakProcess)
+    The espeak-ng command line writes one unframed WAV stream for all of
+    its input, so segment boundaries are lost. The worker loads the
+    library once instead, reads one JSON request per line on stdin and
+    answers each with a header and that segment's raw PCM on stdout
+    """
+    import ctypes
+    engine = ctypes.CDLL(library)
+    engine.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+    engine.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+    engine.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    engine.espeak_Synth.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                                    ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p]
+    frame_rate = engine.espeak_Initialize(ESPEAK_OUTPUT_SYNCHRONOUS, 0, None, 0)
+
+    pcm = bytearray()
+
+    @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+    def collect(samples, count, events):
+        if samples and count > 0:
+            pcm.extend(ctypes.string_at(samples, count * ESPEAK_SAMPLE_WIDTH))
+        return 0
+
+    engine.espeak_SetSynthCallback(collect)
+    output = sys.stdout.buffer
+    for line in sys.stdin.buffer:
+        request = json.loads(line)
+        pcm.clear()
+        text = request['text'].encode('utf-8')
+        # Synchronous mode: espeak_Synth returns once the whole segment is in pcm
+        failed = frame_rate <= 0 \
+            or engine.espeak_SetVoiceByName(request['voice'].encode('utf-8')) != 0 \
+            or engine.espeak_SetParameter(ESPEAK_RATE, request['rate'], 0) != 0 \
+            or engine.espeak_SetParameter(ESPEAK_PITCH, request['pitch'], 0) != 0 \
+            or engine.espeak_Synth(text, len(text) + 1, 0, ESPEAK_POSITION_CHARACTER, 0,
+                                   ESPEAK_CHARS_UTF8, None, None) != 0
+        if failed:
+            output.write(ESPEAK_RESPONSE_HEADER.pack(0, 0))
+        else:
+            output.write(ESPEAK_RESPONSE_HEADER.pack(frame_rate, len(pcm)))
+            output.write(pcm)
+        output.flush()
+
+
+class _EngineProcess:
+    """One long-running engine process fed JSON lines over stdin"""
+
+    process: subprocess.Popen
+
+    def _request(self, request: Dict) -> None:
+        self.process.stdin.write(json.dumps(request).encode('utf-8') + b'\n')
+        self.process.stdin.flush()
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class _PiperProcess(_EngineProcess):
+    """Piper writes each request's audio to the output file it names"""
+
+    def __init__(self, executable: str, model: str, length_scale: float):
+        self.process = subprocess.Popen(
+            [executable, '--model', model, '--json-input', '--quiet',
+             '--length_scale', str(length_scale)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def synthesize(self, text: str, path: str) -> None:
+        self._request({'text': text, 'output_file': path})
+        # Piper prints the output path once the utterance is written
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Piper process exited unexpectedly")
+
+
+class _EspeakProcess(_EngineProcess):
+    """espeak-ng worker (espeak_worker) returning each request's PCM over its stdout pipe"""
+
+    def __init__(self, library: str):
+        self.process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), library],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def synthesize(self, text: str, voice: str, rate: int, pitch: int) -> Tuple[Tuple[int, int, int], bytes]:
+        self._request({'text': text, 'voice': voice, 'rate': rate, 'pitch': pitch})
+        frame_rate, size = ESPEAK_RESPONSE_HEADER.unpack(self._read(ESPEAK_RESPONSE_HEADER.size))
+        if not frame_rate:
+            raise RuntimeError(f"espeak-ng could not synthesize with voice {voice!r}")
+        return (1, ESPEAK_SAMPLE_WIDTH, frame_rate), self._read(size)
+
+    def _read(self, size: int) -> bytes:
+        data = self.process.stdout.read(size)
+        if len(data) < size:
+            raise RuntimeError("espeak-ng worker exited unexpectedly")
+        return data
+
+
+class OfflineTTS:
+    """
+    Small worker pool around espeak-ng or Piper
+
+    Both engines run in long-lived processes fed one JSON request per
+    segment over stdin. espeak-ng workers load libespeak-ng once and send
+    each segment's PCM back over their stdout pipe; Piper processes load a
+    neural model and write each segment's WAV themselves.
+    """
+
+    def __init__(self, engine: str = 'espeak-ng', workers: int = 2, model: Optional[str] = None):
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.model = model or os.environ.get('PIPER_MODEL', 'en_US-lessac-medium.onnx')
+        if engine == 'piper':
+            self.executable = self._find_executable(engine)
+        else:
+            self.library = find_espeak_library()
+        self._executor = None
+        self._processes = queue.Queue()
+        self._started = 0
+        self._piper_length_scale = 1.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _find_executable(engine: str) -> str:
+        path = shutil.which(engine)
+        if path:
+            return path
+        raise FileNotFoundError(f"{engine} executable not found on PATH")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def synthesize(self, segments: List[str], segment_dir: Path, voice: str = 'en-us',
+                   rate: str = 'medium', pitch: str = 'medium',
+                   model: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """
+        Synthesize segments across the worker pool, yielding (index, path) in order
+        voice is an espeak-ng voice; model is a Piper voice model (default: the pool's)
+        """
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        if self.engine == 'piper':
+            # Model and rate are fixed per Piper process, so restart workers when they change
+            length_scale = _prosody_value(rate, PIPER_LENGTH_SCALES, 1.0, inverse=True)
+            model = model or self.model
+            if length_scale != self._piper_length_scale or model != self.model:
+                self._close_processes()
+                self._piper_length_scale = length_scale
+                self.model = model
+
+        def run(job: Tuple[int, str]) -> Tuple[int, str]:
+            index, text = job
+            path = str(segment_dir / f"{index:05d}.wav")
+            if self.engine == 'piper':
+                self._synthesize_piper(text, path)
+            else:
+                self._synthesize_espeak(text, path, voice, rate, pitch)
+            return index, path
+
+        yield from self._executor.map(run, enumerate(segments))
+
+    def _synthesize_espeak(self, text: str, path: str, voice: str, rate: str, pitch: str) -> None:
+        voice = voice if voice and voice != 'default' else 'en-us'
+        params, pcm = self._run(lambda process: process.synthesize(
+            text, voice, _prosody_value(rate, ESPEAK_RATES, 175), _prosody_value(pitch, ESPEAK_PITCHES, 50)
+        ))
+        write_wav(path, params, pcm)
+
+    def _synthesize_piper(self, text: str, path: str) -> None:
+        self._run(lambda process: process.synthesize(text, path))
+
+    def _run(self, request):
+        """Run request on a pooled process; a process that fails is dropped from the pool"""
+        process = self._acquire()
+        try:
+            result = request(process)
+        except Exception:
+            process.close()
+            with self._lock:
+                self._started -= 1
+            raise
+        self._processes.put(process)
+        return result
+
+    def _acquire(self) -> _EngineProcess:
+        """Check out an idle process, starting one if the pool is not full"""
+        with self._lock:
+            if self._processes.empty() and self._started < self.workers:
+                # Counted only once it has started, so a failed start frees the slot
+                if self.engine == 'piper':
+                    process = _PiperProcess(self.executable, self.model, self._piper_length_scale)
+                else:
+                    process = _EspeakProcess(self.library)
+                self._started += 1
+                return process
+        return self._processes.get()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._close_processes()
+
+    def _close_processes(self) -> None:
+        while not self._processes.empty():
+            self._processes.get().close()
+        self._started = 0
+
+
+if __name__ == "__main__":
+    # Started by _EspeakProcess with the library to load
+    espeak_worker(sys.argv[1])
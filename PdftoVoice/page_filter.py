@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Page Filter - Cheap pre-classification of rasterized pages before OCR
+Blank separator pages are skipped, and a page identical or nearly
+identical to one of the last few pages (double scans, repeated plates)
+reuses that page's OCR result. Pages that look like full-page pictures
+are only flagged: they are still OCR'd (layout analysis keeps the cost to
+their text regions), since captions, and scans on grey paper, look alike
+to a histogram. Every decision is recorded for the run report
+
+Classification uses the grey-level histogram (ink and mid-tone fractions);
+duplicates are found by a byte hash, or by a 256-bit difference hash of a
+thumbnail confirmed by a pixel comparison of the thumbnails, so pages that
+merely share a layout are never merged
+"""
+
+import copy
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Grey level below which a pixel counts as ink
+INK_LEVEL = 128
+# Pages with less ink than this fraction are blank
+BLANK_INK = 0.0002
+# Pictures have many mid-tone pixels; text scans are mostly paper and ink
+MIDTONE_RANGE = (48, 160)
+IMAGE_MIDTONES = 0.3
+IMAGE_INK = 0.5
+
+# Near-duplicate detection
+DUPLICATE_WINDOW = 16           # Earlier pages a page is compared with
+THUMBNAIL_WIDTH = 600           # Word shapes stay distinguishable at this size
+HASH_SIZE = 16                  # Difference hash of HASH_SIZE x HASH_SIZE bits
+MAX_HASH_DISTANCE = 8
+PIXEL_TOLERANCE = 48            # Thumbnail pixels differing by more than this...
+MAX_CHANGED_PIXELS = 0.002      # ...may be at most this fraction of the page
+
+
+def ink_statistics(gray) -> Tuple[float, float]:
+    """(ink fraction, mid-tone fraction) of a greyscale PIL image"""
+    histogram = gray.histogram()
+    total = float(sum(histogram)) or 1.0
+    ink = sum(histogram[:INK_LEVEL]) / total
+    midtones = sum(histogram[MIDTONE_RANGE[0]:MIDTONE_RANGE[1]]) / total
+    return ink, midtones
+
+
+def classify_page(gray) -> str:
+    """'blank', 'image' or 'text'"""
+    ink, midtones = ink_statistics(gray)
+    if ink < BLANK_INK:
+        return 'blank'
+    if midtones > IMAGE_MIDTONES or ink > IMAGE_INK:
+        return 'image'
+    return 'text'
+
+
+def difference_hash(thumbnail) -> int:
+    """HASH_SIZE x HASH_SIZE-bit dHash: is each pixel brighter than its right neighbour"""
+    from PIL import Image
+    small = thumbnail.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = small.tobytes()    # One byte per pixel: thumbnails are greyscale
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for column in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+
+def thumbnails_match(first, second) -> bool:
+    """True if two thumbnails differ in at most MAX_CHANGED_PIXELS of their pixels"""
+    from PIL import ImageChops
+    if first.size != second.size:
+        return False
+    histogram = ImageChops.difference(first, second).histogram()
+    changed = sum(histogram[PIXEL_TOLERANCE + 1:])
+    return changed <= MAX_CHANGED_PIXELS * first.size[0] * first.size[1]
+
+
+class PageFilter:
+    """
+    Decides, page by page, whether a page needs OCR
+    Decisions: 'ocr', 'image' (OCR'd, but flagged), 'blank', or
+    ('duplicate', source page number)
+    """
+
+    def __init__(self, window: int = DUPLICATE_WINDOW):
+        self.window = window
+        self._recent = OrderedDict()    # page_num -> (byte digest, dhash, thumbnail) of OCR'd pages
+        self.decisions: Dict[int, object] = {}
+        self.sizes: Dict[int, Tuple[int, int]] = {}     # Of pages that are not OCR'd
+
+    def classify(self, page_num: int, image) -> object:
+        from PIL import Image
+        gray = image.convert('L')
+        kind = classify_page(gray)
+        if kind == 'blank':
+            self.decisions[page_num] = kind
+            self.sizes[page_num] = image.size
+            return kind
+
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+        width = min(THUMBNAIL_WIDTH, gray.width)
+        thumbnail = gray.resize((width, max(1, gray.height * width // gray.width)), Image.BOX)
+        page_hash = difference_hash(thumbnail)
+
+        for source, (source_digest, source_hash, source_thumbnail) in reversed(self._recent.items()):
+            if source_digest == digest or (
+                    bin(source_hash ^ page_hash).count('1') <= MAX_HASH_DISTANCE
+                    and thumbnails_match(source_thumbnail, thumbnail)):
+                self.decisions[page_num] = ('duplicate', source)
+                self.sizes[page_num] = image.size
+                return self.decisions[page_num]
+
+        self._recent[page_num] = (digest, page_hash, thumbnail)
+        while len(self._recent) > self.window:
+            self._recent.popitem(last=False)
+        self.decisions[page_num] = 'image' if kind == 'image' else 'ocr'
+        return self.decisions[page_num]
+
+    def filter(self, images: Iterator[Tuple[int, object]]) -> Iterator[Tuple[int, object]]:
+        """Pass on only the pages that need OCR"""
+        for page_num, image in images:
+            if self.classify(page_num, image) in ('ocr', 'image'):
+                yield page_num, image
+
+    def report(self) -> Dict[str, object]:
+        """Skip decisions for the run report"""
+        report = {'blank': [], 'image_only': [], 'duplicates': {}}
+        for page_num, decision in sorted(self.decisions.items()):
+            if decision == 'blank':
+                report['blank'].append(page_num)
+            elif decision == 'image':
+                report['image_only'].append(page_num)
+            elif isinstance(decision, tuple):
+                report['duplicates'][str(page_num)] = decision[1]
+        report['ocr_pages'] = sum(1 for decision in self.decisions.values() if decision in ('ocr', 'image'))
+        report['skipped_pages'] = len(self.decisions) - report['ocr_pages']
+        return report
+
+
+def empty_segments(size: Tuple[int, int], reason: str) -> Dict[str, List]:
+    """Text segments for a page that was not OCR'd"""
+    return {'regular': [], 'italic': [], 'coordinates': [], 'lines': [], 'words': [],
+            'size': size, 'skipped': reason}
+
+
+def merge_skipped(page_filter: PageFilter, ocr_pages: Iterator[Tuple[int, Dict]]) -> Iterator[Tuple[int, Dict]]:
+    """
+    Interleave OCR results with the pages the filter skipped, in page order
+    Duplicates get a copy of their source page's result, which is kept for
+    the length of the duplicate window
+    """
+    recent = OrderedDict()
+    next_page = 1
+
+    def skipped_until(last: Optional[int]):
+        nonlocal next_page
+        while (last is None and next_page in page_filter.decisions) or (last is not None and next_page < last):
+            decision = page_filter.decisions[next_page]
+            size = page_filter.sizes.pop(next_page, (0, 0))
+            if isinstance(decision, tuple):
+                text_segments = copy.deepcopy(recent[decision[1]])
+                text_segments['size'] = size
+                text_segments['duplicate_of'] = decision[1]
+            else:
+                text_segments = empty_segments(size, decision)
+            yield next_page, text_segments
+            next_page += 1
+
+    for page_num, text_segments in ocr_pages:
+        yield from skipped_until(page_num)
+        # Copied before later stages modify the page in place
+        recent[page_num] = copy.deepcopy(text_segments)
+        while len(recent) > page_filter.window:
+            recent.popitem(last=False)
+        yield page_num, text_segments
+        next_page = page_num + 1
+    yield from skipped_until(None)
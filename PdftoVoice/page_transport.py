@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Page Transport - Hand rasterized pages to OCR worker processes via shared memory
+Pickling a 300-DPI page to a worker copies ~25 MB through a pipe twice.
+Instead, the rasterizing process copies the pixels once, as greyscale
+(all OCR reads), into one of a fixed set of shared-memory slots and
+sends the worker a small PageRef; the worker maps the slot and wraps it
+as a PIL image (or NumPy array) without copying
+
+The slot count bounds the pages in flight: put() only succeeds while a
+slot is free, and a slot becomes free again when release() is called for
+the page's result. The pool owns the blocks and unlinks them on close()
+"""
+
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'RGB': 3, 'RGBA': 4, 'CMYK': 4}
+
+# Pages travel as 8-bit greyscale: a third of RGB's bytes, and the one
+# 8-bit mode Image.frombuffer maps without copying
+PAGE_MODE = 'L'
+
+
+class PageRef(NamedTuple):
+    """Picklable handle to a page held in a shared-memory slot"""
+    slot: int
+    name: str           # Shared-memory block name
+    mode: str           # PIL mode of the pixels
+    size: tuple         # (width, height)
+
+    @property
+    def nbytes(self) -> int:
+        return self.size[0] * self.size[1] * BYTES_PER_PIXEL[self.mode]
+
+
+class SharedPagePool:
+    """Fixed number of reusable shared-memory page slots, owned by the rasterizing process"""
+
+    def __init__(self, slots: int):
+        if slots < 1:
+            raise ValueError("SharedPagePool needs at least one slot")
+        self.slots = slots
+        self._blocks: List[Optional[shared_memory.SharedMemory]] = [None] * slots
+        self._free = list(range(slots))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def in_flight(self) -> int:
+        return self.slots - len(self._free)
+
+    def put(self, image) -> PageRef:
+        """Copy a PIL image's pixels, as greyscale, into a free slot"""
+        if not self._free:
+            raise RuntimeError(f"All {self.slots} page slots are in flight; release one first")
+        if image.mode != PAGE_MODE:
+            image = image.convert(PAGE_MODE)
+        nbytes = image.size[0] * image.size[1] * BYTES_PER_PIXEL[PAGE_MODE]
+        slot = self._free.pop()
+        block = self._blocks[slot]
+        if block is None or block.size < nbytes:
+            # Slots grow to the largest page seen; pages of one book are usually the same size
+            self._unlink(slot)
+            block = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._blocks[slot] = block
+        _copy_pixels(image, block.buf)
+        return PageRef(slot, block.name, PAGE_MODE, image.size)
+
+    def release(self, ref: PageRef) -> None:
+        """Mark a page's slot reusable once its worker has finished with it"""
+        if ref.slot not in self._free:
+            self._free.append(ref.slot)
+
+    def _unlink(self, slot: int) -> None:
+        block = self._blocks[slot]
+        if block is not None:
+            block.close()
+            block.unlink()
+            self._blocks[slot] = None
+
+    def close(self) -> None:
+        for slot in range(self.slots):
+            self._unlink(slot)
+        self._free = list(range(self.slots))
+
+
+def _copy_pixels(image, buffer) -> None:
+    """
+    Encode an image's raw pixels straight into buffer
+    Same loop as Image.tobytes, minus the joined copy of the whole page
+    """
+    from PIL import Image
+    image.load()
+    encoder = Image._getencoder(image.mode, 'raw', image.mode)
+    encoder.setimage(image.im, (0, 0) + image.size)
+    chunk_size = max(65536, image.size[0] * 4)
+    position = 0
+    while True:
+        _, status, chunk = encoder.encode(chunk_size)
+        buffer[position:position + len(chunk)] = chunk
+        position += len(chunk)
+        if status:
+            break
+    if status < 0:
+        raise RuntimeError(f"Encoder error {status} copying page pixels")
+
+
+# Worker side: blocks stay mapped for the life of the worker process, so a
+# slot reused for the next page costs no new mapping. Keyed by slot: when
+# the pool grows a slot into a new block, the old mapping is closed
+_attached: Dict[int, shared_memory.SharedMemory] = {}
+
+
+def _attach(ref: PageRef) -> shared_memory.SharedMemory:
+    block = _attached.get(ref.slot)
+    if block is not None and block.name != ref.name:
+        block.close()
+        block = None
+    if block is None:
+        try:
+            # The pool owns the block; workers must never unlink it
+            block = shared_memory.SharedMemory(name=ref.name, track=False)
+        except TypeError:
+            # Before Python 3.13 the worker shares the parent's resource tracker,
+            # where the block is already registered
+            block = shared_memory.SharedMemory(name=ref.name)
+        _attached[ref.slot] = block
+    return block
+
+
+def open_image(ref: PageRef):
+    """
+    PIL image backed directly by the shared slot (no copy)
+    Drop it before the result is returned: the slot is refilled afterwards
+    """
+    from PIL import Image
+    block = _attach(ref)
+    return Image.frombuffer(ref.mode, ref.size, block.buf[:ref.nbytes], 'raw', ref.mode, 0, 1)
+
+
+def open_array(ref: PageRef):
+    """NumPy view of the shared slot, shaped (height, width[, channels])"""
+    import numpy as np
+    block = _attach(ref)
+    channels = BYTES_PER_PIXEL[ref.mode]
+    shape = (ref.size[1], ref.size[0]) + ((channels,) if channels > 1 else ())
+    return np.ndarray(shape, dtype=np.uint8, buffer=block.buf[:ref.nbytes])
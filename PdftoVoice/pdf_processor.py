@@ -6,31 +6,140 @@ Preserves italic formatting and creates HTML output
 
 import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, List, Dict
-import pytesseract
-from pdf2image import convert_from_path
+from typing import Tuple, List, Dict, Optional, Iterator, Callable
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
-import easyocr
 from bs4 import BeautifulSoup
 import logging
 
+from html_writer import StreamingHTMLWriter, PaginatedHTMLWriter
+from line_index import RunningLineIndex, LINE_CLASSES, parse_bbox
+from text_document import TextDocumentWriter
+from events import EventBus
+from ocr_engines import get_ocr_engine
+from page_transport import SharedPagePool, PageRef, open_image
+from page_layout import analyze_layout, PSM_SINGLE_LINE
+from page_filter import PageFilter, merge_skipped
+from easyocr_onnx import create_reader, default_threads, EASYOCR_BACKENDS
+from confidence_index import ConfidenceIndex, confidence_path, page_statistics, LOW_CONFIDENCE
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+WORD_CONFIDENCE_PATTERN = re.compile(r'x_wconf (\d+)')
+PSM_PATTERN = re.compile(r'--psm \d+')
+
+# Shared-memory page slots per OCR worker (bounds the pages in flight)
+SLOTS_PER_WORKER = 2
+
+# EasyOCR fallback batching: pages per readtext_batched call, text regions per
+# recognition forward pass, and the most pages held back waiting for a batch
+EASYOCR_BATCH_PAGES = 8
+EASYOCR_BATCH_SIZE = 16
+EASYOCR_WINDOW_PAGES = 32
+# EasyOCR detections below this score are left out of the text (but indexed)
+EASYOCR_MIN_CONFIDENCE = 0.5
+
+# Highest DPI used when re-OCRing low-confidence pages
+MAX_REOCR_DPI = 600
+
+# Low-confidence line refinement: each line is cropped with REFINE_PADDING,
+# upsampled REFINE_SCALE times and read again. Pages with more low lines than
+# MAX_REFINE_LINES are left whole for reocr_pages
+REFINE_ENGINES = ('tesseract', 'easyocr')
+REFINE_SCALE = 2
+REFINE_PADDING = 4
+MAX_REFINE_LINES = 32
+
+# Set in each OCR worker process by _init_ocr_worker
+_worker_processor = None
+
+
+def _init_ocr_worker(dpi: int, ocr_engine: str, layout: bool, refine: Optional[str],
+                     easyocr_backend: str, easyocr_threads: int) -> None:
+    """Load the OCR models once per worker process"""
+    global _worker_processor
+    _worker_processor = PDFProcessor(dpi=dpi, ocr_engine=ocr_engine, layout=layout, refine=refine,
+                                     easyocr_backend=easyocr_backend, easyocr_threads=easyocr_threads)
+
+
+def _ocr_shared_page(ref: PageRef) -> Dict:
+    """OCR a page straight out of its shared-memory slot"""
+    image = open_image(ref)
+    try:
+        return _worker_processor.detect_italic_text(image)
+    finally:
+        # Release the view on the slot before the parent reuses it
+        del image
+
 class PDFProcessor:
-    def __init__(self):
-        """Initialize PDF processor with OCR settings"""
+    def __init__(self, dpi: int = 300, events: Optional[EventBus] = None, ocr_engine: str = 'auto',
+                 ocr_workers: int = 1, layout: bool = True, region_workers: int = 1,
+                 skip_pages: bool = True, refine: Optional[str] = 'tesseract',
+                 easyocr_backend: str = 'torch', easyocr_threads: Optional[int] = None):
+        """
+        Initialize PDF processor with OCR settings
+        events receives a page_processed event (with ETA) per OCR'd page
+        ocr_engine picks how Tesseract is run: 'tesserocr' keeps the engine
+        loaded between pages, 'pytesseract' starts a process per page and
+        'auto' prefers tesserocr when it is installed
+        ocr_workers > 1 OCRs pages in worker processes, which receive the
+        greyscale pixels through shared memory (see page_transport.py)
+        layout finds text regions and columns first (see page_layout.py) and
+        OCRs only those, region_workers of them at a time
+        skip_pages leaves blank pages out of OCR, reuses the result of
+        repeated pages and flags picture-only pages (see page_filter.py)
+        refine re-reads just the low-confidence lines of each page with a
+        second pass: 'tesseract' (single-line mode) or 'easyocr'; None turns
+        it off
+        easyocr_backend runs EasyOCR on PyTorch ('torch') or on ONNX Runtime
+        with an int8 recognizer ('onnx', see easyocr_onnx.py); easyocr_threads caps
+        its intra-op threads, by default the cores divided among ocr_workers
+        """
+        if refine is not None and refine not in REFINE_ENGINES:
+            raise ValueError(f"Unknown refine engine {refine!r} (choose from {', '.join(REFINE_ENGINES)})")
+        if easyocr_backend not in EASYOCR_BACKENDS:
+            raise ValueError(f"Unknown EasyOCR backend {easyocr_backend!r} "
+                             f"(choose from {', '.join(EASYOCR_BACKENDS)})")
+        self.dpi = dpi
+        self.ocr_engine = ocr_engine
+        self.ocr_workers = ocr_workers
+        self.layout = layout
+        self.region_workers = region_workers
+        self.skip_pages = skip_pages
+        self.refine = refine
+        self.events = events or EventBus()
         self.output_dir = Path("output")
         self.html_dir = self.output_dir / "html"
         self.html_dir.mkdir(parents=True, exist_ok=True)
         
-        # Initialize EasyOCR reader (supports multiple languages)
-        self.reader = easyocr.Reader(['en'])
+        # EasyOCR readers (support multiple languages), one per backend, loaded on first fallback
+        self.easyocr_backend = easyocr_backend
+        self.easyocr_threads = easyocr_threads or default_threads(ocr_workers)
+        self._readers = {}
+        self.easyocr_batch_size = EASYOCR_BATCH_SIZE
+        self.easyocr_workers = 0    # DataLoader workers for recognition
         
         # Tesseract configuration for better OCR
         self.tesseract_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1'
+        self.tesseract = get_ocr_engine(ocr_engine, self.tesseract_config, dpi=dpi)
+        logger.info(f"OCR engine: {self.tesseract.name}")
+    
+    def close(self) -> None:
+        """Release the persistent OCR engines"""
+        self.tesseract.close()
+    
+    @property
+    def reader(self):
+        """EasyOCR is only needed for pages Tesseract finds no text on"""
+        if self.easyocr_backend not in self._readers:
+            self._readers[self.easyocr_backend] = create_reader(self.easyocr_backend, ['en'],
+                                                                threads=self.easyocr_threads)
+        return self._readers[self.easyocr_backend]
         
     def convert_pdf_to_images(self, pdf_path: str, dpi: int = 300) -> List[Image.Image]:
         """Convert PDF pages to high-quality images"""
@@ -43,56 +152,376 @@ class PDFProcessor:
             logger.error(f"Error converting PDF: {e}")
             raise
     
+    def get_page_count(self, pdf_path: str) -> int:
+        """Get the number of pages without rasterizing anything"""
+        return int(pdfinfo_from_path(pdf_path)['Pages'])
+    
+    def iter_pdf_images(self, pdf_path: str, dpi: int = 300, batch_size: int = 4,
+                        grayscale: bool = False) -> Iterator[Image.Image]:
+        """
+        Yield page images a few pages at a time
+        Only one batch of rasterized pages is held in memory at once
+        """
+        page_count = self.get_page_count(pdf_path)
+        for first_page in range(1, page_count + 1, batch_size):
+            last_page = min(first_page + batch_size - 1, page_count)
+            yield from convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                                         grayscale=grayscale)
+    
+    def iter_ocr_pages(self, pdf_path: str, page_filter: Optional[PageFilter] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (page number, text segments) in page order
+        With ocr_workers > 1 the rasterizer keeps running while workers OCR
+        earlier pages; at most SLOTS_PER_WORKER pages per worker are in flight
+        With page_filter, only the pages it passes are OCR'd; the others are
+        yielded empty (or as copies of the page they repeat)
+        """
+        # Worker pages travel as greyscale, so rasterize them that way
+        images = enumerate(self.iter_pdf_images(pdf_path, dpi=self.dpi, grayscale=self.ocr_workers > 1), 1)
+        if page_filter is not None:
+            images = page_filter.filter(images)
+        if self.ocr_workers <= 1:
+            ocr_pages = self._iter_batched_fallback(images)
+        else:
+            ocr_pages = self._iter_worker_pages(images)
+        if page_filter is not None:
+            ocr_pages = merge_skipped(page_filter, ocr_pages)
+        yield from ocr_pages
+    
+    def _iter_worker_pages(self, images: Iterator[Tuple[int, Image.Image]]) -> Iterator[Tuple[int, Dict]]:
+        """OCR pages in worker processes, handing them over through shared memory"""
+        with SharedPagePool(self.ocr_workers * SLOTS_PER_WORKER) as pool, \
+                ProcessPoolExecutor(self.ocr_workers, initializer=_init_ocr_worker,
+                                    initargs=(self.dpi, self.ocr_engine, self.layout, self.refine,
+                                              self.easyocr_backend, self.easyocr_threads)) as executor:
+            in_flight = deque()
+            
+            def finish():
+                page_num, ref, future = in_flight.popleft()
+                text_segments = future.result()
+                pool.release(ref)
+                text_segments['size'] = ref.size
+                return page_num, text_segments
+            
+            for page_num, image in images:
+                if len(in_flight) >= pool.slots:
+                    yield finish()
+                ref = pool.put(image)
+                del image
+                in_flight.append((page_num, ref, executor.submit(_ocr_shared_page, ref)))
+            while in_flight:
+                yield finish()
+    
+    def _iter_batched_fallback(self, images: Iterator[Tuple[int, Image.Image]]) -> Iterator[Tuple[int, Dict]]:
+        """
+        Tesseract every page; pages it finds no text on are kept back and
+        sent to EasyOCR together (EASYOCR_BATCH_PAGES at a time), then all
+        pages are yielded in order
+        """
+        window = []     # (page_num, text_segments, image if it needs the fallback)
+        
+        def flush():
+            fallback = [(text_segments, image) for _, text_segments, image in window if image is not None]
+            if fallback:
+                logger.info(f"EasyOCR fallback for {len(fallback)} pages")
+                results = self.readtext_pages([image for _, image in fallback])
+                for (text_segments, image), page_results in zip(fallback, results):
+                    self._add_easyocr_results(text_segments, page_results)
+                    self.refine_low_confidence(image, text_segments)
+            pages = [(page_num, text_segments) for page_num, text_segments, _ in window]
+            window.clear()
+            return pages
+        
+        waiting = 0
+        for page_num, image in images:
+            text_segments = self._read_hocr(image)
+            text_segments['size'] = image.size
+            needs_fallback = self._needs_fallback(text_segments)
+            if not needs_fallback:
+                self.refine_low_confidence(image, text_segments)
+            window.append((page_num, text_segments, image if needs_fallback else None))
+            waiting += needs_fallback
+            if waiting >= EASYOCR_BATCH_PAGES or len(window) >= EASYOCR_WINDOW_PAGES:
+                yield from flush()
+                waiting = 0
+        yield from flush()
+    
     def detect_italic_text(self, image: Image.Image) -> Dict[str, List]:
         """
         Detect italic text using multiple OCR approaches
         Returns dictionary with regular text and italic text segments
         """
-        # Method 1: Use Tesseract with HOCR output
-        hocr_data = pytesseract.image_to_pdf_or_hocr(
-            image, extension='hocr', config=self.tesseract_config
-        )
+        text_segments = self._read_hocr(image)
         
-        # Method 2: Use EasyOCR for additional text detection
-        easyocr_results = self.reader.readtext(image)
-        
-        # Parse HOCR for italic detection
-        soup = BeautifulSoup(hocr_data, 'html.parser')
+        # Fallback: if no text detected via HOCR, use EasyOCR
+        if self._needs_fallback(text_segments):
+            self._add_easyocr_results(text_segments, self.readtext_pages([image])[0])
         
+        self.refine_low_confidence(image, text_segments)
+        return text_segments
+    
+    @staticmethod
+    def _needs_fallback(text_segments: Dict) -> bool:
+        """No text from Tesseract, unless layout analysis found nothing worth reading"""
+        if text_segments['regular'] or text_segments['italic']:
+            return False
+        regions = text_segments.get('regions')
+        return regions is None or any(region['kind'] == 'text' for region in regions)
+    
+    def _read_hocr(self, image: Image.Image) -> Dict[str, List]:
+        """
+        Method 1: Use Tesseract with HOCR output
+        With layout analysis on, only the page's text regions are OCR'd, in
+        reading order and each with its own page segmentation mode
+        """
         text_segments = {
             'regular': [],
             'italic': [],
-            'coordinates': []
+            'coordinates': [],
+            'lines': [],    # {'text', 'bbox', 'regular': (start, end) slice of regular words}
+            'words': []     # Reading order: {'text', 'italic', 'bbox', 'conf', 'line'}
         }
         
-        # Extract text with formatting info from HOCR
-        for word in soup.find_all('span', class_='ocrx_word'):
-            word_text = word.get_text().strip()
-            if word_text:
-                # Check for italic indicators in the word's properties
-                title = word.get('title', '')
-                
-                # Simple heuristic: check if the text appears slanted or has italic characteristics
-                # This is a simplified approach - more sophisticated methods could be used
-                is_italic = self._is_likely_italic(word_text, title)
-                
-                if is_italic:
-                    text_segments['italic'].append(word_text)
-                else:
-                    text_segments['regular'].append(word_text)
+        if not self.layout:
+            self._parse_hocr(self.tesseract.hocr(image), text_segments)
+            return text_segments
         
-        # Fallback: if no text detected via HOCR, use EasyOCR
-        if not text_segments['regular'] and not text_segments['italic']:
-            for (bbox, text, confidence) in easyocr_results:
-                if confidence > 0.5:  # Only use high-confidence results
-                    # Simple italic detection based on text patterns
-                    if self._is_likely_italic_pattern(text):
-                        text_segments['italic'].append(text)
-                    else:
-                        text_segments['regular'].append(text)
+        regions = analyze_layout(image)
+        text_regions = [region for region in regions if region.kind == 'text']
+        text_segments['regions'] = [{'bbox': region.bbox, 'kind': region.kind, 'psm': region.psm}
+                                    for region in regions]
+        
+        def read_region(region):
+            config = PSM_PATTERN.sub(f'--psm {region.psm}', self.tesseract_config)
+            return self.tesseract.hocr(image.crop(region.bbox), config=config)
         
+        if self.region_workers > 1 and len(text_regions) > 1:
+            with ThreadPoolExecutor(self.region_workers) as executor:
+                hocr_pages = list(executor.map(read_region, text_regions))
+        else:
+            hocr_pages = [read_region(region) for region in text_regions]
+        
+        for region, hocr_data in zip(text_regions, hocr_pages):
+            self._parse_hocr(hocr_data, text_segments, region.bbox[:2])
         return text_segments
     
+    def _parse_hocr(self, hocr_data, text_segments: Dict, offset: Tuple[int, int] = (0, 0)) -> None:
+        """Append the words and lines of an hOCR page; boxes are shifted by offset"""
+        # Parse HOCR for italic detection
+        soup = BeautifulSoup(hocr_data, 'html.parser')
+        
+        def page_bbox(title: str) -> Tuple[int, int, int, int]:
+            x0, y0, x1, y1 = parse_bbox(title)
+            return (x0 + offset[0], y0 + offset[1], x1 + offset[0], y1 + offset[1])
+        
+        # Extract text with formatting info from HOCR, line by line
+        for line in soup.find_all('span', class_=LINE_CLASSES):
+            regular_start = len(text_segments['regular'])
+            line_words = []
+            for word in line.find_all('span', class_='ocrx_word'):
+                word_text = word.get_text().strip()
+                if word_text:
+                    line_words.append(word_text)
+                    # Check for italic indicators in the word's properties
+                    title = word.get('title', '')
+                    
+                    # Simple heuristic: check if the text appears slanted or has italic characteristics
+                    # This is a simplified approach - more sophisticated methods could be used
+                    is_italic = self._is_likely_italic(word_text, title)
+                    
+                    if is_italic:
+                        text_segments['italic'].append(word_text)
+                    else:
+                        text_segments['regular'].append(word_text)
+                    
+                    confidence = WORD_CONFIDENCE_PATTERN.search(title)
+                    text_segments['words'].append({
+                        'text': word_text,
+                        'italic': is_italic,
+                        'bbox': page_bbox(title),
+                        'conf': int(confidence.group(1)) if confidence else None,
+                        'line': len(text_segments['lines'])
+                    })
+            
+            if line_words:
+                text_segments['lines'].append({
+                    'text': ' '.join(line_words),
+                    'bbox': page_bbox(line.get('title', '')),
+                    'regular': (regular_start, len(text_segments['regular']))
+                })
+    
+    def refine_low_confidence(self, image: Image.Image, text_segments: Dict) -> int:
+        """
+        Re-read only the lines of a page that have a word below LOW_CONFIDENCE
+        Each such line (or EasyOCR detection) is cropped, upsampled and read
+        again by the refine engine; its words are replaced when the new mean
+        confidence is higher, and the page's text is rebuilt from the words
+        Returns the number of lines replaced
+        """
+        if not self.refine:
+            return 0
+        units = self._low_confidence_units(text_segments)
+        if not units:
+            return 0
+        if len(units) > MAX_REFINE_LINES:
+            logger.info(f"{len(units)} low-confidence lines on one page; left for reocr_pages")
+            return 0
+        
+        words = text_segments['words']
+        replacements = {}   # First word index -> (end, new words)
+        for start, end, bbox in units:
+            new_words = self._reread_region(image, bbox, words[start]['line'])
+            if new_words and self._mean_confidence(new_words) > self._mean_confidence(words[start:end]):
+                replacements[start] = (end, new_words)
+        if not replacements:
+            return 0
+        
+        refined = []
+        index = 0
+        while index < len(words):
+            if index in replacements:
+                index, new_words = replacements[index]
+                refined.extend(new_words)
+            else:
+                refined.append(words[index])
+                index += 1
+        text_segments['words'] = refined
+        self._rebuild_text(text_segments)
+        text_segments['refined_lines'] = len(replacements)
+        logger.debug(f"Refined {len(replacements)} of {len(units)} low-confidence lines")
+        return len(replacements)
+    
+    @staticmethod
+    def _mean_confidence(words: List[Dict]) -> float:
+        return sum(word['conf'] or 0 for word in words) / len(words)
+    
+    @staticmethod
+    def _low_confidence_units(text_segments: Dict) -> List[Tuple[int, int, Tuple[int, int, int, int]]]:
+        """(start, end, bbox) of each line, or line-less EasyOCR word, with a low-confidence word"""
+        words = text_segments['words']
+        units = []
+        start = 0
+        while start < len(words):
+            line = words[start]['line']
+            end = start + 1
+            if line is not None:
+                # Words of a line are consecutive
+                while end < len(words) and words[end]['line'] == line:
+                    end += 1
+            if any(word['conf'] is not None and word['conf'] < LOW_CONFIDENCE for word in words[start:end]):
+                bbox = text_segments['lines'][line]['bbox'] if line is not None else words[start]['bbox']
+                units.append((start, end, bbox))
+            start = end
+        return units
+    
+    def _reread_region(self, image: Image.Image, bbox: Tuple[int, int, int, int],
+                       line: Optional[int]) -> List[Dict]:
+        """Words of an upsampled crop of the page, with boxes in page coordinates"""
+        x0, y0 = max(bbox[0] - REFINE_PADDING, 0), max(bbox[1] - REFINE_PADDING, 0)
+        x1, y1 = min(bbox[2] + REFINE_PADDING, image.width), min(bbox[3] + REFINE_PADDING, image.height)
+        if x1 <= x0 or y1 <= y0:
+            return []
+        crop = image.crop((x0, y0, x1, y1))
+        crop = crop.resize((crop.width * REFINE_SCALE, crop.height * REFINE_SCALE), Image.LANCZOS)
+        
+        def page_bbox(box) -> Tuple[int, int, int, int]:
+            return (x0 + int(box[0] / REFINE_SCALE), y0 + int(box[1] / REFINE_SCALE),
+                    x0 + int(box[2] / REFINE_SCALE), y0 + int(box[3] / REFINE_SCALE))
+        
+        if self.refine == 'easyocr':
+            import numpy as np
+            words = []
+            for points, text, confidence in self.reader.readtext(np.asarray(crop.convert('RGB'))):
+                text = text.strip()
+                if text:
+                    xs = [point[0] for point in points]
+                    ys = [point[1] for point in points]
+                    words.append({
+                        'text': text,
+                        'italic': self._is_likely_italic_pattern(text),
+                        'bbox': page_bbox((min(xs), min(ys), max(xs), max(ys))),
+                        'conf': confidence * 100,
+                        'line': line
+                    })
+            return words
+        
+        segments = {'regular': [], 'italic': [], 'coordinates': [], 'lines': [], 'words': []}
+        config = PSM_PATTERN.sub(f'--psm {PSM_SINGLE_LINE}', self.tesseract_config)
+        self._parse_hocr(self.tesseract.hocr(crop, config=config), segments)
+        for word in segments['words']:
+            word['bbox'] = page_bbox(word['bbox'])
+            word['line'] = line
+        return segments['words']
+    
+    @staticmethod
+    def _rebuild_text(text_segments: Dict) -> None:
+        """Regular and italic word lists, and each line's text and regular slice, from the words"""
+        regular, italic = [], []
+        line_words = {}
+        for word in text_segments['words']:
+            line = word['line']
+            if line is not None and line not in line_words:
+                line_words[line] = ([], len(regular))
+            (italic if word['italic'] else regular).append(word['text'])
+            if line is not None:
+                line_words[line][0].append(word['text'])
+                text_segments['lines'][line]['regular'] = (line_words[line][1], len(regular))
+        for line, (texts, _) in line_words.items():
+            text_segments['lines'][line]['text'] = ' '.join(texts)
+        text_segments['regular'] = regular
+        text_segments['italic'] = italic
+    
+    def readtext_pages(self, images: List[Image.Image]) -> List[List]:
+        """
+        Method 2: EasyOCR results for several pages
+        Same-sized pages go through one readtext_batched call, so text regions
+        from all of them share recognition batches of easyocr_batch_size
+        """
+        import numpy as np
+        
+        results = [None] * len(images)
+        by_size = {}
+        for index, image in enumerate(images):
+            by_size.setdefault(image.size, []).append(index)
+        
+        for size, indices in by_size.items():
+            arrays = [np.asarray(images[index].convert('RGB')) for index in indices]
+            if len(arrays) == 1:
+                batch = [self.reader.readtext(arrays[0], batch_size=self.easyocr_batch_size,
+                                              workers=self.easyocr_workers)]
+            else:
+                batch = self.reader.readtext_batched(arrays, n_width=size[0], n_height=size[1],
+                                                     batch_size=self.easyocr_batch_size,
+                                                     workers=self.easyocr_workers)
+            for index, page_results in zip(indices, batch):
+                results[index] = page_results
+        return results
+    
+    def _add_easyocr_results(self, text_segments: Dict, easyocr_results: List) -> None:
+        for (bbox, text, confidence) in easyocr_results:
+            xs = [point[0] for point in bbox]
+            ys = [point[1] for point in bbox]
+            box = (int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys)))
+            if confidence <= EASYOCR_MIN_CONFIDENCE:
+                # Kept out of the text, but indexed for review and re-OCR
+                text_segments.setdefault('dropped', []).append({'text': text, 'bbox': box, 'conf': confidence * 100})
+                continue
+            
+            # Simple italic detection based on text patterns
+            is_italic = self._is_likely_italic_pattern(text)
+            if is_italic:
+                text_segments['italic'].append(text)
+            else:
+                text_segments['regular'].append(text)
+            
+            text_segments['words'].append({
+                'text': text,
+                'italic': is_italic,
+                'bbox': box,
+                'conf': confidence * 100,
+                'line': None
+            })
+    
     def _is_likely_italic(self, text: str, title: str) -> bool:
         """
         Heuristic to determine if text is likely italic
@@ -142,31 +571,135 @@ class PDFProcessor:
         
         return False
     
-    def process_pdf(self, pdf_path: str) -> Tuple[str, Dict]:
+    def process_pdf(self, pdf_path: str, document_path: Optional[str] = None) -> Tuple[str, Dict]:
         """
         Main processing function
+        With document_path, also writes the text document (see text_document.py)
+        so the audio stage can run later or elsewhere without re-OCR
         Returns HTML content and structured text data
         """
+        html_content = []
+        html_content.append(self._get_html_header())
+        
+        all_text_data = self._process_pages(
+            pdf_path, lambda page_num, page_html: html_content.append(page_html), document_path
+        )
+        
+        html_content.append(self._get_html_footer())
+        
+        final_html = '\n'.join(html_content)
+        return final_html, all_text_data
+    
+    def process_pdf_to_html(self, pdf_path: str, filename: str,
+                            pages_per_shard: Optional[int] = None,
+                            document_path: Optional[str] = None) -> Tuple[str, Dict]:
+        """
+        Process a PDF while streaming the HTML preview straight to disk
+        Each page is appended and flushed as soon as it is OCR'd, so the preview
+        can be opened while long jobs are still running
+        With pages_per_shard, writes a paginated preview (index page + lazily
+        loaded shards) to output/html/<filename>/ instead of one big file
+        With document_path, also writes the text document
+        Returns path to HTML file (or index page) and structured text data
+        """
+        if pages_per_shard:
+            writer = PaginatedHTMLWriter(self.html_dir / filename, self._get_html_header(),
+                                         self._get_html_footer(), pages_per_shard)
+            output_path = writer.index_path
+        else:
+            output_path = self.html_dir / f"{filename}.html"
+            writer = StreamingHTMLWriter(output_path, self._get_html_header(), self._get_html_footer())
+        
+        with writer:
+            all_text_data = self._process_pages(pdf_path, writer.write_page, document_path, source=filename)
+        
+        return str(output_path), all_text_data
+    
+    def reocr_pages(self, pdf_path: str, text_data: Dict, pages: Optional[List[int]] = None,
+                    dpi: Optional[int] = None, index: Optional[ConfidenceIndex] = None) -> Dict:
+        """
+        Re-OCR only the pages that need it at a higher DPI
+        pages defaults to the confidence index's review pages; the index is
+        read from the file saved next to the text document when not given.
+        A new result replaces a page only if its mean confidence is higher
+        Returns a copy of text_data with the improved pages and a 'reocr'
+        report: {page: {'before', 'after', 'replaced'}}
+        """
+        if index is None:
+            document = text_data.get('document')
+            path = confidence_path(document) if document else None
+            index = ConfidenceIndex.load(path) if path and path.exists() else ConfidenceIndex()
+        if pages is None:
+            pages = index.review_pages()
+        dpi = dpi or min(self.dpi * 2, MAX_REOCR_DPI)
+        # Running headers/footers found in the first pass are stripped again
+        line_index = RunningLineIndex.from_keys(text_data.get('running_keys', []))
+        
+        result = dict(text_data)
+        result['pages'] = list(text_data['pages'])
+        positions = {page_data['page_number']: position for position, page_data in enumerate(result['pages'])}
+        report = {}
+        for page_num in pages:
+            if page_num not in positions:
+                continue
+            image = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)[0]
+            text_segments = self.detect_italic_text(image)
+            line_index.add_page(text_segments['lines'], image.height, count=False)
+            self._strip_running_lines(text_segments, line_index)
+            
+            before = index.pages.get(page_num, {}).get('mean_confidence')
+            after = page_statistics(text_segments['words'], index.low_confidence)['mean_confidence']
+            replaced = after is not None and (before is None or after > before)
+            if replaced:
+                result['pages'][positions[page_num]] = {
+                    'page_number': page_num,
+                    'regular_text': ' '.join(text_segments['regular']),
+                    'italic_text': ' '.join(text_segments['italic'])
+                }
+                index.add_page(page_num, text_segments['words'], text_segments.get('dropped', ()), image.size)
+            report[page_num] = {'before': before, 'after': after, 'replaced': replaced}
+            logger.info(f"Re-OCR page {page_num} at {dpi} DPI: confidence {before} -> {after}"
+                        f"{'' if replaced else ' (kept original)'}")
+        
+        result['confidence'] = index.summary()
+        result['reocr'] = report
+        return result
+    
+    def _process_pages(self, pdf_path: str, on_page: Callable[[int, str], None],
+                       document_path: Optional[str] = None, source: Optional[str] = None) -> Dict:
+        """
+        OCR the PDF page by page, passing each page's HTML to on_page
+        and streaming text, word boxes and confidences to document_path
+        source names the book in events (default: the PDF's stem)
+        Returns structured text data
+        """
         logger.info(f"Processing PDF: {pdf_path}")
         
-        # Convert PDF to images
-        images = self.convert_pdf_to_images(pdf_path)
+        page_count = self.get_page_count(pdf_path)
+        source = source or Path(pdf_path).stem
+        self.events.start_stage('ocr', page_count, source=source, path=str(pdf_path))
         
         all_text_data = {
             'regular': [],
             'italic': [],
-            'pages': []
+            'pages': [],
+            'refined_lines': 0
         }
         
-        html_content = []
-        html_content.append(self._get_html_header())
+        # Cross-page index of first/last lines for running header/footer removal.
+        # Pages wait until min_pages - 1 later pages are indexed, so a running
+        # head is already counted when the first page carrying it is emitted
+        line_index = RunningLineIndex()
+        page_filter = PageFilter() if self.skip_pages else None
+        confidence = ConfidenceIndex()
+        pending = []
+        document = None
+        if document_path:
+            document = TextDocumentWriter(Path(document_path), {'source': str(pdf_path), 'dpi': self.dpi})
+            document.open()
         
-        # Process each page
-        for page_num, image in enumerate(images, 1):
-            logger.info(f"Processing page {page_num}/{len(images)}")
-            
-            # Extract text with formatting
-            text_segments = self.detect_italic_text(image)
+        def emit(page_num: int, text_segments: Dict) -> None:
+            self._strip_running_lines(text_segments, line_index)
             
             # Add page data
             page_data = {
@@ -177,17 +710,97 @@ class PDFProcessor:
             all_text_data['pages'].append(page_data)
             all_text_data['regular'].extend(text_segments['regular'])
             all_text_data['italic'].extend(text_segments['italic'])
+            if 'duplicate_of' not in text_segments:
+                all_text_data['refined_lines'] += text_segments.get('refined_lines', 0)
+            confidence.add_page(page_num, text_segments['words'], text_segments.get('dropped', ()),
+                                text_segments['size'])
+            if document is not None:
+                document.add_page(page_data, text_segments['words'], text_segments['size'])
             
             # Create HTML for this page
-            page_html = self._create_page_html(page_num, text_segments)
-            html_content.append(page_html)
+            on_page(page_num, self._create_page_html(page_num, text_segments))
+            self.events.advance('ocr', 'page_processed', source=source, page=page_num,
+                                chars=len(page_data['regular_text']) + len(page_data['italic_text']))
         
-        html_content.append(self._get_html_footer())
+        # Process each page as it is rasterized
+        for page_num, text_segments in self.iter_ocr_pages(pdf_path, page_filter):
+            logger.info(f"Processed page {page_num}/{page_count}")
+            
+            # A repeated scan must not make its own lines look like running heads
+            line_index.add_page(text_segments['lines'], text_segments['size'][1],
+                                count='duplicate_of' not in text_segments)
+            
+            pending.append((page_num, text_segments))
+            if len(pending) >= line_index.min_pages:
+                emit(*pending.pop(0))
         
-        final_html = '\n'.join(html_content)
+        for page_num, text_segments in pending:
+            emit(page_num, text_segments)
         
+        all_text_data['running_lines_removed'] = line_index.lines_removed
+        all_text_data['running_keys'] = line_index.running_keys()
+        if page_filter is not None:
+            report = page_filter.report()
+            all_text_data['page_report'] = report
+            logger.info(f"Skipped {report['skipped_pages']} pages: {len(report['blank'])} blank, "
+                        f"{len(report['duplicates'])} repeated; {len(report['image_only'])} image-only pages OCR'd")
+        all_text_data['confidence'] = confidence.summary()
+        logger.info(f"Refined {all_text_data['refined_lines']} low-confidence lines; "
+                    f"{len(confidence.low_words)} low-confidence words remain; "
+                    f"{len(all_text_data['confidence']['review_pages'])} pages need review")
+        if document is not None:
+            all_text_data['confidence_index'] = confidence.save(confidence_path(document_path))
+            document.metadata['confidence'] = all_text_data['confidence']
+            document.metadata['running_lines_removed'] = line_index.lines_removed
+            document.metadata['running_keys'] = all_text_data['running_keys']
+            if page_filter is not None:
+                document.metadata['page_report'] = all_text_data['page_report']
+            all_text_data['document'] = document.close()
+        logger.info(f"Removed {line_index.lines_removed} running header/footer lines")
+        self.events.finish_stage('ocr', source=source, pages=len(all_text_data['pages']))
         logger.info("PDF processing completed successfully")
-        return final_html, all_text_data
+        return all_text_data
+    
+    def _strip_running_lines(self, text_segments: Dict, line_index: RunningLineIndex) -> None:
+        """
+        Drop regular words that belong to repeating header/footer lines
+        The remaining lines' regular slices and the words' line numbers are
+        renumbered to match; italic words of a dropped line keep no line
+        """
+        running = {index for index, line in enumerate(text_segments['lines']) if line_index.is_running(line)}
+        if not running:
+            return
+        
+        regular = text_segments['regular']
+        kept_regular = []
+        kept_lines = []
+        renumber = {}
+        position = 0
+        for index, line in enumerate(text_segments['lines']):
+            start, end = line['regular']
+            if index in running:
+                kept_regular.extend(regular[position:start])
+                position = end
+                continue
+            shift = start - position + len(kept_regular)
+            renumber[index] = len(kept_lines)
+            kept_lines.append(dict(line, regular=(shift, shift + end - start)))
+        kept_regular.extend(regular[position:])
+        
+        words = []
+        for word in text_segments['words']:
+            if word['line'] in running:
+                if word['italic']:
+                    words.append(dict(word, line=None))
+            elif word['line'] is not None:
+                words.append(dict(word, line=renumber[word['line']]))
+            else:
+                words.append(word)
+        
+        text_segments['regular'] = kept_regular
+        text_segments['lines'] = kept_lines
+        text_segments['words'] = words
+        line_index.lines_removed += len(running)
     
     def _get_html_header(self) -> str:
         """Generate HTML header with styling"""
@@ -257,21 +870,24 @@ class PDFProcessor:
     def _create_page_html(self, page_num: int, text_segments: Dict) -> str:
         """Create HTML for a single page"""
         html = f"""
-    <div class="page">
+    <div class="page" data-page="{page_num}">
         <div class="page-number">— Page {page_num} —</div>
 """
         
         # Add regular text
+        # data-field/data-offset map clicks back to offsets in the page text (timing index)
         if text_segments['regular']:
             regular_text = ' '.join(text_segments['regular'])
             # Process for bracketed content
             regular_text = self._format_bracketed_text(regular_text)
-            html += f'        <div class="regular-text">{regular_text}</div>\n'
+            html += f'        <div class="regular-text" data-field="0" data-offset="0">{regular_text}</div>\n'
         
         # Add italic text
         if text_segments['italic']:
+            offset = 0
             for italic_text in text_segments['italic']:
-                html += f'        <div class="italic-text">{italic_text}</div>\n'
+                html += f'        <div class="italic-text" data-field="1" data-offset="{offset}">{italic_text}</div>\n'
+                offset += len(italic_text) + 1
         
         html += "    </div>"
         return html
@@ -296,16 +912,97 @@ class PDFProcessor:
 </body>
 </html>"""
     
-    def save_html(self, html_content: str, filename: str) -> str:
-        """Save HTML content to file"""
+    def render_html(self, text_data: Dict) -> str:
+        """Rebuild the HTML preview from structured text data without re-running OCR"""
+        html_content = [self._get_html_header()]
+        for page_data in text_data['pages']:
+            text_segments = {
+                'regular': [page_data['regular_text']] if page_data.get('regular_text') else [],
+                'italic': [page_data['italic_text']] if page_data.get('italic_text') else []
+            }
+            html_content.append(self._create_page_html(page_data['page_number'], text_segments))
+        html_content.append(self._get_html_footer())
+        return '\n'.join(html_content)
+    
+    def save_html(self, html_content: str, filename: str,
+                  audio_file: Optional[str] = None, timing_file: Optional[str] = None) -> str:
+        """
+        Save HTML content to file
+        If an audio file and timing index are given, adds a read-along player
+        """
         output_path = self.html_dir / f"{filename}.html"
         
+        if audio_file:
+            html_content = html_content.replace(
+                '</body>', self._get_read_along_player(output_path, audio_file, timing_file) + '</body>'
+            )
+        
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(html_content)
         
         logger.info(f"HTML saved to: {output_path}")
         return str(output_path)
     
+    def _get_read_along_player(self, html_path: Path, audio_file: str,
+                               timing_file: Optional[str] = None) -> str:
+        """
+        Generate an audio player that seeks to the clicked sentence
+        The timing index is only fetched on the first click, so opening a
+        multi-hour book stays instant
+        """
+        audio_src = Path(os.path.relpath(audio_file, html_path.parent)).as_posix()
+        timing_src = Path(os.path.relpath(timing_file, html_path.parent)).as_posix() if timing_file else ''
+        return f"""
+    <audio id="read-along" controls preload="none" src="{audio_src}" data-timing="{timing_src}"
+           style="position: sticky; bottom: 0; width: 100%;"></audio>
+    <script>
+    (function () {{
+        var player = document.getElementById('read-along');
+        var index = null;
+        function loadIndex() {{
+            if (index) return index;
+            index = fetch(player.dataset.timing).then(function (r) {{ return r.text(); }}).then(function (text) {{
+                var byKey = {{}};
+                text.trim().split('\\n').slice(1).forEach(function (line) {{
+                    var row = JSON.parse(line);
+                    var key = row[0] + ':' + row[1];
+                    (byKey[key] = byKey[key] || []).push(row);
+                }});
+                return byKey;
+            }});
+            return index;
+        }}
+        function textOffset(container, node, offset) {{
+            var walker = document.createTreeWalker(container, NodeFilter.SHOW_TEXT);
+            var total = 0;
+            while (walker.nextNode()) {{
+                if (walker.currentNode === node) return total + offset;
+                total += walker.currentNode.textContent.length;
+            }}
+            return total;
+        }}
+        document.addEventListener('click', function (event) {{
+            var block = event.target.closest('[data-field]');
+            if (!block || !player.dataset.timing) return;
+            var page = block.closest('[data-page]').dataset.page;
+            var range = document.caretRangeFromPoint ? document.caretRangeFromPoint(event.clientX, event.clientY) : null;
+            var offset = parseInt(block.dataset.offset, 10) +
+                (range ? textOffset(block, range.startContainer, range.startOffset) : 0);
+            loadIndex().then(function (byKey) {{
+                var rows = byKey[page + ':' + block.dataset.field] || [];
+                var lo = 0, hi = rows.length - 1, found = null;
+                while (lo <= hi) {{
+                    var mid = (lo + hi) >> 1;
+                    if (rows[mid][2] <= offset) {{ found = rows[mid]; lo = mid + 1; }} else {{ hi = mid - 1; }}
+                }}
+                found = found || rows[0];
+                if (found) {{ player.currentTime = found[4] / 1000; player.play(); }}
+            }});
+        }});
+    }})();
+    </script>
+"""
+    
     def get_text_for_audio(self, text_data: Dict) -> str:
         """
         Convert extracted text data to format suitable for TTS
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+SSML Builder - Structured SSML documents with escaping and validation
+Documents are built from nodes (speak/voice/prosody/emphasis/break/text)
+that validate their nesting and attributes, then serialized in one pass:
+elements are opened lazily so empty voice/prosody pairs never appear,
+consecutive breaks are merged, whitespace is normalized and text is escaped
+"""
+
+import re
+from typing import Dict, List, Tuple, Iterator, Union
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+BRACKET_PATTERN = re.compile(r'\[([^\]]+)\]')
+BREAK_TIME_PATTERN = re.compile(r'^\d+(\.\d+)?m?s$')
+PERCENT_PATTERN = re.compile(r'^[+-]?\d+(\.\d+)?%$')
+SEMITONE_PATTERN = re.compile(r'^[+-]\d+(\.\d+)?st$')
+
+PROSODY_RATES = ('x-slow', 'slow', 'medium', 'fast', 'x-fast', 'default')
+PROSODY_PITCHES = ('x-low', 'low', 'medium', 'high', 'x-high', 'default')
+EMPHASIS_LEVELS = ('strong', 'moderate', 'reduced', 'none')
+
+# Text nodes only need &, < and >; quotes are escaped in attribute values
+TEXT_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'))
+ATTRIBUTE_ESCAPES = TEXT_ESCAPES + (('"', '&quot;'), ("'", '&apos;'))
+
+# Tokens: ('open', tag, attrs), ('close',), ('text', text), ('break', time)
+Token = Tuple
+
+
+def open_tag(tag: str, **attrs) -> Token:
+    return ('open', tag, attrs)
+
+
+def close_tag() -> Token:
+    return ('close',)
+
+
+def text_token(text: str) -> Token:
+    return ('text', text)
+
+
+def break_token(time: str) -> Token:
+    return ('break', time)
+
+
+def escape_xml(text: str, quote: bool = False) -> str:
+    """Escape a text node (or, with quote, an attribute value) so OCR output cannot break the document"""
+    escapes = ATTRIBUTE_ESCAPES if quote else TEXT_ESCAPES
+    if not any(character in text for character, _ in escapes):
+        return text
+    for character, entity in escapes:
+        text = text.replace(character, entity)
+    return text
+
+
+def byte_length(text: str) -> int:
+    """UTF-8 size; request limits are in bytes (Google) or at least as many characters"""
+    return len(text.encode('utf-8'))
+
+
+def pause_seconds(time: str) -> float:
+    """Convert an SSML break time ('2s', '500ms') to seconds"""
+    time = time.strip().lower()
+    if time.endswith('ms'):
+        return float(time[:-2]) / 1000
+    return float(time.rstrip('s'))
+
+
+def estimate_length(tokens: List[Token]) -> int:
+    """
+    Upper bound on the serialized UTF-8 size of tokens, escaping included,
+    without serializing them
+    """
+    length = 0
+    for token in tokens:
+        kind = token[0]
+        if kind == 'open':
+            # <tag a="v"> plus the matching </tag>
+            length += 2 * len(token[1]) + 5 + sum(
+                len(k) + byte_length(escape_xml(str(v), quote=True)) + 4 for k, v in token[2].items()
+            )
+        elif kind == 'text':
+            length += byte_length(escape_xml(token[1]))
+        elif kind == 'break':
+            length += len(token[1]) + 15
+    return length
+
+
+class SSMLBuilder:
+    """Single-pass SSML writer that also collects the spoken plain text"""
+
+    def __init__(self):
+        self._ssml = []
+        self._plain = []
+        self._stack = []            # [tag, attrs, emitted]
+        self._pending_break = None
+        self._after_space = True    # No leading whitespace inside <speak>
+
+    def feed(self, tokens: Iterator[Token]) -> 'SSMLBuilder':
+        for token in tokens:
+            kind = token[0]
+            if kind == 'text':
+                self.text(token[1])
+            elif kind == 'open':
+                self.open(token[1], **token[2])
+            elif kind == 'close':
+                self.close()
+            elif kind == 'break':
+                self.pause(token[1])
+        return self
+
+    def open(self, tag: str, **attrs) -> None:
+        """Open an element; it is only written once text appears inside it"""
+        self._stack.append([tag, attrs, False])
+
+    def close(self) -> None:
+        tag, attrs, emitted = self._stack.pop()
+        if emitted:
+            self._ssml.append(f'</{tag}>')
+
+    def pause(self, time: str) -> None:
+        """Add a break; consecutive breaks merge into the longest one"""
+        if self._pending_break is None or pause_seconds(time) > pause_seconds(self._pending_break):
+            self._pending_break = time
+
+    def text(self, text: str) -> None:
+        text = WHITESPACE_PATTERN.sub(' ', text)
+        if self._after_space:
+            text = text.lstrip(' ')
+        if not text:
+            return
+        if text == ' ':
+            # Whitespace between elements: keep one space before the next text
+            self._ssml.append(' ')
+            self._plain.append(' ')
+            self._after_space = True
+            return
+
+        self._flush_break()
+        for element in self._stack:
+            if not element[2]:
+                self._ssml.append(self._start_tag(element[0], element[1]))
+                element[2] = True
+        self._ssml.append(escape_xml(text))
+        self._plain.append(text)
+        self._after_space = text.endswith(' ')
+
+    def ssml(self) -> str:
+        """Finish the document and return it wrapped in <speak>"""
+        self._flush_break()
+        while self._stack:
+            self.close()
+        body = ''.join(self._ssml).rstrip(' ')
+        return f'<speak>{body}</speak>'
+
+    def plain_text(self) -> str:
+        """The words that will be spoken, without any markup"""
+        return ''.join(self._plain).strip()
+
+    def _flush_break(self) -> None:
+        if self._pending_break is None:
+            return
+        self._ssml.append(f'<break time="{self._pending_break}"/>')
+        if not self._after_space:
+            # Breaks separate words in the plain text (e.g. "Page 1" from the page)
+            self._plain.append(' ')
+            self._after_space = True
+        self._pending_break = None
+
+    @staticmethod
+    def _start_tag(tag: str, attrs: Dict) -> str:
+        attributes = ''.join(f' {name}="{escape_xml(str(value), quote=True)}"' for name, value in attrs.items())
+        return f'<{tag}{attributes}>'
+
+
+class SSMLValidationError(ValueError):
+    """Raised when nodes are nested or configured in a way SSML does not allow"""
+
+
+class SSMLNode:
+    """Base SSML element; children are validated as they are added"""
+
+    tag = ''
+    allowed_children: Tuple[type, ...] = ()
+
+    def __init__(self, *children: Union['SSMLNode', str], **attrs):
+        self.attrs = attrs
+        self.children = []
+        self.validate_attrs()
+        for child in children:
+            self.append(child)
+
+    def append(self, child: Union['SSMLNode', str]) -> 'SSMLNode':
+        if isinstance(child, str):
+            child = Text(child)
+        if not isinstance(child, self.allowed_children):
+            raise SSMLValidationError(f"<{child.tag or 'text'}> is not allowed inside <{self.tag}>")
+        self.children.append(child)
+        return self
+
+    def validate_attrs(self) -> None:
+        pass
+
+    def tokens(self) -> Iterator[Token]:
+        yield open_tag(self.tag, **self.attrs)
+        for child in self.children:
+            yield from child.tokens()
+        yield close_tag()
+
+
+class Text(SSMLNode):
+    """Raw (unescaped) text; escaping happens at serialization"""
+
+    def __init__(self, text: str):
+        super().__init__()
+        self.text = text
+
+    def tokens(self) -> Iterator[Token]:
+        yield text_token(self.text)
+
+
+class Break(SSMLNode):
+    tag = 'break'
+
+    def __init__(self, time: str):
+        self.time = time
+        super().__init__(time=time)
+
+    def validate_attrs(self) -> None:
+        if not BREAK_TIME_PATTERN.match(self.time):
+            raise SSMLValidationError(f"Invalid break time: {self.time!r}")
+
+    def tokens(self) -> Iterator[Token]:
+        yield break_token(self.time)
+
+
+class Emphasis(SSMLNode):
+    tag = 'emphasis'
+
+    def validate_attrs(self) -> None:
+        if self.attrs.get('level', 'moderate') not in EMPHASIS_LEVELS:
+            raise SSMLValidationError(f"Invalid emphasis level: {self.attrs['level']!r}")
+
+
+class Prosody(SSMLNode):
+    tag = 'prosody'
+
+    def validate_attrs(self) -> None:
+        rate = self.attrs.get('rate', 'medium')
+        if rate not in PROSODY_RATES and not PERCENT_PATTERN.match(rate):
+            raise SSMLValidationError(f"Invalid prosody rate: {rate!r}")
+        pitch = self.attrs.get('pitch', 'medium')
+        if pitch not in PROSODY_PITCHES and not PERCENT_PATTERN.match(pitch) and not SEMITONE_PATTERN.match(pitch):
+            raise SSMLValidationError(f"Invalid prosody pitch: {pitch!r}")
+
+
+class Voice(SSMLNode):
+    tag = 'voice'
+
+    def validate_attrs(self) -> None:
+        if not self.attrs.get('name'):
+            raise SSMLValidationError("<voice> needs a name")
+
+
+class Speak(SSMLNode):
+    tag = 'speak'
+
+
+# Nesting rules: voices switch at the top level, emphasis only holds text
+Emphasis.allowed_children = (Text, Break)
+Prosody.allowed_children = (Emphasis, Text, Break)
+Voice.allowed_children = (Prosody, Emphasis, Text, Break)
+Speak.allowed_children = (Voice, Prosody, Emphasis, Text, Break)
+
+
+class Isolated(list):
+    """A part that is always sent as a request of its own, so repeats serialize identically"""
+
+
+def node_tokens(nodes: List[SSMLNode]) -> Iterator[Token]:
+    for node in nodes:
+        yield from node.tokens()
+
+
+def estimate_nodes_length(nodes: List[SSMLNode]) -> int:
+    return estimate_length(list(node_tokens(nodes)))
+
+
+def render(nodes: List[SSMLNode]) -> Tuple[str, str]:
+    """Validate nodes as one <speak> document and serialize them, returning (ssml, plain_text)"""
+    speak = Speak(*nodes)
+    builder = SSMLBuilder()
+    for child in speak.children:
+        builder.feed(child.tokens())
+    return builder.ssml(), builder.plain_text()
+
+
+def iter_chunks(parts: List[List[SSMLNode]], max_chars: int) -> Iterator[Tuple[str, str]]:
+    """
+    Pack parts into <speak> documents of at most max_chars UTF-8 bytes and
+    serialize each one as soon as it is full, yielding (ssml, plain_text)
+    """
+    max_part_chars = max_chars - len('<speak></speak>')
+    current = []
+    current_length = 0
+    for part in parts:
+        part_length = estimate_nodes_length(part)
+        if isinstance(part, Isolated):
+            if current:
+                yield render(current)
+                current = []
+                current_length = 0
+            yield render(part)
+            continue
+        if current and current_length + part_length > max_part_chars:
+            yield render(current)
+            current = []
+            current_length = 0
+        current.extend(part)
+        current_length += part_length
+    if current:
+        yield render(current)
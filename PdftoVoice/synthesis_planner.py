@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Synthesis Planner - Dry-run cost and time estimates before any TTS request
+Hashes sentences to find repeats (epigraphs, repeated quotes, boilerplate),
+counts billable characters per backend after chunking and estimates wall
+time under each backend's concurrency. The segment cache lets every
+repeated request be synthesized once and reused
+"""
+
+import os
+import json
+import heapq
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ssml_builder import WHITESPACE_PATTERN
+from tts_backends import SENTENCE_END_PATTERN
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shorter repeats ("Amen.") are not worth a request of their own
+MIN_REPEAT_CHARS = 40
+
+
+class PlanLimitError(ValueError):
+    """Raised when a synthesis plan exceeds the limits a job was given"""
+
+
+def sentence_key(sentence: str) -> str:
+    """Hash of a sentence, ignoring case and whitespace differences"""
+    normalized = WHITESPACE_PATTERN.sub(' ', sentence).strip().lower()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def count_sentences(text_data: Dict) -> Dict[str, List]:
+    """
+    Count every sentence in the book by hash
+    Returns {key: [count, first occurrence text]}
+    """
+    counts = {}
+    for page_data in text_data.get('pages', []):
+        for field in ('regular_text', 'italic_text'):
+            for sentence in SENTENCE_END_PATTERN.split(page_data.get(field, '')):
+                sentence = sentence.strip()
+                if not sentence:
+                    continue
+                key = sentence_key(sentence)
+                if key in counts:
+                    counts[key][0] += 1
+                else:
+                    counts[key] = [1, sentence]
+    return counts
+
+
+def find_repeated_sentences(counts: Dict[str, List], min_chars: int = MIN_REPEAT_CHARS) -> set:
+    """Keys of sentences that occur more than once and are long enough to reuse"""
+    return {key for key, (count, text) in counts.items() if count > 1 and len(text) >= min_chars}
+
+
+def estimate_wall_time(request_chars: List[int], concurrency: int,
+                       request_latency: float, chars_per_second: float) -> float:
+    """Simulate dispatching requests in order to `concurrency` workers"""
+    workers = [0.0] * max(1, min(concurrency, len(request_chars)))
+    for chars in request_chars:
+        start = heapq.heappop(workers)
+        heapq.heappush(workers, start + request_latency + chars / chars_per_second)
+    return max(workers) if request_chars else 0.0
+
+
+class SegmentCache:
+    """
+    Content-addressed store of synthesized requests
+    The key covers backend, voice and request text, so the same request is
+    only ever synthesized once, within a book and across runs
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def key(self, backend_name: str, request: str, voice_config: Dict, speech_settings: Dict) -> str:
+        payload = json.dumps([backend_name, request, voice_config, speech_settings], sort_keys=True)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def path(self, key: str, extension: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.{extension}"
+
+    def get(self, key: str, extension: str) -> Optional[str]:
+        path = self.path(key, extension)
+        return str(path) if path.exists() else None
+
+    def put(self, key: str, source: str) -> str:
+        """Move a freshly synthesized file into the cache"""
+        path = self.path(key, Path(source).suffix.lstrip('.'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, path)
+        return str(path)
+
+    def link(self, cached: str, target: Path) -> str:
+        """Place a cached file at target (hard link, copy across filesystems)"""
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            target.unlink()
+        try:
+            os.link(cached, target)
+        except OSError:
+            shutil.copyfile(cached, target)
+        return str(target)
+
+
+class SynthesisPlan:
+    """Printable result of a dry run"""
+
+    def __init__(self, sentences: int, unique_sentences: int,
+                 repeated: List[Tuple[int, str]], backends: List[Dict]):
+        self.sentences = sentences
+        self.unique_sentences = unique_sentences
+        self.repeated = repeated
+        self.backends = backends
+
+    def to_dict(self) -> Dict:
+        return {
+            'sentences': self.sentences,
+            'unique_sentences': self.unique_sentences,
+            'repeated': [{'count': count, 'text': text} for count, text in self.repeated],
+            'backends': self.backends
+        }
+
+    def get(self, backend_name: str) -> Optional[Dict]:
+        for backend in self.backends:
+            if backend['backend'] == backend_name:
+                return backend
+        return None
+
+    def check(self, backend_name: str, max_billable_chars: Optional[int] = None,
+              max_cost: Optional[float] = None, max_wall_seconds: Optional[float] = None) -> None:
+        """Raise PlanLimitError if the job on backend_name exceeds any limit"""
+        backend = self.get(backend_name)
+        if backend is None:
+            return
+        if max_billable_chars is not None and backend['billable_chars'] > max_billable_chars:
+            raise PlanLimitError(
+                f"{backend_name}: {backend['billable_chars']:,} billable characters exceeds {max_billable_chars:,}")
+        if max_cost is not None and backend['cost'] > max_cost:
+            raise PlanLimitError(f"{backend_name}: estimated ${backend['cost']:.2f} exceeds ${max_cost:.2f}")
+        if max_wall_seconds is not None and backend['wall_seconds'] > max_wall_seconds:
+            raise PlanLimitError(
+                f"{backend_name}: estimated {backend['wall_seconds']:.0f}s exceeds {max_wall_seconds:.0f}s")
+
+    def format(self) -> str:
+        lines = [
+            f"Sentences: {self.sentences:,} ({self.unique_sentences:,} unique, "
+            f"{len(self.repeated)} repeated and synthesized once)"
+        ]
+        for count, text in self.repeated[:5]:
+            preview = text if len(text) <= 60 else text[:57] + '...'
+            lines.append(f"  x{count}  {preview}")
+        lines.append('')
+        lines.append(f"{'Backend':<12}{'Requests':>10}{'To send':>9}{'Billable':>12}{'Saved':>10}"
+                     f"{'Cost':>10}{'Wall time':>11}")
+        for backend in self.backends:
+            wall = backend['wall_seconds']
+            lines.append(
+                f"{backend['backend']:<12}{backend['requests']:>10,}{backend['requests_to_send']:>9,}"
+                f"{backend['billable_chars']:>12,}{backend['saved_chars']:>10,}"
+                f"{'$' + format(backend['cost'], '.2f'):>10}{f'{wall / 60:.1f} min':>11}"
+            )
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.format()
+
+
+def plan_backend(backend, chunks: List[Tuple[str, str]], voice_config: Dict,
+                 cache: Optional[SegmentCache] = None) -> Dict:
+    """
+    Billable characters and wall time for sending chunks to one backend
+    Identical requests are counted once, cached ones not at all
+    """
+    extension = backend.output_formats[0]
+    seen = set()
+    to_send = []
+    all_billable = 0
+    for request, spoken in chunks:
+        billable = len(request) if backend.bills_markup else len(spoken)
+        all_billable += billable
+        key = cache.key(backend.name, request, voice_config, backend.speech_settings) if cache else request
+        if key in seen or (cache and cache.get(key, extension)):
+            continue
+        seen.add(key)
+        to_send.append((billable, len(request)))
+
+    billable_chars = sum(billable for billable, length in to_send)
+    return {
+        'backend': backend.name,
+        'requests': len(chunks),
+        'requests_to_send': len(to_send),
+        'billable_chars': billable_chars,
+        'saved_chars': all_billable - billable_chars,
+        'cost': billable_chars / 1_000_000 * backend.price_per_million_chars,
+        'concurrency': backend.max_concurrency,
+        'wall_seconds': estimate_wall_time([length for billable, length in to_send],
+                                           backend.max_concurrency,
+                                           backend.request_latency,
+                                           backend.chars_per_second)
+    }
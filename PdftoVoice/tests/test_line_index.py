@@ -0,0 +1,60 @@
+"""Tests for line_index"""
+
+from line_index import RunningLineIndex, parse_bbox
+
+
+def page_lines(page: int):
+    return [
+        {'text': f'Sound Doctrine – Chapter {page + 10}', 'bbox': (100, 40, 900, 70)},
+        {'text': f'Body line {"abcd"[page]} of the page', 'bbox': (100, 300, 900, 330)},
+        {'text': f'Another body line {"efgh"[page]}', 'bbox': (100, 500, 900, 530)},
+        {'text': 'Closing remarks differ ' + 'xyzw'[page], 'bbox': (100, 900, 900, 930)},
+        {'text': str(page + 41), 'bbox': (480, 1500, 520, 1530)},
+    ]
+
+
+def test_parse_bbox():
+    assert parse_bbox('bbox 1 2 30 40; x_wconf 96') == (1, 2, 30, 40)
+    assert parse_bbox('') == (0, 0, 0, 0)
+
+
+def test_running_lines_found_after_min_pages():
+    index = RunningLineIndex(min_pages=3)
+    results = []
+    for page in range(4):
+        lines = page_lines(page)
+        index.add_page(lines, page_height=1600)
+        results.append([index.is_running(line) for line in lines])
+
+    assert results[0] == [False] * 5
+    assert results[2] == [True, False, False, False, True]
+    assert results[3] == [True, False, False, False, True]
+    assert index.pages_seen == 4
+    assert len(index.running_keys()) == 2
+
+
+def test_position_is_part_of_the_key():
+    index = RunningLineIndex()
+    top = index.line_key('Chapter 3', (0, 10, 100, 30), 1000)
+    assert top == index.line_key('chapter  7', (0, 12, 100, 32), 1000)
+    assert top != index.line_key('Chapter 3', (0, 500, 100, 520), 1000)
+
+
+def test_uncounted_pages_only_get_keys():
+    index = RunningLineIndex(min_pages=1)
+    lines = page_lines(0)
+    index.add_page(lines, page_height=1600, count=False)
+    assert 'key' in lines[0]
+    assert index.pages_seen == 0
+    assert not index.is_running(lines[0])
+
+
+def test_from_keys():
+    counted = RunningLineIndex()
+    for page in range(3):
+        counted.add_page(page_lines(page), page_height=1600)
+
+    restored = RunningLineIndex.from_keys(counted.running_keys())
+    lines = page_lines(3)
+    restored.add_page(lines, page_height=1600, count=False)
+    assert [restored.is_running(line) for line in lines] == [True, False, False, False, True]
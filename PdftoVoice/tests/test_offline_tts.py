@@ -0,0 +1,26 @@
+"""Tests for offline_tts prosody mapping"""
+
+import pytest
+
+from offline_tts import ESPEAK_PITCHES, ESPEAK_RATES, PIPER_LENGTH_SCALES, _prosody_value
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('medium', 175), ('X-Fast', 280), ('150%', 262), ('50%', 87), ('default', 175),
+    ('0%', 175), ('-20%', 175), ('fast%', 175), ('', 175),
+])
+def test_espeak_rate(value, expected):
+    assert _prosody_value(value, ESPEAK_RATES, 175) == expected
+
+
+def test_espeak_pitch():
+    assert _prosody_value('low', ESPEAK_PITCHES, 50) == 35
+    assert _prosody_value('120%', ESPEAK_PITCHES, 50) == 60
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('slow', 1.25), ('200%', 0.5), ('50%', 2.0), ('100%', 1.0), ('0%', 1.0),
+])
+def test_piper_length_scale_is_inverse(value, expected):
+    # Piper's length scale is a duration: faster speech is a smaller value
+    assert _prosody_value(value, PIPER_LENGTH_SCALES, 1.0, inverse=True) == pytest.approx(expected)
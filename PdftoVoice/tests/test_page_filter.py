@@ -0,0 +1,69 @@
+"""Tests for page_filter: blank, picture and duplicate pages"""
+
+import pytest
+
+from page_filter import PageFilter, merge_skipped
+
+Image = pytest.importorskip('PIL.Image')
+ImageDraw = pytest.importorskip('PIL.ImageDraw')
+
+
+def text_page(seed: int, size=(850, 1100)):
+    """A white page with rows of word-like blocks laid out from seed"""
+    image = Image.new('L', size, 255)
+    draw = ImageDraw.Draw(image)
+    for row in range(20):
+        x = 80
+        y = 100 + row * 45
+        for word in range(8):
+            width = 20 + (seed * 31 + row * 17 + word * 13) % 60
+            draw.rectangle((x, y, x + width, y + 18), fill=0)
+            x += width + 15
+    return image
+
+
+def test_blank_and_text_pages():
+    page_filter = PageFilter()
+    assert page_filter.classify(1, Image.new('L', (850, 1100), 255)) == 'blank'
+    assert page_filter.classify(2, text_page(1)) == 'ocr'
+    assert page_filter.classify(3, Image.new('L', (850, 1100), 100)) == 'image'
+
+
+def test_duplicates_point_at_their_source():
+    page_filter = PageFilter()
+    first = text_page(1)
+    rescan = first.copy()
+    rescan.putpixel((5, 5), 200)
+    pages = [(1, first), (2, text_page(2)), (3, first.copy()), (4, rescan), (5, Image.new('L', (850, 1100), 255))]
+
+    kept = [page_num for page_num, _ in page_filter.filter(iter(pages))]
+    assert kept == [1, 2]
+    report = page_filter.report()
+    assert report['duplicates'] == {'3': 1, '4': 1}
+    assert report['blank'] == [5]
+    assert report['ocr_pages'] == 2
+    assert report['skipped_pages'] == 3
+
+
+def test_pages_with_the_same_layout_are_not_merged():
+    page_filter = PageFilter()
+    assert page_filter.classify(1, text_page(1)) == 'ocr'
+    assert page_filter.classify(2, text_page(7)) == 'ocr'
+
+
+def test_merge_skipped_fills_in_page_order():
+    page_filter = PageFilter()
+    page_filter.decisions = {1: 'blank', 2: 'ocr', 3: ('duplicate', 2), 4: 'ocr', 5: 'blank'}
+    page_filter.sizes = {1: (10, 20), 3: (30, 40), 5: (50, 60)}
+    ocr_pages = [(2, {'regular': ['Two'], 'size': (1, 1)}), (4, {'regular': ['Four'], 'size': (1, 1)})]
+
+    merged = list(merge_skipped(page_filter, iter(ocr_pages)))
+    assert [page_num for page_num, _ in merged] == [1, 2, 3, 4, 5]
+    assert merged[0][1]['skipped'] == 'blank'
+    assert merged[0][1]['size'] == (10, 20)
+    assert merged[2][1]['regular'] == ['Two']
+    assert merged[2][1]['duplicate_of'] == 2
+    assert merged[2][1]['size'] == (30, 40)
+    # The duplicate is a copy, not the source page itself
+    merged[2][1]['regular'].append('changed')
+    assert merged[1][1]['regular'] == ['Two']
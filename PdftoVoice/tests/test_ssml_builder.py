@@ -0,0 +1,42 @@
+"""Tests for ssml_builder: escaping and request size limits"""
+
+import pytest
+
+from ssml_builder import (Isolated, Prosody, SSMLValidationError, Text, byte_length, escape_xml,
+                          estimate_nodes_length, iter_chunks, render)
+
+
+def test_text_nodes_keep_quotes():
+    ssml, plain = render([Text('Tom\'s "book" & <notes>')])
+    assert ssml == '<speak>Tom\'s "book" &amp; &lt;notes&gt;</speak>'
+    assert plain == 'Tom\'s "book" & <notes>'
+
+
+def test_attribute_values_escape_quotes():
+    assert escape_xml('a"b\'c', quote=True) == 'a&quot;b&apos;c'
+    assert escape_xml('a"b\'c') == 'a"b\'c'
+
+
+def test_estimate_is_an_upper_bound():
+    nodes = [Prosody(Text("it's & é < ü"), rate='90%')]
+    ssml, _ = render(nodes)
+    assert estimate_nodes_length(nodes) >= byte_length(ssml) - len('<speak></speak>')
+
+
+@pytest.mark.parametrize('text', ["it's here ", 'fish & chips ', 'café ëlan ', '<a> ', '中文字 '])
+def test_chunks_stay_within_limit(text):
+    parts = [[Text(text * 20)] for _ in range(200)]
+    chunks = list(iter_chunks(parts, 3000))
+    assert len(chunks) > 1
+    assert all(byte_length(ssml) <= 3000 for ssml, _ in chunks)
+    assert ' '.join(plain for _, plain in chunks).split() == (text * 20 * 200).split()
+
+
+def test_isolated_parts_are_sent_alone():
+    parts = [[Text('one. ')], Isolated([Text('repeated. ')]), [Text('two. ')]]
+    assert [plain for _, plain in iter_chunks(parts, 3000)] == ['one.', 'repeated.', 'two.']
+
+
+def test_invalid_prosody_is_rejected():
+    with pytest.raises(SSMLValidationError):
+        render([Prosody(Text('x'), rate='very fast')])
@@ -0,0 +1,85 @@
+"""Tests for synthesis_planner: sentence dedup and cost estimates"""
+
+import pytest
+
+from synthesis_planner import (PlanLimitError, SegmentCache, SynthesisPlan, count_sentences,
+                               estimate_wall_time, find_repeated_sentences, plan_backend, sentence_key)
+from tts_backends import GoogleBackend, PollyBackend
+
+REFRAIN = 'Holy, holy, holy is the Lord God Almighty, who was and is.'
+
+
+def test_sentence_key_ignores_case_and_spacing():
+    assert sentence_key('Amen.  So be it.') == sentence_key(' amen. so\nbe it.')
+    assert sentence_key('Amen.') != sentence_key('Amen!')
+
+
+def test_repeated_sentences_are_counted_once():
+    text_data = {'pages': [
+        {'regular_text': f'{REFRAIN} First verse. Amen.', 'italic_text': REFRAIN.upper()},
+        {'regular_text': f'Second verse. {REFRAIN} Amen.', 'italic_text': ''},
+    ]}
+    counts = count_sentences(text_data)
+    assert counts[sentence_key(REFRAIN)] == [3, REFRAIN]
+    assert counts[sentence_key('Amen.')][0] == 2
+    # "Amen." repeats too, but is too short to be worth a request of its own
+    assert find_repeated_sentences(counts) == {sentence_key(REFRAIN)}
+    assert find_repeated_sentences(counts, min_chars=1) == {sentence_key(REFRAIN), sentence_key('Amen.')}
+
+
+def test_estimate_wall_time():
+    assert estimate_wall_time([], 4, 0.5, 100.0) == 0.0
+    # Two workers: 100 + 100 chars in parallel, then the third request
+    assert estimate_wall_time([100, 100, 100], 2, 0.5, 100.0) == pytest.approx(3.0)
+    assert estimate_wall_time([100, 100, 100], 8, 0.5, 100.0) == pytest.approx(1.5)
+
+
+CHUNKS = [
+    ('<speak>Hello there.</speak>', 'Hello there.'),
+    (f'<speak>{REFRAIN}</speak>', REFRAIN),
+    ('<speak>Goodbye.</speak>', 'Goodbye.'),
+    (f'<speak>{REFRAIN}</speak>', REFRAIN),
+]
+
+
+def test_identical_requests_are_billed_once():
+    plan = plan_backend(PollyBackend(), CHUNKS, {'voice_id': 'Joanna'})
+    spoken = [len(spoken) for _, spoken in CHUNKS]
+    assert plan['requests'] == 4
+    assert plan['requests_to_send'] == 3
+    assert plan['billable_chars'] == sum(spoken) - len(REFRAIN)
+    assert plan['saved_chars'] == len(REFRAIN)
+    assert plan['cost'] == pytest.approx(plan['billable_chars'] / 1e6 * PollyBackend.price_per_million_chars)
+
+
+def test_markup_is_billed_where_the_provider_bills_it():
+    plan = plan_backend(GoogleBackend(), CHUNKS, {})
+    assert plan['billable_chars'] == sum(len(request) for request, _ in CHUNKS[:3])
+
+
+def test_cached_requests_are_not_billed(tmp_path):
+    backend = PollyBackend()
+    cache = SegmentCache(tmp_path)
+    voice = {'voice_id': 'Joanna'}
+    source = tmp_path / 'segment.mp3'
+    source.write_bytes(b'ID3')
+    cache.put(cache.key(backend.name, CHUNKS[1][0], voice, backend.speech_settings), str(source))
+
+    plan = plan_backend(backend, CHUNKS, voice, cache=cache)
+    assert plan['requests_to_send'] == 2
+    assert plan['billable_chars'] == len('Hello there.') + len('Goodbye.')
+    # Another voice is a different request
+    assert plan_backend(backend, CHUNKS, {'voice_id': 'Matthew'}, cache=cache)['requests_to_send'] == 3
+
+
+def test_plan_limits():
+    plan = SynthesisPlan(4, 3, [(2, REFRAIN)], [plan_backend(PollyBackend(), CHUNKS, {})])
+    billable = plan.get('polly')['billable_chars']
+    plan.check('polly', max_billable_chars=billable)
+    plan.check('google', max_billable_chars=0)
+    with pytest.raises(PlanLimitError):
+        plan.check('polly', max_billable_chars=billable - 1)
+    with pytest.raises(PlanLimitError):
+        plan.check('polly', max_wall_seconds=0)
+    assert 'polly' in str(plan)
+    assert plan.to_dict()['repeated'] == [{'count': 2, 'text': REFRAIN}]
@@ -0,0 +1,97 @@
+"""Tests for the .ptvd text document format"""
+
+import pytest
+
+from text_document import DocumentFormatError, TextDocument, TextDocumentWriter, load_text_data
+
+PAGES = [
+    {'page_number': 1, 'regular_text': 'Grace and peace', 'italic_text': 'selah'},
+    {'page_number': 3, 'regular_text': 'Café über naïve', 'italic_text': ''},
+    {'page_number': 4, 'regular_text': '', 'italic_text': ''},
+]
+WORDS = [
+    [
+        {'text': 'Grace', 'bbox': (10, 20, 60, 40), 'conf': 96.4},
+        {'text': 'and', 'bbox': (70, 20, 100, 40), 'conf': 91},
+        {'text': 'selah', 'italic': True, 'bbox': (110, 20, 160, 40), 'conf': None},
+        {'text': 'peace', 'bbox': (170, 20, 220, 40), 'conf': 150},
+    ],
+    [
+        {'text': 'Café', 'bbox': (0, 0, 70000, 10)},
+        {'text': 'über', 'bbox': (-5, 0, 10, 10)},
+        {'text': 'naïve'},
+    ],
+    [],
+]
+
+
+@pytest.fixture
+def document_path(tmp_path):
+    path = tmp_path / 'book.ptvd'
+    with TextDocumentWriter(path, metadata={'filename': 'book.pdf', 'settings': {'dpi': 300}}) as writer:
+        for page, words in zip(PAGES, WORDS):
+            writer.add_page(page, words, size=(1240, 1754))
+    return path
+
+
+def test_pages_round_trip(document_path):
+    with TextDocument(document_path) as document:
+        assert len(document) == 3
+        assert [document.page(i) for i in range(3)] == PAGES
+        assert document.metadata == {'filename': 'book.pdf', 'settings': {'dpi': 300}}
+
+
+def test_words_round_trip(document_path):
+    with TextDocument(document_path) as document:
+        words = document.words(0)
+        assert [word['text'] for word in words] == ['Grace', 'and', 'selah', 'peace']
+        assert [word['italic'] for word in words] == [False, False, True, False]
+        assert words[0]['bbox'] == (10, 20, 60, 40)
+        # Confidences are whole percentages; unknown stays unknown, overflow is clamped
+        assert [word['conf'] for word in words] == [96, 91, None, 100]
+
+        words = document.words(1)
+        assert [word['text'] for word in words] == ['Café', 'über', 'naïve']
+        assert words[0]['bbox'] == (0, 0, 0xFFFF, 10)
+        assert words[1]['bbox'] == (0, 0, 10, 10)
+        assert document.words(2) == []
+
+
+def test_runs(document_path):
+    with TextDocument(document_path) as document:
+        assert document.runs(0) == [
+            {'italic': False, 'first_word': 0, 'word_count': 2},
+            {'italic': True, 'first_word': 2, 'word_count': 1},
+            {'italic': False, 'first_word': 3, 'word_count': 1},
+        ]
+        assert document.runs(1) == [{'italic': False, 'first_word': 0, 'word_count': 3}]
+        assert document.runs(2) == []
+
+
+def test_text_data_pages_are_lazy(document_path):
+    text_data = load_text_data(document_path)
+    pages = text_data['pages']
+    assert text_data['filename'] == 'book.pdf'
+    assert text_data['document'] == str(document_path)
+    assert len(pages) == 3
+    assert pages[-1] == PAGES[-1]
+    assert pages[0:2] == PAGES[0:2]
+    assert list(pages) == PAGES
+    with pytest.raises(IndexError):
+        pages[3]
+    pages.document.close()
+
+
+def test_no_partial_file_is_left(document_path):
+    assert not document_path.with_suffix('.ptvd.tmp').exists()
+
+
+def test_rejects_other_files(tmp_path):
+    other = tmp_path / 'notes.ptvd'
+    other.write_bytes(b'%PDF-1.7' + b'\0' * 100)
+    with pytest.raises(DocumentFormatError):
+        TextDocument(other)
+    empty = tmp_path / 'empty.ptvd'
+    empty.write_bytes(b'')
+    with pytest.raises(DocumentFormatError):
+        TextDocument(empty)
@@ -0,0 +1,59 @@
+"""Tests for text_normalizer"""
+
+import pytest
+
+from text_normalizer import TextNormalizer, dehyphenate, normalize_text_data
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('See e.g. the list, etc. Then more.', 'See for example the list, et cetera. Then more.'),
+    ('the end etc.', 'the end et cetera.'),
+    ('vv. 3-5 and No. 5', 'verses 3 to 5 and Number 5'),
+    ('St. Paul lived on Main St. Then he left.', 'Saint Paul lived on Main St. Then he left.'),
+    ('pages 12-15, call 555-1234', 'pages 12 to 15, call 555-1234'),
+    ('50% of $20 & more', '50 percent of 20 dollars and more'),
+    ('spaced   out ,words .', 'spaced out,words.'),
+])
+def test_normalize_text(text, expected):
+    assert TextNormalizer().normalize_text(text) == expected
+
+
+def test_expand_can_be_disabled():
+    assert TextNormalizer(expand=False).normalize_text('e.g. 12-15') == 'e.g. 12-15'
+
+
+def test_dehyphenate_keeps_compounds():
+    assert dehyphenate('inter- national well- known and well known') == 'international well-known and well known'
+    # A soft hyphen mark always joins
+    assert dehyphenate('well¬ known well known') == 'wellknown well known'
+
+
+def test_running_headers_and_page_numbers_are_removed():
+    bodies = ['Grace came first to the city.', 'Many people heard it gladly.', 'The elders met at dawn.',
+              'Nobody expected the letter.', 'A storm delayed the ship.']
+    pages = [{'page_number': i, 'regular_text': f'Sound Doctrine Chapter 10 {body} {i + 40}', 'italic_text': ''}
+             for i, body in enumerate(bodies, 1)]
+    result = normalize_text_data({'pages': pages})
+
+    assert [page['regular_text'] for page in result['pages']] == bodies
+    assert result['regular'] == bodies
+    assert 'sound doctrine chapter #' in result['normalization']['headers']
+    assert result['normalization']['footers'] == ['#']
+    report = result['normalization']['pages'][0]
+    assert report['removed_chars'] == report['chars_before'] - report['chars_after'] > 0
+    # The input is left alone
+    assert pages[0]['regular_text'].startswith('Sound Doctrine')
+
+
+def test_common_first_words_are_not_headers():
+    texts = ['The night was long.', 'The day began early.', 'The road ran north.',
+             'The winter came soon.', 'The sermon ended late.', 'The meeting was brief.']
+    result = normalize_text_data({'pages': [{'regular_text': text} for text in texts]})
+    assert result['normalization']['headers'] == []
+    assert result['regular'] == texts
+
+
+def test_short_documents_skip_header_detection():
+    pages = [{'regular_text': 'Title 1 Body one.'}, {'regular_text': 'Title 2 Body two.'}]
+    result = normalize_text_data({'pages': pages})
+    assert result['regular'] == ['Title 1 Body one.', 'Title 2 Body two.']
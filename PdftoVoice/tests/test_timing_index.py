@@ -0,0 +1,91 @@
+"""Tests for timing_index"""
+
+import pytest
+
+from timing_index import (CHARS_PER_SECOND, FIELD_CODES, align_speech_marks, build_sentence_entries,
+                          estimate_timings, load_timing_index, parse_pause, split_sentences,
+                          write_timing_index)
+
+TEXT_DATA = {'pages': [
+    {'page_number': 1, 'regular_text': 'First sentence here. Second one!', 'italic_text': 'An aside.'},
+    {'page_number': 2, 'regular_text': 'Next page text.', 'italic_text': ''},
+]}
+
+
+def test_split_sentences_offsets():
+    text = '  One. Two!  "Three?" four'
+    spans = split_sentences(text)
+    assert [text[start:end] for start, end in spans] == ['One.', 'Two!', '"Three?"', 'four']
+    assert split_sentences('   ') == []
+
+
+def test_parse_pause():
+    assert parse_pause('500ms') == 0.5
+    assert parse_pause('2s') == 2.0
+    assert parse_pause('1.5') == 1.5
+
+
+def test_entries_follow_speaking_order():
+    entries = build_sentence_entries(TEXT_DATA)
+    assert [(entry['page'], entry['field'], entry['text']) for entry in entries] == [
+        (1, 'regular', 'First sentence here.'),
+        (1, 'regular', 'Second one!'),
+        (1, 'italic', 'An aside.'),
+        (2, 'regular', 'Next page text.'),
+    ]
+
+
+def test_estimate_timings_adds_pauses():
+    entries = estimate_timings(build_sentence_entries(TEXT_DATA), section_pause=1.0, page_pause=2.0)
+    first, second, aside, next_page = entries
+    assert first['time'] == 0.0
+    assert second['time'] == pytest.approx(first['duration'])
+    assert aside['time'] == pytest.approx(second['time'] + second['duration'] + 1.0)
+    assert next_page['time'] == pytest.approx(aside['time'] + aside['duration'] + 3.0)
+    assert first['duration'] == pytest.approx(len(first['text']) / CHARS_PER_SECOND)
+
+
+def test_estimate_timings_scales_to_duration():
+    entries = estimate_timings(build_sentence_entries(TEXT_DATA), total_duration=60.0)
+    last = entries[-1]
+    assert last['time'] + last['duration'] == pytest.approx(60.0)
+
+
+def test_align_speech_marks():
+    entries = build_sentence_entries(TEXT_DATA)
+    marks = [
+        {'time': 0, 'value': 'First sentence here. Second one!'},
+        {'time': 4000, 'value': 'An aside.'},
+        {'time': 8000, 'value': 'Next page text.'},
+    ]
+    align_speech_marks(entries, marks, total_duration=10.0)
+    times = [entry['time'] for entry in entries]
+    assert times[0] == 0.0
+    assert 0.0 < times[1] < 4.0
+    assert times[2:] == [4.0, 8.0]
+    assert entries[-1]['duration'] == pytest.approx(2.0)
+
+
+def test_unmatched_entries_are_interpolated():
+    entries = build_sentence_entries(TEXT_DATA)
+    marks = [{'time': 0, 'value': 'First sentence here.'}, {'time': 9000, 'value': 'Next page text.'}]
+    align_speech_marks(entries, marks, total_duration=12.0)
+    times = [entry['time'] for entry in entries]
+    assert times[0] == 0.0 and times[-1] == 9.0
+    assert times == sorted(times)
+    assert all(entry['duration'] >= 0 for entry in entries)
+
+
+def test_write_and_load_round_trip(tmp_path):
+    entries = estimate_timings(build_sentence_entries(TEXT_DATA))
+    path = write_timing_index(entries, tmp_path / 'book.timing.jsonl', audio_file='/out/book.mp3')
+    header, rows = load_timing_index(path)
+
+    assert header['audio'] == 'book.mp3'
+    assert header['source'] == 'estimate'
+    assert header['fields'] == FIELD_CODES
+    assert len(rows) == len(entries)
+    page, field, start, end, time_ms, duration_ms = rows[2]
+    assert (page, field, start, end) == (1, FIELD_CODES['italic'], 0, len('An aside.'))
+    assert time_ms == round(entries[2]['time'] * 1000)
+    assert duration_ms == round(entries[2]['duration'] * 1000)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Text Document - Compact on-disk intermediate between the OCR and audio stages
+A versioned binary file holding, per page, the regular and italic text plus
+columnar word tables (bounding boxes, OCR confidences, styles) and style
+runs in reading order. PDFProcessor streams pages into it as they are OCR'd;
+AudioGenerator memory-maps it, so reopening a 1,000-page book only reads
+the header and decodes page text on access
+
+Layout (little-endian, every table 8-byte aligned):
+    header      magic, version, counts, offsets (64 bytes)
+    text        UTF-8 page text, page by page (regular then italic)
+    pages       page_count x PAGE_FIELDS uint64 rows
+    words       columns: x0, y0, x1, y1 (uint16), conf, style (uint8),
+                         offset (uint32, within the page field), length (uint16)
+    runs        columns: style (uint8), first_word, word_count (uint32)
+    metadata    JSON (source file, dpi, processing counters)
+"""
+
+import sys
+import json
+import mmap
+import struct
+import logging
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PTVD'
+FORMAT_VERSION = 1
+DOCUMENT_SUFFIX = '.ptvd'
+
+# magic, version, flags, page_count, word_count, run_count,
+# text_offset, tables_offset, metadata_offset, metadata_length
+HEADER = struct.Struct('<4sHHIIIQQQQ')
+HEADER_SIZE = 64
+
+PAGE_FIELDS = ('page_number', 'width', 'height', 'regular_offset', 'regular_length',
+               'italic_offset', 'italic_length', 'word_start', 'run_start')
+
+# Word table columns: (name, array typecode)
+WORD_COLUMNS = (('x0', 'H'), ('y0', 'H'), ('x1', 'H'), ('y1', 'H'),
+                ('conf', 'B'), ('style', 'B'), ('offset', 'I'), ('length', 'H'))
+RUN_COLUMNS = (('style', 'B'), ('first_word', 'I'), ('word_count', 'I'))
+
+STYLE_REGULAR = 0
+STYLE_ITALIC = 1
+CONF_UNKNOWN = 255
+
+
+class DocumentFormatError(ValueError):
+    """Raised for files that are not text documents or use an unsupported version"""
+
+
+def _padding(position: int) -> bytes:
+    return b'\0' * (-position % 8)
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class TextDocumentWriter:
+    """
+    Streaming writer: page text goes to disk as each page is added; the
+    word/run tables (a few bytes per word) are written on close
+    """
+
+    def __init__(self, path: Path, metadata: Optional[Dict] = None):
+        self.path = Path(path)
+        self.metadata = dict(metadata or {})
+        self.page_rows = array('Q')
+        self.words = {name: array(code) for name, code in WORD_COLUMNS}
+        self.runs = {name: array(code) for name, code in RUN_COLUMNS}
+        self.page_count = 0
+        self._file = None
+        self._text_position = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name so readers never see a partial file
+        self._file = open(self.path.with_suffix(self.path.suffix + '.tmp'), 'wb')
+        self._file.write(b'\0' * HEADER_SIZE)
+
+    def add_page(self, page_data: Dict, words: Optional[List[Dict]] = None,
+                 size: Tuple[int, int] = (0, 0)) -> None:
+        """
+        Append one page
+        words are in reading order: {'text', 'italic', 'bbox', 'conf'}; each
+        word's position in regular_text/italic_text is derived from that order
+        """
+        regular = page_data.get('regular_text', '').encode('utf-8')
+        italic = page_data.get('italic_text', '').encode('utf-8')
+        regular_offset = self._text_position
+        italic_offset = regular_offset + len(regular)
+        self._file.write(regular)
+        self._file.write(italic)
+        self._text_position += len(regular) + len(italic)
+
+        word_start = len(self.words['style'])
+        run_start = len(self.runs['style'])
+        self.page_rows.extend([
+            page_data.get('page_number', self.page_count + 1), size[0], size[1],
+            regular_offset, len(regular), italic_offset, len(italic), word_start, run_start
+        ])
+
+        field_positions = [0, 0]
+        for word in words or []:
+            style = STYLE_ITALIC if word.get('italic') else STYLE_REGULAR
+            text = word['text']
+            x0, y0, x1, y1 = word.get('bbox') or (0, 0, 0, 0)
+            for name, value in (('x0', x0), ('y0', y0), ('x1', x1), ('y1', y1)):
+                self.words[name].append(min(max(int(value), 0), 0xFFFF))
+            conf = word.get('conf')
+            self.words['conf'].append(CONF_UNKNOWN if conf is None else min(max(int(round(conf)), 0), 100))
+            self.words['style'].append(style)
+            self.words['offset'].append(field_positions[style])
+            self.words['length'].append(min(len(text), 0xFFFF))
+            field_positions[style] += len(text) + 1
+
+            # Style runs: consecutive words of one style in reading order
+            if len(self.runs['style']) > run_start and self.runs['style'][-1] == style:
+                self.runs['word_count'][-1] += 1
+            else:
+                self.runs['style'].append(style)
+                self.runs['first_word'].append(len(self.words['style']) - 1)
+                self.runs['word_count'].append(1)
+
+        self.page_count += 1
+
+    def close(self) -> str:
+        if self._file is None:
+            return str(self.path)
+        output = self._file
+        output.write(_padding(HEADER_SIZE + self._text_position))
+        tables_offset = output.tell()
+
+        for table in [self.page_rows] + [self.words[name] for name, _ in WORD_COLUMNS] + \
+                [self.runs[name] for name, _ in RUN_COLUMNS]:
+            data = _to_bytes(table)
+            output.write(data)
+            output.write(_padding(len(data)))
+
+        metadata = json.dumps(self.metadata, ensure_ascii=False).encode('utf-8')
+        metadata_offset = output.tell()
+        output.write(metadata)
+
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, self.page_count, len(self.words['style']),
+                                 len(self.runs['style']), HEADER_SIZE, tables_offset,
+                                 metadata_offset, len(metadata)))
+        output.close()
+        self._file = None
+        Path(output.name).replace(self.path)
+        logger.info(f"Text document saved: {self.path} ({self.page_count} pages, "
+                    f"{len(self.words['style'])} words)")
+        return str(self.path)
+
+
+class TextDocument:
+    """Memory-mapped reader; tables are zero-copy views, text is decoded per page"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise DocumentFormatError(f"Empty text document: {self.path}")
+        # Kept on self at once so close() can release it if the header is rejected
+        view = self._view = memoryview(self._map)
+
+        (magic, version, _, self.page_count, self.word_count, self.run_count,
+         self._text_offset, tables_offset, metadata_offset, metadata_length) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            self.close()
+            raise DocumentFormatError(f"Not a text document: {self.path}")
+        if version > FORMAT_VERSION:
+            self.close()
+            raise DocumentFormatError(f"{self.path} uses format version {version}, "
+                                      f"this reader supports up to {FORMAT_VERSION}")
+        self.version = version
+
+        position = tables_offset
+        self._pages, position = self._column(view, position, 'Q', self.page_count * len(PAGE_FIELDS))
+        self._words = {}
+        for name, code in WORD_COLUMNS:
+            self._words[name], position = self._column(view, position, code, self.word_count)
+        self._runs = {}
+        for name, code in RUN_COLUMNS:
+            self._runs[name], position = self._column(view, position, code, self.run_count)
+        self.metadata = json.loads(bytes(view[metadata_offset:metadata_offset + metadata_length]) or b'{}')
+
+    @staticmethod
+    def _column(view: memoryview, position: int, code: str, count: int):
+        size = array(code).itemsize * count
+        data = view[position:position + size]
+        if sys.byteorder == 'little':
+            column = data.cast(code)
+        else:
+            column = array(code, bytes(data))
+            column.byteswap()
+        return column, position + size + (-size % 8)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def close(self) -> None:
+        # Views must be released before the map can close
+        for name in ('_pages', '_view'):
+            value = getattr(self, name, None)
+            if isinstance(value, memoryview):
+                value.release()
+        for columns in (getattr(self, '_words', {}), getattr(self, '_runs', {})):
+            for column in columns.values():
+                if isinstance(column, memoryview):
+                    column.release()
+        if getattr(self, '_map', None) is not None and not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def _row(self, index: int) -> Dict[str, int]:
+        start = index * len(PAGE_FIELDS)
+        return dict(zip(PAGE_FIELDS, self._pages[start:start + len(PAGE_FIELDS)]))
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._text_offset + offset
+        return bytes(self._view[start:start + length]).decode('utf-8')
+
+    def page(self, index: int) -> Dict:
+        """Page data in the text_data layout: page_number, regular_text, italic_text"""
+        row = self._row(index)
+        return {
+            'page_number': row['page_number'],
+            'regular_text': self._text(row['regular_offset'], row['regular_length']),
+            'italic_text': self._text(row['italic_offset'], row['italic_length'])
+        }
+
+    def _word_range(self, index: int, table: str) -> range:
+        key = 'word_start' if table == 'words' else 'run_start'
+        total = self.word_count if table == 'words' else self.run_count
+        start = self._pages[index * len(PAGE_FIELDS) + PAGE_FIELDS.index(key)]
+        if index + 1 < self.page_count:
+            end = self._pages[(index + 1) * len(PAGE_FIELDS) + PAGE_FIELDS.index(key)]
+        else:
+            end = total
+        return range(start, end)
+
+    def words(self, index: int) -> List[Dict]:
+        """Words of a page in reading order with bbox, confidence (None if unknown) and style"""
+        page = self.page(index)
+        fields = (page['regular_text'], page['italic_text'])
+        columns = self._words
+        words = []
+        for word in self._word_range(index, 'words'):
+            style = columns['style'][word]
+            offset = columns['offset'][word]
+            conf = columns['conf'][word]
+            words.append({
+                'text': fields[style][offset:offset + columns['length'][word]],
+                'italic': style == STYLE_ITALIC,
+                'offset': offset,
+                'bbox': (columns['x0'][word], columns['y0'][word], columns['x1'][word], columns['y1'][word]),
+                'conf': None if conf == CONF_UNKNOWN else conf
+            })
+        return words
+
+    def runs(self, index: int) -> List[Dict]:
+        """Style runs of a page in reading order: {'italic', 'first_word', 'word_count'}"""
+        return [
+            {
+                'italic': self._runs['style'][run] == STYLE_ITALIC,
+                'first_word': self._runs['first_word'][run] - self._word_range(index, 'words').start,
+                'word_count': self._runs['word_count'][run]
+            }
+            for run in self._word_range(index, 'runs')
+        ]
+
+    def to_text_data(self) -> Dict:
+        """text_data for AudioGenerator; pages are decoded lazily as they are read"""
+        text_data = {'pages': DocumentPages(self), 'document': str(self.path)}
+        text_data.update({key: value for key, value in self.metadata.items() if key not in text_data})
+        return text_data
+
+
+class DocumentPages(Sequence):
+    """Read-only page list backed by a TextDocument"""
+
+    def __init__(self, document: TextDocument):
+        self.document = document
+
+    def __len__(self) -> int:
+        return self.document.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.document.page(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.document.page(index)
+
+
+def load_text_data(path: Path) -> Dict:
+    """Open a text document and return its text_data (the file stays mapped)"""
+    return TextDocument(path).to_text_data()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Text Normalizer - Clean OCR text before SSML generation
+Joins hyphenated line-break fragments, drops running headers and footers
+found by counting them across pages, folds Unicode artifacts (ligatures,
+soft hyphens) and expands abbreviations and numbers so TTS engines neither
+bill for nor read out scanning noise
+"""
+
+import re
+import unicodedata
+import logging
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest running head/foot (in words) that is looked for
+MAX_EDGE_WORDS = 8
+
+# Abbreviations that are never ordinary words
+ABBREVIATIONS = {
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'etc.': 'et cetera',
+    'cf.': 'compare',
+    'vs.': 'versus',
+    'viz.': 'namely',
+    'Mr.': 'Mister',
+    'Mrs.': 'Missus',
+    'Dr.': 'Doctor',
+    'Rev.': 'Reverend',
+}
+# These may end a sentence; the period is kept when it does
+SENTENCE_FINAL_ABBREVIATIONS = {'etc.'}
+
+# "no.", "p.", "v." ... are also words at the end of a sentence, so these are
+# only expanded right before a number ("No. 5", "p. 12", "vv. 3-5")
+NUMBER_ABBREVIATIONS = {
+    'ch.': 'chapter',
+    'Ch.': 'Chapter',
+    'vol.': 'volume',
+    'Vol.': 'Volume',
+    'p.': 'page',
+    'pp.': 'pages',
+    'v.': 'verse',
+    'vv.': 'verses',
+    'no.': 'number',
+    'No.': 'Number',
+}
+
+# Characters NFKC keeps but that are never spoken
+INVISIBLE_PATTERN = re.compile('[­​‌‍⁠﻿]')
+HYPHEN_BREAK_PATTERN = re.compile(r'(\w+)([-‐¬])\s+([a-z]\w*)')
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+ABBREVIATION_PATTERN = re.compile(
+    r'(?<![\w.])(' + '|'.join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)) + r')(?=\s|$)'
+)
+NUMBER_ABBREVIATION_PATTERN = re.compile(
+    r'(?<![\w.])(' + '|'.join(re.escape(a) for a in sorted(NUMBER_ABBREVIATIONS, key=len, reverse=True))
+    + r')(?=\s*\d)'
+)
+# "St." is Saint before a name ("St. Paul") but Street after one ("Main St.")
+SAINT_PATTERN = re.compile(r'(?<![\w.])St\.(?=\s+[A-Z][a-z])')
+# Ranges ascend and are not phone numbers (555-1234) or parts of longer codes
+NUMBER_RANGE_PATTERN = re.compile(r'(?<![\d-])(\d+)\s*[-–]\s*(\d+)(?![\d-])')
+PERCENT_PATTERN = re.compile(r'(\d)\s*%')
+CURRENCY_PATTERN = re.compile(r'\$\s*(\d+(?:[.,]\d+)*)')
+AMPERSAND_PATTERN = re.compile(r'\s*&\s*')
+SPACE_BEFORE_PUNCTUATION_PATTERN = re.compile(r'\s+([,.;:!?])')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+DIGIT_PATTERN = re.compile(r'\d+')
+
+
+def normalize_unicode(text: str) -> str:
+    """NFKC folds ligatures (ﬁ, ﬂ) and full-width forms; invisible marks are dropped"""
+    return INVISIBLE_PATTERN.sub('', unicodedata.normalize('NFKC', text))
+
+
+def vocabulary(text: str) -> Set[str]:
+    """Lower-case words of a text, leaving out the fragments of line-break hyphenations"""
+    return {word.lower() for word in WORD_PATTERN.findall(HYPHEN_BREAK_PATTERN.sub(' ', text))}
+
+
+def dehyphenate(text: str, words: Optional[Set[str]] = None) -> str:
+    """
+    Join words split across lines ("inter- national" -> "international")
+    A compound split at its hyphen ("well- known") keeps the hyphen: both
+    halves are words found elsewhere in the text and the joined form is not.
+    words is the vocabulary to check against (default: the text's own)
+    """
+    if words is None:
+        words = vocabulary(text)
+
+    def join(match) -> str:
+        first, hyphen, second = match.groups()
+        if hyphen != '¬' and (first + second).lower() not in words \
+                and first.lower() in words and second.lower() in words:
+            return f'{first}-{second}'
+        return first + second
+
+    return HYPHEN_BREAK_PATTERN.sub(join, text)
+
+
+def _expand_abbreviation(match) -> str:
+    abbreviation = match.group(1)
+    expansion = ABBREVIATIONS[abbreviation]
+    rest = match.string[match.end():].lstrip()
+    if abbreviation in SENTENCE_FINAL_ABBREVIATIONS and (not rest or rest[0].isupper()):
+        return expansion + '.'
+    return expansion
+
+
+def _expand_saint(match) -> str:
+    before = match.string[:match.start()].split()
+    previous = before[-1] if before else ''
+    if previous[:1].isupper() and not previous.endswith(('.', '!', '?')):
+        return match.group(0)   # "Main St. Then ..."
+    return 'Saint'
+
+
+def expand_abbreviations(text: str) -> str:
+    text = ABBREVIATION_PATTERN.sub(_expand_abbreviation, text)
+    text = NUMBER_ABBREVIATION_PATTERN.sub(lambda match: NUMBER_ABBREVIATIONS[match.group(1)], text)
+    return SAINT_PATTERN.sub(_expand_saint, text)
+
+
+def _expand_range(match) -> str:
+    first, second = match.groups()
+    if int(second) <= int(first) or second.startswith('0') or (len(first) == 3 and len(second) == 4):
+        return match.group(0)
+    return f'{first} to {second}'
+
+
+def expand_numbers(text: str) -> str:
+    """Spell out symbols TTS engines read inconsistently (ranges, %, $, &)"""
+    text = NUMBER_RANGE_PATTERN.sub(_expand_range, text)
+    text = PERCENT_PATTERN.sub(r'\1 percent', text)
+    text = CURRENCY_PATTERN.sub(r'\1 dollars', text)
+    return AMPERSAND_PATTERN.sub(' and ', text)
+
+
+def collapse_whitespace(text: str) -> str:
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    return SPACE_BEFORE_PUNCTUATION_PATTERN.sub(r'\1', text).strip()
+
+
+def _mask(words: List[str]) -> str:
+    """Key for a run of words; page numbers differ per page so digits are masked"""
+    return DIGIT_PATTERN.sub('#', ' '.join(words)).lower()
+
+
+def _edge_keys(words: List[str], from_end: bool) -> List[Tuple[int, str]]:
+    """(word count, masked key) for every prefix or suffix up to MAX_EDGE_WORDS"""
+    keys = []
+    for count in range(1, min(MAX_EDGE_WORDS, len(words)) + 1):
+        edge = words[-count:] if from_end else words[:count]
+        key = _mask(edge)
+        # A single word only counts when it is a page number, not "The" or "And"
+        if count > 1 or '#' in key:
+            keys.append((count, key))
+    return keys
+
+
+def _repeated_runs(counts: Counter, threshold: int, parent_of: Callable[[List[str]], List[str]]) -> set:
+    """
+    Keys on at least threshold pages whose shorter runs (parent_of drops the
+    word furthest from the page edge) are repeated runs with the same count
+    """
+    repeated = set()
+    for key in sorted(counts, key=lambda key: len(key.split())):
+        if counts[key] < threshold:
+            continue
+        parent = ' '.join(parent_of(key.split()))
+        # Single words only count as numbers, so a run may start at two words
+        if parent not in counts or (parent in repeated and counts[parent] == counts[key]):
+            repeated.add(key)
+    return repeated
+
+
+class TextNormalizer:
+    """Normalization stage run on text_data between process_pdf and audio generation"""
+
+    def __init__(self, remove_headers: bool = True, expand: bool = True,
+                 min_repeat_ratio: float = 0.5, min_repeat_pages: int = 3):
+        self.remove_headers = remove_headers
+        self.expand = expand
+        self.min_repeat_ratio = min_repeat_ratio
+        self.min_repeat_pages = min_repeat_pages
+
+    def normalize_text(self, text: str, words: Optional[Set[str]] = None) -> str:
+        """
+        Normalize a single block of text (no cross-page header detection)
+        words: vocabulary for dehyphenation, by default the block's own
+        """
+        text = dehyphenate(normalize_unicode(text), words)
+        if self.expand:
+            text = expand_numbers(expand_abbreviations(text))
+        return collapse_whitespace(text)
+
+    def find_repeated_edges(self, page_texts: List[str]) -> Tuple[set, set]:
+        """
+        Count masked first/last word runs across pages in one pass
+        Returns the header and footer keys that repeat on enough pages
+        A run is only extended by a word while it keeps the same page count,
+        so "Chapter # The" is not a header just because half the pages of a
+        chapter headed "Chapter #" begin with "The"
+        """
+        threshold = max(self.min_repeat_pages, int(len(page_texts) * self.min_repeat_ratio))
+        header_counts = Counter()
+        footer_counts = Counter()
+        for text in page_texts:
+            words = text.split()
+            header_counts.update({key for _, key in _edge_keys(words, from_end=False)})
+            footer_counts.update({key for _, key in _edge_keys(words, from_end=True)})
+        headers = _repeated_runs(header_counts, threshold, lambda words: words[:-1])
+        footers = _repeated_runs(footer_counts, threshold, lambda words: words[1:])
+        return headers, footers
+
+    def strip_edges(self, text: str, headers: set, footers: set) -> str:
+        """Remove the longest repeating header and footer from one page"""
+        words = text.split()
+        start = max((count for count, key in _edge_keys(words, from_end=False) if key in headers), default=0)
+        end = max((count for count, key in _edge_keys(words, from_end=True) if key in footers), default=0)
+        if start + end >= len(words):
+            return ''
+        return ' '.join(words[start:len(words) - end])
+
+    def normalize_text_data(self, text_data: Dict) -> Dict:
+        """
+        Return a normalized copy of text_data with a 'normalization' report
+        listing per page how many billable characters were removed
+        """
+        pages = text_data.get('pages', [])
+        regular_texts = [normalize_unicode(page.get('regular_text', '')) for page in pages]
+
+        words = vocabulary(' '.join(regular_texts + [page.get('italic_text', '') for page in pages]))
+        headers, footers = set(), set()
+        if self.remove_headers and len(pages) >= self.min_repeat_pages:
+            headers, footers = self.find_repeated_edges(regular_texts)
+            if headers or footers:
+                logger.info(f"Detected {len(headers)} running header and {len(footers)} footer patterns")
+
+        normalized_pages = []
+        report_pages = []
+        for page, regular_text in zip(pages, regular_texts):
+            if headers or footers:
+                regular_text = self.strip_edges(regular_text, headers, footers)
+            normalized = dict(page)
+            normalized['regular_text'] = self.normalize_text(regular_text, words)
+            normalized['italic_text'] = self.normalize_text(page.get('italic_text', ''), words)
+            normalized_pages.append(normalized)
+
+            chars_before = len(page.get('regular_text', '')) + len(page.get('italic_text', ''))
+            chars_after = len(normalized['regular_text']) + len(normalized['italic_text'])
+            report_pages.append({
+                'page': page.get('page_number', len(report_pages) + 1),
+                'chars_before': chars_before,
+                'chars_after': chars_after,
+                # Negative when expansions add more than cleanup removes
+                'removed_chars': chars_before - chars_after
+            })
+
+        removed = sum(page['removed_chars'] for page in report_pages)
+        logger.info(f"Normalization removed {removed} billable characters across {len(pages)} pages")
+
+        result = dict(text_data)
+        result['pages'] = normalized_pages
+        result['regular'] = [page['regular_text'] for page in normalized_pages if page['regular_text']]
+        result['italic'] = [page['italic_text'] for page in normalized_pages if page['italic_text']]
+        result['normalization'] = {
+            'removed_chars': removed,
+            'headers': sorted(headers),
+            'footers': sorted(footers),
+            'pages': report_pages
+        }
+        return result
+
+
+def normalize_text_data(text_data: Dict, **options) -> Dict:
+    """Convenience wrapper: TextNormalizer(**options).normalize_text_data(text_data)"""
+    return TextNormalizer(**options).normalize_text_data(text_data)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Timing Index - Map sentence offsets in page text to audio timestamps
+Written as a compact JSON-lines sidecar next to the audio file so the
+HTML preview can seek the player to any sentence (read-along playback)
+"""
+
+import re
+import json
+import logging
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIMING_INDEX_VERSION = 1
+
+# Same reading speed assumptions as AudioGenerator.estimate_audio_duration:
+# ~150 words per minute, ~5 chars per word, 30% longer for natural speech
+CHARS_PER_SECOND = (150 * 5) / 60 / 1.3
+
+# Field codes keep each JSON line short on multi-hour books
+FIELD_CODES = {'regular': 0, 'italic': 1}
+
+SENTENCE_PATTERN = re.compile(r'[^.!?]+(?:[.!?]+["\'\)\]]*|$)')
+NORMALIZE_PATTERN = re.compile(r'[^a-z0-9]+')
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Split text into sentences, returning (start, end) character offsets"""
+    spans = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        start, end = match.span()
+        # Trim surrounding whitespace so offsets point at the words themselves
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def build_sentence_entries(text_data: Dict) -> List[Dict]:
+    """
+    Build one entry per sentence in speaking order
+    (per page: regular text first, then italic text, as in the SSML)
+    """
+    entries = []
+    for page_num, page_data in enumerate(text_data['pages'], 1):
+        page_number = page_data.get('page_number', page_num)
+        for field in ('regular', 'italic'):
+            text = page_data.get(f'{field}_text', '')
+            for start, end in split_sentences(text):
+                entries.append({
+                    'page': page_number,
+                    'field': field,
+                    'start': start,
+                    'end': end,
+                    'text': text[start:end],
+                    'time': None,
+                    'duration': None
+                })
+    return entries
+
+
+def parse_pause(pause: str) -> float:
+    """Convert an SSML break time ('2s', '500ms') to seconds"""
+    pause = pause.strip().lower()
+    if pause.endswith('ms'):
+        return float(pause[:-2]) / 1000
+    if pause.endswith('s'):
+        return float(pause[:-1])
+    return float(pause)
+
+
+def estimate_timings(entries: List[Dict], section_pause: float = 1.0, page_pause: float = 2.0,
+                     total_duration: Optional[float] = None) -> List[Dict]:
+    """
+    Estimate timestamps from text length and the pauses placed in the SSML
+    If the real audio duration is known, scale the estimates to match it
+    """
+    current_time = 0.0
+    previous = None
+    for entry in entries:
+        if previous is not None:
+            if entry['page'] != previous['page']:
+                current_time += section_pause + page_pause
+            elif entry['field'] != previous['field']:
+                current_time += section_pause
+        entry['time'] = current_time
+        entry['duration'] = len(entry['text']) / CHARS_PER_SECOND
+        current_time += entry['duration']
+        previous = entry
+
+    if total_duration and current_time > 0:
+        scale = total_duration / current_time
+        for entry in entries:
+            entry['time'] *= scale
+            entry['duration'] *= scale
+
+    return entries
+
+
+def align_speech_marks(entries: List[Dict], marks: List[Dict],
+                       total_duration: Optional[float] = None) -> List[Dict]:
+    """
+    Assign times from provider speech marks (e.g. Polly 'sentence' marks) or
+    from local segment start times to entries
+    Marks cover the spoken text in order, so each entry is located in the
+    concatenated mark text and timed by its position inside its mark;
+    entries that cannot be located are interpolated between their neighbours
+    """
+    mark_texts = [NORMALIZE_PATTERN.sub('', mark.get('value', '').lower()) for mark in marks]
+    mark_starts = []
+    position = 0
+    for text in mark_texts:
+        mark_starts.append(position)
+        position += len(text)
+    stream = ''.join(mark_texts)
+
+    mark_times = [mark['time'] / 1000 for mark in marks]
+    if total_duration:
+        end_time = total_duration
+    else:
+        end_time = (mark_times[-1] + len(mark_texts[-1]) / CHARS_PER_SECOND) if marks else 0.0
+    mark_ends = mark_times[1:] + [end_time]
+
+    cursor = 0
+    for entry in entries:
+        key = NORMALIZE_PATTERN.sub('', entry['text'].lower())[:48]
+        if not key:
+            continue
+        found = stream.find(key, cursor)
+        if found < 0:
+            continue
+        cursor = found + len(key)
+        i = bisect_right(mark_starts, found) - 1
+        fraction = (found - mark_starts[i]) / max(len(mark_texts[i]), 1)
+        entry['time'] = mark_times[i] + fraction * (mark_ends[i] - mark_times[i])
+
+    _interpolate_missing(entries, total_duration or end_time)
+    return entries
+
+
+def _interpolate_missing(entries: List[Dict], total_duration: Optional[float]) -> None:
+    """Fill missing times linearly by character count and derive durations"""
+    known = [i for i, entry in enumerate(entries) if entry['time'] is not None]
+    if not known:
+        estimate_timings(entries, total_duration=total_duration)
+        return
+
+    end_time = total_duration
+    if not end_time:
+        end_time = entries[known[-1]]['time'] + sum(
+            len(entry['text']) for entry in entries[known[-1]:]) / CHARS_PER_SECOND
+    boundaries = [(-1, 0.0)] + [(i, entries[i]['time']) for i in known]
+    boundaries.append((len(entries), end_time))
+
+    for (left, left_time), (right, right_time) in zip(boundaries, boundaries[1:]):
+        span = entries[max(left, 0):right]
+        chars = sum(len(entry['text']) for entry in span) or 1
+        current_time = left_time
+        for entry in span:
+            if entry['time'] is None:
+                entry['time'] = current_time
+            current_time = entry['time'] + (right_time - left_time) * len(entry['text']) / chars
+
+    for entry, following in zip(entries, entries[1:]):
+        entry['duration'] = max(following['time'] - entry['time'], 0.0)
+    entries[-1]['duration'] = max(end_time - entries[-1]['time'], 0.0)
+
+
+def write_timing_index(entries: List[Dict], output_path: Path, audio_file: str = '',
+                       source: str = 'estimate') -> str:
+    """
+    Write the timing index as JSON lines
+    First line is a header; each following line is
+    [page, field_code, start, end, time_ms, duration_ms]
+    """
+    with open(output_path, 'w', encoding='utf-8') as f:
+        header = {
+            'version': TIMING_INDEX_VERSION,
+            'audio': Path(audio_file).name if audio_file else '',
+            'source': source,
+            'fields': FIELD_CODES,
+            'columns': ['page', 'field', 'start', 'end', 'time_ms', 'duration_ms']
+        }
+        f.write(json.dumps(header, separators=(',', ':')) + '\n')
+        for entry in entries:
+            row = [
+                entry['page'],
+                FIELD_CODES[entry['field']],
+                entry['start'],
+                entry['end'],
+                int(round(entry['time'] * 1000)),
+                int(round((entry['duration'] or 0.0) * 1000))
+            ]
+            f.write(json.dumps(row, separators=(',', ':')) + '\n')
+
+    logger.info(f"Timing index saved: {output_path}")
+    return str(output_path)
+
+
+def load_timing_index(index_path: str) -> Tuple[Dict, List[List[int]]]:
+    """Load a timing index back as (header, rows)"""
+    with open(index_path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        rows = [json.loads(line) for line in f if line.strip()]
+    return header, rows
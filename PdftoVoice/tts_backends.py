@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+TTS Backends - Pluggable text-to-speech engines behind one interface
+Each backend declares its capabilities (request size, SSML support,
+concurrency, output formats, speech marks) so the chunker and dispatcher
+in AudioGenerator can tune themselves, and keeps one long-lived client
+"""
+
+import os
+import re
+import json
+import wave
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterator, Tuple, Type, Callable
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Per-book list of segment files, start times and text, in the segment directory
+SEGMENT_MANIFEST = 'segments.json'
+
+# Registry of backend name -> backend class
+TTS_BACKENDS: Dict[str, Type['TTSBackend']] = {}
+
+# Cloud clients shared by every backend instance in the process,
+# keyed by (backend name, endpoint, connection pool size)
+_SHARED_CLIENTS: Dict[Tuple, object] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+# Keep idle connections open between chunk requests
+KEEPALIVE_SECONDS = 60
+
+# ElevenLabs REST API; the default voice names are its premade voices
+ELEVENLABS_API_URL = 'https://api.elevenlabs.io'
+ELEVENLABS_MODEL = 'eleven_multilingual_v2'
+ELEVENLABS_VOICE_IDS = {
+    'Rachel': '21m00Tcm4TlvDq8ikWAM',
+    'Drew': '29vD33N1CtxCmqQRPOHJ',
+    'Clyde': '2EiwWnXFnvU5JabPnv8n',
+    'Paul': '5Q0t7uMcjvnagumLfvZi',
+    'Domi': 'AZnzlk1XvdvUeBnXmlld',
+}
+
+
+def register_backend(name: str):
+    """Class decorator adding a backend to the registry"""
+    def decorator(backend_class):
+        backend_class.name = name
+        TTS_BACKENDS[name] = backend_class
+        return backend_class
+    return decorator
+
+
+def get_backend(name: str, **kwargs) -> 'TTSBackend':
+    """Create a backend by name (unknown names get the local backend)"""
+    backend_class = TTS_BACKENDS.get(name, TTS_BACKENDS['local'])
+    return backend_class(**kwargs)
+
+
+class TTSBackend:
+    """
+    Base class for TTS engines
+    Subclasses implement _create_client and synthesize_chunk; SDK imports
+    belong in those methods so unused engines are never imported
+    """
+
+    name = ''
+    max_request_chars = 3000       # Largest text (or UTF-8 SSML document) per request
+    supports_ssml = True
+    max_concurrency = 4            # Requests the dispatcher may run at once
+    output_formats = ('mp3',)
+    supports_speech_marks = False
+    offline = False                # Runs on this machine (workers scale with cores)
+    shared_client = False          # Thread-safe client shared across instances
+    endpoint_env = ''              # Environment variable overriding the service endpoint
+    # Dry-run planning (SynthesisPlanner); prices are approximate list prices in USD
+    price_per_million_chars = 0.0
+    bills_markup = False           # SSML tags count as billable characters
+    request_latency = 0.5          # Seconds of overhead per request
+    chars_per_second = 1000.0      # Synthesis throughput of one request
+
+    def __init__(self, speech_settings: Optional[Dict] = None, endpoint_url: Optional[str] = None):
+        self.speech_settings = speech_settings or {}
+        self.endpoint_url = endpoint_url or (os.environ.get(self.endpoint_env) if self.endpoint_env else None)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def capabilities(cls) -> Dict:
+        """Describe what this backend can do"""
+        return {
+            'name': cls.name,
+            'max_request_chars': cls.max_request_chars,
+            'supports_ssml': cls.supports_ssml,
+            'max_concurrency': cls.max_concurrency,
+            'output_formats': list(cls.output_formats),
+            'supports_speech_marks': cls.supports_speech_marks,
+            'offline': cls.offline,
+            'price_per_million_chars': cls.price_per_million_chars,
+            'bills_markup': cls.bills_markup
+        }
+
+    @property
+    def client(self):
+        """
+        Long-lived client, created on first use
+        Shared clients are pooled process-wide, sized to max_concurrency
+        """
+        if self._client is None:
+            if self.shared_client:
+                key = (self.name, self.endpoint_url, self.max_concurrency)
+                with _SHARED_CLIENTS_LOCK:
+                    if key not in _SHARED_CLIENTS:
+                        _SHARED_CLIENTS[key] = self._create_client()
+                    self._client = _SHARED_CLIENTS[key]
+            else:
+                with self._client_lock:
+                    if self._client is None:
+                        self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        return None
+
+    def synthesize_chunk(self, text: str, output_path: Path, voice_config: Dict) -> str:
+        """Synthesize one chunk (SSML if supports_ssml, else plain text) to a file"""
+        raise NotImplementedError
+
+    def synthesize_chunks(self, chunks: List[str], segment_dir: Path,
+                          voice_config: Dict) -> Iterator[Tuple[int, str]]:
+        """Synthesize chunks concurrently, yielding (index, path) in order"""
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        with self._client_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+        extension = self.output_formats[0]
+
+        def run(job: Tuple[int, str]) -> Tuple[int, str]:
+            index, text = job
+            path = segment_dir / f"{index:05d}.{extension}"
+            return index, self.synthesize_chunk(text, path, voice_config)
+
+        yield from self._executor.map(run, enumerate(chunks))
+
+    def get_voices(self) -> List[str]:
+        return []
+
+    def get_speech_marks(self, text: str, voice_config: Dict) -> List[Dict]:
+        """Sentence speech marks for one chunk (times in ms from chunk start)"""
+        return []
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+@register_backend('polly')
+class PollyBackend(TTSBackend):
+    """Amazon Polly"""
+
+    # Polly accepts 6000 characters per request, of which 3000 are billed text
+    max_request_chars = 3000
+    max_concurrency = 8
+    output_formats = ('mp3', 'ogg_vorbis', 'pcm')
+    supports_speech_marks = True
+    shared_client = True
+    endpoint_env = 'POLLY_ENDPOINT_URL'   # e.g. http://localhost:5000 for a mock server
+    price_per_million_chars = 16.0        # Neural voices (standard voices: 4.0); tags are free
+
+    def _create_client(self):
+        import boto3
+        from botocore.config import Config
+
+        # boto3 clients are thread-safe (sessions are not), so one client
+        # serves every dispatcher thread over a keep-alive connection pool
+        config = Config(
+            max_pool_connections=self.max_concurrency,
+            tcp_keepalive=True,
+            connect_timeout=10,
+            read_timeout=120,
+            retries={'max_attempts': 5, 'mode': 'adaptive'}
+        )
+        session = boto3.session.Session()
+        return session.client('polly', config=config, endpoint_url=self.endpoint_url)
+
+    def synthesize_chunk(self, text: str, output_path: Path, voice_config: Dict) -> str:
+        response = self.client.synthesize_speech(
+            Text=text,
+            OutputFormat='mp3',
+            VoiceId=voice_config['normal_voice'],
+            Engine=voice_config.get('engine', 'neural'),
+            TextType='ssml'
+        )
+        with open(output_path, 'wb') as file:
+            file.write(response['AudioStream'].read())
+        return str(output_path)
+
+    def get_speech_marks(self, text: str, voice_config: Dict) -> List[Dict]:
+        response = self.client.synthesize_speech(
+            Text=text,
+            OutputFormat='json',
+            SpeechMarkTypes=['sentence'],
+            VoiceId=voice_config['normal_voice'],
+            Engine=voice_config.get('engine', 'neural'),
+            TextType='ssml'
+        )
+        stream = response['AudioStream'].read().decode('utf-8')
+        return [json.loads(line) for line in stream.splitlines() if line.strip()]
+
+    def get_voices(self) -> List[str]:
+        try:
+            response = self.client.describe_voices()
+            return [voice['Id'] for voice in response['Voices'] if voice['LanguageCode'].startswith('en')]
+        except Exception:
+            return ['Joanna', 'Matthew', 'Amy', 'Brian', 'Emma']
+
+
+@register_backend('google')
+class GoogleBackend(TTSBackend):
+    """Google Cloud Text-to-Speech"""
+
+    # Google limits each request to 5000 bytes of input
+    max_request_chars = 5000
+    max_concurrency = 8
+    output_formats = ('mp3', 'ogg_opus', 'wav')
+    shared_client = True
+    endpoint_env = 'GOOGLE_TTS_ENDPOINT'  # e.g. localhost:8080 for a mock gRPC server
+    price_per_million_chars = 4.0         # Standard voices (WaveNet/Neural2: 16.0)
+    bills_markup = True                   # Google counts SSML tags as input characters
+
+    def _create_client(self):
+        from google.cloud import texttospeech
+        from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcTransport
+
+        # One gRPC channel multiplexes all concurrent requests over HTTP/2
+        # (the dispatcher's max_concurrency bounds them); keepalive pings stop
+        # the idle connection being dropped between chunks
+        options = [
+            ('grpc.keepalive_time_ms', KEEPALIVE_SECONDS * 1000),
+            ('grpc.keepalive_permit_without_calls', 1)
+        ]
+        if self.endpoint_url and self.endpoint_url.startswith(('localhost', '127.0.0.1')):
+            import grpc
+            channel = grpc.insecure_channel(self.endpoint_url, options=options)
+            return texttospeech.TextToSpeechClient(transport=TextToSpeechGrpcTransport(channel=channel))
+
+        host = self.endpoint_url or TextToSpeechGrpcTransport.DEFAULT_HOST
+        channel = TextToSpeechGrpcTransport.create_channel(host, options=options)
+        return texttospeech.TextToSpeechClient(transport=TextToSpeechGrpcTransport(host=host, channel=channel))
+
+    def synthesize_chunk(self, text: str, output_path: Path, voice_config: Dict) -> str:
+        from google.cloud import texttospeech
+
+        synthesis_input = texttospeech.SynthesisInput(ssml=text)
+
+        voice = texttospeech.VoiceSelectionParams(
+            language_code="en-US",
+            name=voice_config['normal_voice']
+        )
+
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3
+        )
+
+        response = self.client.synthesize_speech(
+            input=synthesis_input,
+            voice=voice,
+            audio_config=audio_config
+        )
+        with open(output_path, 'wb') as file:
+            file.write(response.audio_content)
+        return str(output_path)
+
+    def get_voices(self) -> List[str]:
+        return ['en-US-Standard-A', 'en-US-Standard-B', 'en-US-Standard-C', 'en-US-Standard-D']
+
+
+@register_backend('elevenlabs')
+class ElevenLabsBackend(TTSBackend):
+    """ElevenLabs over its HTTP API (plain text only)"""
+
+    max_request_chars = 5000
+    supports_ssml = False
+    max_concurrency = 2
+    shared_client = True
+    endpoint_env = 'ELEVENLABS_ENDPOINT_URL'
+    price_per_million_chars = 300.0       # Per-character overage on paid plans
+    chars_per_second = 400.0
+
+    def _create_client(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        api_key = os.environ.get('ELEVENLABS_API_KEY')
+        if not api_key:
+            raise RuntimeError("ELEVENLABS_API_KEY is not set")
+
+        # One keep-alive pool sized to the dispatcher; rate limits (429) and
+        # server errors are retried with backoff, POST included
+        retries = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=None)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency, max_retries=retries)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'xi-api-key': api_key})
+        return session
+
+    @property
+    def api_url(self) -> str:
+        return (self.endpoint_url or ELEVENLABS_API_URL).rstrip('/')
+
+    def synthesize_chunk(self, text: str, output_path: Path, voice_config: Dict) -> str:
+        # Premade voice names map to their IDs; anything else is taken as a voice ID
+        voice = voice_config['normal_voice']
+        voice_id = ELEVENLABS_VOICE_IDS.get(voice, voice)
+        response = self.client.post(
+            f"{self.api_url}/v1/text-to-speech/{voice_id}",
+            params={'output_format': 'mp3_44100_128'},
+            json={'text': text, 'model_id': voice_config.get('model_id', ELEVENLABS_MODEL)},
+            headers={'Accept': 'audio/mpeg'},
+            timeout=(10, 120)
+        )
+        response.raise_for_status()
+        with open(output_path, 'wb') as file:
+            file.write(response.content)
+        return str(output_path)
+
+    def get_voices(self) -> List[str]:
+        try:
+            response = self.client.get(f"{self.api_url}/v1/voices", timeout=(10, 30))
+            response.raise_for_status()
+            return [voice['voice_id'] for voice in response.json()['voices']]
+        except Exception:
+            return list(ELEVENLABS_VOICE_IDS)
+
+
+@register_backend('espeak')
+class EspeakBackend(TTSBackend):
+    """espeak-ng subprocesses (offline, no audio stack needed)"""
+
+    engine = 'espeak-ng'
+    max_request_chars = 1000
+    supports_ssml = False
+    max_concurrency = min(4, os.cpu_count() or 1)
+    output_formats = ('wav',)
+    offline = True
+    request_latency = 0.05
+    chars_per_second = 2000.0
+
+    def _create_client(self):
+        from offline_tts import OfflineTTS
+        return OfflineTTS(engine=self.engine, workers=self.max_concurrency)
+
+    def synthesize_chunks(self, chunks: List[str], segment_dir: Path,
+                          voice_config: Dict) -> Iterator[Tuple[int, str]]:
+        yield from self.client.synthesize(
+            chunks, segment_dir,
+            voice=voice_config['normal_voice'],
+            rate=self.speech_settings.get('rate', 'medium'),
+            pitch=self.speech_settings.get('pitch', 'medium')
+        )
+
+    def get_voices(self) -> List[str]:
+        try:
+            import shutil
+            import subprocess
+            result = subprocess.run([shutil.which('espeak-ng') or 'espeak', '--voices=en'],
+                                    capture_output=True, text=True, check=True)
+            # Columns: Pty Language Age/Gender VoiceName File Other
+            return [line.split()[1] for line in result.stdout.splitlines()[1:] if line.split()]
+        except Exception:
+            return ['en-us', 'en-gb']
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+        super().close()
+
+
+@register_backend('piper')
+class PiperBackend(EspeakBackend):
+    """Piper neural voices in long-running subprocesses (offline)"""
+
+    engine = 'piper'
+    chars_per_second = 600.0
+
+    def _create_client(self):
+        from offline_tts import OfflineTTS
+        return OfflineTTS(engine=self.engine, workers=self.max_concurrency,
+                          model=os.environ.get('PIPER_MODEL'))
+
+    def synthesize_chunks(self, chunks: List[str], segment_dir: Path,
+                          voice_config: Dict) -> Iterator[Tuple[int, str]]:
+        # Piper voices are models: voice_config['normal_voice'] names the .onnx file
+        yield from self.client.synthesize(
+            chunks, segment_dir,
+            rate=self.speech_settings.get('rate', 'medium'),
+            model=voice_config.get('normal_voice')
+        )
+
+    def get_voices(self) -> List[str]:
+        return [os.environ.get('PIPER_MODEL', 'en_US-lessac-medium.onnx')]
+
+
+@register_backend('local')
+class LocalBackend(TTSBackend):
+    """pyttsx3 engines, one long-lived engine per worker process"""
+
+    max_request_chars = 1000
+    supports_ssml = False
+    max_concurrency = os.cpu_count() or 1
+    output_formats = ('wav',)
+    offline = True
+    request_latency = 0.2
+    chars_per_second = 300.0
+
+    def _create_client(self):
+        import pyttsx3  # Fail early (ImportError) before starting worker processes
+        from local_tts import LocalTTSPool
+        return LocalTTSPool(workers=self.max_concurrency)
+
+    def synthesize_chunks(self, chunks: List[str], segment_dir: Path,
+                          voice_config: Dict) -> Iterator[Tuple[int, str]]:
+        voice = voice_config.get('normal_voice', 'default')
+        if self.client.settings['voice'] != voice:
+            # Engines are configured once per worker, so a new voice needs new workers
+            self.client.close()
+            self.client.settings['voice'] = voice
+        yield from self.client.synthesize(chunks, segment_dir)
+
+    def get_voices(self) -> List[str]:
+        try:
+            from local_tts import get_engine
+            engine = get_engine()
+            voices = engine.getProperty('voices')
+            return [voice.id for voice in voices] if voices else ['default']
+        except Exception:
+            return ['default']
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+        super().close()
+
+
+def split_into_segments(text: str, max_chars: int = 1000,
+                        isolate: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """
+    Split plain text into segments of whole sentences, at most max_chars each
+    Sentences for which isolate() is true get a segment of their own
+    """
+    segments = []
+    current = ''
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if isolate and len(sentence) <= max_chars and isolate(sentence):
+            if current:
+                segments.append(current)
+                current = ''
+            segments.append(sentence)
+            continue
+        # Hard-split sentences that are longer than a whole segment
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                segments.append(current)
+                current = ''
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f'{current} {sentence}' if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def get_audio_duration(path: str) -> Optional[float]:
+    """Duration of an audio file in seconds, if it can be read"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        pass
+    try:
+        from pydub import AudioSegment
+        return len(AudioSegment.from_file(path)) / 1000.0
+    except Exception:
+        return None
+
+
+def join_segments(segment_files: List[str], output_base: Path, audio_format: str = 'mp3') -> str:
+    """
+    Join segment files into one audio file
+    Exports audio_format when pydub is available; otherwise WAV frames are
+    concatenated (MP3 segments are appended byte-wise, which MP3 players handle)
+    """
+    try:
+        from pydub import AudioSegment
+
+        combined = AudioSegment.empty()
+        for path in segment_files:
+            combined += AudioSegment.from_file(path)
+        output_path = output_base.with_suffix(f'.{audio_format}')
+        combined.export(output_path, format=audio_format)
+        return str(output_path)
+
+    except ImportError:
+        if audio_format not in ('mp3', 'wav'):
+            logger.warning(f"pydub not installed. Cannot export {audio_format}, writing segments as-is.")
+        if segment_files and segment_files[0].endswith('.mp3'):
+            output_path = output_base.with_suffix('.mp3')
+            with open(output_path, 'wb') as output:
+                for path in segment_files:
+                    with open(path, 'rb') as segment:
+                        output.write(segment.read())
+            return str(output_path)
+
+        output_path = output_base.with_suffix('.wav')
+        with wave.open(str(output_path), 'wb') as output:
+            for i, path in enumerate(segment_files):
+                with wave.open(path, 'rb') as segment:
+                    if i == 0:
+                        output.setparams(segment.getparams())
+                    output.writeframes(segment.readframes(segment.getnframes()))
+        return str(output_path)
+
+
+def write_segment_manifest(segment_dir: Path, segments: List[str], segment_files: List[str]) -> str:
+    """
+    Record each segment's file, start time and spoken text, in playback order
+    AudioGenerator.create_timing_index uses the times as alignment points and
+    export reads exactly these files. Every segment is listed; after one
+    whose duration can't be read, the times are None
+    """
+    manifest = []
+    current_time = 0.0
+    for text, path in zip(segments, segment_files):
+        start = int(round(current_time * 1000)) if current_time is not None else None
+        manifest.append({'time': start, 'value': text, 'file': Path(path).name})
+        if current_time is not None:
+            duration = get_audio_duration(path)
+            # Unreadable segment; alignment points stop here
+            current_time = current_time + duration if duration is not None else None
+
+    manifest_path = segment_dir / SEGMENT_MANIFEST
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return str(manifest_path)